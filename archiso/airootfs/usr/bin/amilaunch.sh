@@ -11,67 +11,101 @@ clear
 UAE_DIR="/usr/share/amicachy/uae"
 AMIBERRY_BIN="/usr/bin/amiberry"
 AMIBERRY_HOME="/usr/share/amiberry"
+AMICACHY_TOOLS="/usr/share/amicachy/tools"
+READAHEAD_DIR="/var/lib/amicachy/readahead"
+TUNING_LOG="/tmp/amicachy-tuning.log"
+RTSCHED_LOG="/tmp/amicachy-rtsched.log"
+MONITOR_LOG="/tmp/amiberry-monitor.log"
+HUGEPAGES_LOG="/tmp/amicachy-hugepages.log"
+AUDIO_DIR="/etc/amicachy/audio"
+# Per-profile audio drop-ins (installer/audio.py), relative to ~/.config
+AUDIO_DROPINS=(
+    pipewire/pipewire.conf.d/60-amicachy.conf
+    pipewire/pipewire-pulse.conf.d/60-amicachy.conf
+    wireplumber/wireplumber.conf.d/60-amicachy.conf
+)
 
 # --- CPU architecture check ---
-# If the system has x86-64-v3 packages but the CPU lacks AVX2, binaries
-# will crash with SIGILL. Detect this early and show a helpful message.
+# If the system has x86-64-v3/v4 packages but the CPU lacks AVX2/AVX-512,
+# binaries will crash with SIGILL. Detect this early and show a helpful message.
 check_cpu_compat() {
-    # Check if [cachyos-v3] repo is in pacman.conf (meaning v3 packages installed)
-    if grep -q '^\[cachyos-v3\]' /etc/pacman.conf 2>/dev/null; then
-        # System has v3 packages — verify CPU supports AVX2
-        if ! grep -qw avx2 /proc/cpuinfo 2>/dev/null; then
-            # v3 packages on non-v3 CPU — this will crash
-            local cpu_model
-            cpu_model=$(grep -m1 'model name' /proc/cpuinfo 2>/dev/null | cut -d: -f2 | xargs || echo "unknown")
-
-            # Use printf to write directly to the framebuffer console (tty)
-            # since Wayland compositors won't start with v3 SIGILL
-            clear
-            echo ""
-            echo "============================================================"
-            echo "  AmiCachy — CPU Incompatible"
-            echo "============================================================"
-            echo ""
-            echo "  This system was built with x86-64-v3 packages (AVX2)"
-            echo "  but your CPU does not support AVX2 instructions."
-            echo ""
-            echo "  CPU: ${cpu_model}"
-            echo ""
-            echo "  The system cannot run v3-optimized binaries on this"
-            echo "  hardware. They will crash with 'Illegal instruction'."
-            echo ""
-            echo "  Solutions:"
-            echo "    1. Use a CPU with AVX2 support:"
-            echo "       - Intel Haswell or newer (2013+)"
-            echo "       - AMD Excavator or newer (2015+)"
-            echo ""
-            echo "    2. Rebuild the ISO with generic packages:"
-            echo "       ./tools/build_iso_docker.sh --generic"
-            echo ""
-            echo "    3. Rebuild the dev VM on this machine:"
-            echo "       ./tools/dev_vm.sh destroy"
-            echo "       ./tools/dev_vm.sh create"
-            echo "       (auto-detects CPU and uses generic packages)"
-            echo ""
-            echo "============================================================"
-            echo ""
-            echo "  Press Enter for a rescue shell, or power off the machine."
-            read -r
-            exec bash
-        fi
+    # The optimized repo in pacman.conf tells which packages are installed
+    local level flag ext cpus
+    if grep -q '^\[cachyos-v4\]' /etc/pacman.conf 2>/dev/null; then
+        level="x86-64-v4" flag="avx512f" ext="AVX-512"
+        cpus=("Intel Skylake-X / Ice Lake or newer" "AMD Zen 4 or newer (2022+)")
+    elif grep -q '^\[cachyos-v3\]' /etc/pacman.conf 2>/dev/null; then
+        level="x86-64-v3" flag="avx2" ext="AVX2"
+        cpus=("Intel Haswell or newer (2013+)" "AMD Excavator or newer (2015+)")
+    else
+        return
+    fi
+
+    # System has optimized packages — verify the CPU supports them
+    if ! grep -qw "$flag" /proc/cpuinfo 2>/dev/null; then
+        # Optimized packages on an older CPU — this will crash
+        local cpu_model
+        cpu_model=$(grep -m1 'model name' /proc/cpuinfo 2>/dev/null | cut -d: -f2 | xargs || echo "unknown")
+
+        # Use printf to write directly to the framebuffer console (tty)
+        # since Wayland compositors won't start with SIGILL
+        clear
+        echo ""
+        echo "============================================================"
+        echo "  AmiCachy — CPU Incompatible"
+        echo "============================================================"
+        echo ""
+        echo "  This system was built with ${level} packages (${ext})"
+        echo "  but your CPU does not support ${ext} instructions."
+        echo ""
+        echo "  CPU: ${cpu_model}"
+        echo ""
+        echo "  The system cannot run ${level#x86-64-}-optimized binaries on this"
+        echo "  hardware. They will crash with 'Illegal instruction'."
+        echo ""
+        echo "  Solutions:"
+        echo "    1. Use a CPU with ${ext} support:"
+        echo "       - ${cpus[0]}"
+        echo "       - ${cpus[1]}"
+        echo ""
+        echo "    2. Rebuild the ISO with generic packages:"
+        echo "       ./tools/build_iso_docker.sh --generic"
+        echo ""
+        echo "    3. Rebuild the dev VM on this machine:"
+        echo "       ./tools/dev_vm.sh destroy"
+        echo "       ./tools/dev_vm.sh create"
+        echo "       (auto-detects CPU and uses matching packages)"
+        echo ""
+        echo "============================================================"
+        echo ""
+        echo "  Press Enter for a rescue shell, or power off the machine."
+        read -r
+        exec bash
     fi
 }
 check_cpu_compat
 
 # --- Parse profile from kernel command line ---
 PROFILE=""
+HOTKEY_WINDOW_MS=""
+BOOT_BENCH=""
 read -ra _cmdline < /proc/cmdline
 for param in "${_cmdline[@]}"; do
     case "$param" in
         amiprofile=*) PROFILE="${param#amiprofile=}" ;;
+        amihotkey_ms=*) HOTKEY_WINDOW_MS="${param#amihotkey_ms=}" ;;
+        amibench=*) BOOT_BENCH="${param#amibench=}" ;;
     esac
 done
 
+# Boot benchmark markers (tools/bench/boot_bench.py boots with amibench=1
+# and reads them from the journal, echoed to the serial console)
+bench_mark() {
+    [[ "$BOOT_BENCH" == 1 ]] && logger -t amilaunch "amibench: $1"
+    return 0
+}
+bench_mark start
+
 if [[ -z "$PROFILE" ]]; then
     echo "ERROR: No amiprofile= found in kernel cmdline." >&2
     echo "Falling back to classic_68k..." >&2
@@ -107,8 +141,21 @@ if [[ -f /usr/local/lib/libSDL2-2.0.so.0 ]]; then
 fi
 
 # --- Early Startup Control (hold F5 during boot) ---
+# amicachy-hotkeys.service watches the keyboards from early boot and
+# leaves the detected hotkeys in /run/amicachy/hotkeys, so this is just a
+# file read.  Without the service, check inline: returns at once when F5
+# is already held, otherwise waits up to amihotkey_ms= (default 250 ms).
+HOTKEY_RESULT="/run/amicachy/hotkeys"
 if [[ "$PROFILE" != "installer" && "$PROFILE" != "dev_station" ]]; then
-    if python3 /usr/share/amicachy/tools/earlystartup/check_hotkey.py 2>/dev/null; then
+    early_startup=0
+    if [[ -f "$HOTKEY_RESULT" ]]; then
+        grep -qx F5 "$HOTKEY_RESULT" && early_startup=1
+    elif python3 -I -S /usr/share/amicachy/tools/earlystartup/check_hotkey.py \
+            ${HOTKEY_WINDOW_MS:+--window-ms "$HOTKEY_WINDOW_MS"} 2>/dev/null; then
+        early_startup=1
+    fi
+    bench_mark hotkey-checked
+    if [[ $early_startup -eq 1 ]]; then
         cage -- /usr/bin/amicachy-earlystartup 2>/dev/null
     fi
 fi
@@ -161,13 +208,82 @@ run_amiberry() {
     # Capture all output for debugging (readable via SSH or dev_vm.sh log)
     local logfile="/tmp/amiberry-launch.log"
 
+    # Record which files the emulator (and cage) read as they start, for
+    # the next boot's readahead (amicachy-readahead.service)
+    if [[ -w "$READAHEAD_DIR" ]]; then
+        PYTHONPATH="$AMICACHY_TOOLS" nice -n 10 python3 -S -m launcher.readahead \
+            record "$PROFILE" --pid $$ >/dev/null 2>&1 &
+    fi
+
+    # Benchmark: mark the first output of the emulator
+    if [[ "$BOOT_BENCH" == 1 ]]; then
+        : > "$logfile"
+        { until [[ -s "$logfile" ]]; do sleep 0.05; done; bench_mark amiberry-log; } &
+    fi
+
+    # Low-latency machine state for the session (governor, EPP, C-state
+    # limit, IRQs off the emulator CPUs; launcher/tuning.py).  It applies
+    # within milliseconds, while cage starts, and is restored when cage
+    # exits (or when this shell dies).
+    sudo -n /usr/bin/amicachy-tune apply "$PROFILE" --wait-pid $$ >"$TUNING_LOG" 2>&1 &
+    local tune_pid=$!
+
+    # Per-thread scheduling: realtime only for the emulation threads
+    # (launcher/rtsched.py), applied as they spawn
+    PYTHONPATH="$AMICACHY_TOOLS" python3 -S -m launcher.rtsched "$PROFILE" --pid $$ \
+        >"$RTSCHED_LOG" 2>&1 &
+    local rtsched_pid=$!
+
+    # Performance monitor: per-thread timeline and stall events, written
+    # to /tmp/amiberry-monitor.log when the emulator exits or crashes
+    PYTHONPATH="$AMICACHY_TOOLS" python3 -S -m launcher.monitor --pid $$ \
+        --output "$MONITOR_LOG" >/dev/null 2>&1 &
+    local monitor_pid=$!
+
+    # Huge pages: report how much of the guest RAM is backed by them
+    # (launcher/hugepages.py; the THP policy itself comes from the tuning)
+    PYTHONPATH="$AMICACHY_TOOLS" nice -n 10 python3 -S -m launcher.hugepages verify \
+        --pid $$ --profile "$PROFILE" --output "$HUGEPAGES_LOG" >/dev/null 2>&1 &
+    local hugepages_pid=$!
+
     # Run inside cage; wrap amiberry in a shell to capture its stderr
+    bench_mark cage-start
     cage -- bash -c '"${@}" 2>&1 | tee '"$logfile"'; exit ${PIPESTATUS[0]}' _ "${args[@]}"
     local rc=$?
+    kill "$tune_pid" "$rtsched_pid" "$monitor_pid" "$hugepages_pid" 2>/dev/null
+    wait "$tune_pid" "$rtsched_pid" "$monitor_pid" "$hugepages_pid" 2>/dev/null
     if [[ $rc -ne 0 ]]; then
-        launch_fallback "amiberry exited with code $rc (config: $config). Log: $logfile"
+        launch_fallback "amiberry exited with code $rc (config: $config). Log: $logfile, timeline: $MONITOR_LOG"
+    fi
+}
+
+# --- Audio server settings for the profile ---
+# Links the profile's PipeWire/WirePlumber drop-ins (written by the
+# installer) into ~/.config; other profiles get the defaults back.  The
+# servers are socket-activated and normally start after this; running
+# ones are restarted when the settings changed.
+select_audio_profile() {
+    local src="${AUDIO_DIR}/$1" rel dest changed=0
+    for rel in "${AUDIO_DROPINS[@]}"; do
+        dest="${HOME}/.config/${rel}"
+        if [[ -f "${src}/${rel}" ]]; then
+            [[ "$(readlink "$dest")" == "${src}/${rel}" ]] && continue
+            mkdir -p "${dest%/*}"
+            ln -sfn "${src}/${rel}" "$dest"
+        elif [[ -L "$dest" ]]; then
+            rm -f "$dest"
+        else
+            continue
+        fi
+        changed=1
+    done
+    if [[ $changed -eq 1 ]]; then
+        systemctl --user try-restart pipewire.service pipewire-pulse.service \
+            wireplumber.service 2>/dev/null
     fi
+    return 0
 }
+select_audio_profile "$PROFILE"
 
 # --- Dispatch based on profile ---
 case "$PROFILE" in
@@ -183,7 +299,7 @@ case "$PROFILE" in
         ;;
     ppc_nitro)
         if [[ -x "$AMIBERRY_BIN" ]]; then
-            run_amiberry "${UAE_DIR}/os41.uae" chrt -f 52
+            run_amiberry "${UAE_DIR}/os41.uae"
         else
             launch_fallback "amiberry not found (ppc_nitro)"
         fi
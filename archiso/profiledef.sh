@@ -16,8 +16,10 @@ airootfs_image_tool_options=('-comp' 'xz' '-Xbcj' 'x86' '-b' '1M' '-Xdict-size'
 
 file_permissions=(
   ["/etc/sudoers.d/amiga"]="0:0:440"
+  ["/etc/sudoers.d/amicachy-tune"]="0:0:440"
   ["/usr/bin/amilaunch.sh"]="0:0:755"
   ["/usr/bin/amicachy-installer"]="0:0:755"
+  ["/usr/bin/amicachy-tune"]="0:0:755"
   ["/usr/bin/start_dev_env.sh"]="0:0:755"
   ["/home/amiga"]="1000:1000:750"
   ["/home/amiga/.bash_profile"]="1000:1000:644"
@@ -0,0 +1 @@
+"""AmiCachy benchmark suites — run from tools/ as: python3 -m bench.<suite>"""
@@ -0,0 +1,256 @@
+"""Audio round-trip buffer latency through PipeWire, with a null sink.
+
+Loads a temporary null sink, plays silence with a click every half second
+into it with one pw-cat, and records the sink's monitor with another.
+The time from writing a click to reading it back is the buffer latency
+the running audio graph achieves for a client at the profile's quantum:
+the playback and capture stream buffers plus the graph cycles between
+them.  The silence is written at the sample rate in quantum-sized chunks
+through a one-page pipe, so client-side buffering adds almost nothing.
+
+The rate and quantum default to the profile's PipeWire drop-in written
+by the installer (installer/audio.py); median and p95 latency are
+compared against a stored baseline.
+
+Usage (inside the dev VM or on an installed system, as the logged-in user
+with the session's PipeWire running; from /usr/share/amicachy/tools, or
+from tools/ of a checkout):
+    python3 -m bench.audio_latency --profile classic_68k
+    python3 -m bench.audio_latency --profile ppc_nitro --clicks 40 --save-baseline
+"""
+
+import argparse
+import array
+import fcntl
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .baseline import BASELINE_DIR, compare, format_table, load_baseline, save_baseline
+
+AUDIO_DIR = Path("/etc/amicachy/audio")
+PIPEWIRE_DROPIN = "pipewire/pipewire.conf.d/60-amicachy.conf"
+# PipeWire's own defaults, for profiles without a drop-in
+DEFAULT_RATE = 48000
+DEFAULT_QUANTUM = 1024
+
+SINK_NAME = "amibench-null"
+CLICK_INTERVAL_S = 0.5
+CLICK_LEVEL = 30000
+DETECT_LEVEL = 16000
+# Clicks not read back within this time count as lost
+CLICK_TIMEOUT_S = 1.0
+# The first clicks go out while the streams are still starting
+WARMUP_CLICKS = 2
+F_SETPIPE_SZ = 1031
+
+
+def profile_clock(profile: str) -> tuple[int, int]:
+    """(rate, quantum) of a profile's PipeWire drop-in, or the defaults."""
+    try:
+        text = (AUDIO_DIR / profile / PIPEWIRE_DROPIN).read_text()
+    except OSError:
+        return DEFAULT_RATE, DEFAULT_QUANTUM
+    values = dict(re.findall(r"default\.clock\.(rate|quantum)\s*=\s*(\d+)", text))
+    return int(values.get("rate", DEFAULT_RATE)), int(values.get("quantum", DEFAULT_QUANTUM))
+
+
+def load_null_sink(rate: int) -> str:
+    """Load the null sink; return the module index for unloading."""
+    result = subprocess.run(
+        ["pactl", "load-module", "module-null-sink", f"sink_name={SINK_NAME}",
+         f"rate={rate}", "channels=1", "format=s16le"],
+        capture_output=True, text=True, check=True,
+    )
+    return result.stdout.strip()
+
+
+def pw_cat(mode: str, rate: int, quantum: int) -> list[str]:
+    cmd = ["pw-cat", f"--{mode}", "--raw", "--target", SINK_NAME,
+           "--rate", str(rate), "--channels", "1", "--format", "s16",
+           "--latency", str(quantum)]
+    if mode == "record":
+        cmd += ["-P", "{ stream.capture.sink = true }"]
+    return cmd + ["-"]
+
+
+class RoundTrip:
+    """Plays clicks into the null sink and times their return."""
+
+    def __init__(self, rate: int, quantum: int, clicks: int):
+        self.rate = rate
+        self.quantum = quantum
+        self.clicks = clicks
+        # Monotonic write times of clicks not read back yet
+        self.sent: list[float] = []
+        self.latencies: list[float] = []
+        self.lost = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def play(self, stdin) -> None:
+        """Write silence and clicks in quantum chunks at the sample rate."""
+        silence = bytes(self.quantum * 2)
+        click = array.array("h", [CLICK_LEVEL] + [0] * (self.quantum - 1)).tobytes()
+        chunk_s = self.quantum / self.rate
+        sent = 0
+        next_click = time.monotonic() + CLICK_INTERVAL_S
+        deadline = time.monotonic()
+        while not self.done.is_set() and sent < self.clicks + WARMUP_CLICKS:
+            now = time.monotonic()
+            if now >= next_click:
+                with self.lock:
+                    self.sent.append(now)
+                data = click
+                sent += 1
+                next_click += CLICK_INTERVAL_S
+            else:
+                data = silence
+            stdin.write(data)
+            stdin.flush()
+            deadline += chunk_s
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        # Let the last click come back
+        time.sleep(CLICK_TIMEOUT_S)
+        self.done.set()
+
+    def record(self, stdout) -> None:
+        """Read the monitor stream and match clicks to their write times."""
+        fd = stdout.fileno()
+        pending = b""
+        warmup = WARMUP_CLICKS
+        last = 0.0
+        while not self.done.is_set():
+            data = os.read(fd, 65536)
+            now = time.monotonic()
+            if not data:
+                return
+            data = pending + data
+            usable = len(data) - len(data) % 2
+            pending = data[usable:]
+            samples = array.array("h", data[:usable])
+            for sample in samples:
+                if abs(sample) < DETECT_LEVEL:
+                    continue
+                # Timed to when the client can read it, like an application
+                # waiting for its own output would
+                arrived = now
+                # One click, even if filtering spread it over several samples
+                if arrived - last < CLICK_INTERVAL_S / 2:
+                    continue
+                last = arrived
+                with self.lock:
+                    while self.sent and arrived - self.sent[0] > CLICK_TIMEOUT_S:
+                        self.sent.pop(0)
+                        self.lost += 1
+                    if not self.sent:
+                        continue
+                    latency = arrived - self.sent.pop(0)
+                if warmup:
+                    warmup -= 1
+                else:
+                    self.latencies.append(latency)
+
+
+def measure(rate: int, quantum: int, clicks: int) -> RoundTrip:
+    trip = RoundTrip(rate, quantum, clicks)
+    module = load_null_sink(rate)
+    recorder = player = None
+    try:
+        recorder = subprocess.Popen(pw_cat("record", rate, quantum),
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        player = subprocess.Popen(pw_cat("playback", rate, quantum),
+                                  stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # A one-page pipe: written data reaches pw-cat at once
+        fcntl.fcntl(player.stdin.fileno(), F_SETPIPE_SZ, 4096)
+        reader = threading.Thread(target=trip.record, args=(recorder.stdout,), daemon=True)
+        reader.start()
+        trip.play(player.stdin)
+        reader.join(timeout=CLICK_TIMEOUT_S)
+    finally:
+        for proc in (player, recorder):
+            if proc is not None:
+                proc.kill()
+                proc.wait()
+        subprocess.run(["pactl", "unload-module", module], capture_output=True)
+    trip.lost += len(trip.sent)
+    return trip
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", default="classic_68k",
+                        choices=["classic_68k", "ppc_nitro"])
+    parser.add_argument("--rate", type=int, help="sample rate (default: the profile's)")
+    parser.add_argument("--quantum", type=int,
+                        help="stream latency in frames (default: the profile's quantum)")
+    parser.add_argument("--clicks", type=int, default=20)
+    parser.add_argument("--baseline", type=Path,
+                        help="baseline file (default: baselines/audio_<profile>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative latency increase (default: 0.25)")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    args = parser.parse_args()
+
+    for tool in ("pw-cat", "pactl"):
+        if shutil.which(tool) is None:
+            print(f"ERROR: {tool} is not installed.", file=sys.stderr)
+            return 2
+    rate, quantum = profile_clock(args.profile)
+    rate = args.rate or rate
+    quantum = args.quantum or quantum
+    baseline_path = args.baseline or BASELINE_DIR / f"audio_{args.profile}.json"
+
+    print(f":: {args.clicks} clicks through a null sink at {rate} Hz, "
+          f"{quantum} frames ({quantum * 1000 / rate:.1f} ms per cycle)", flush=True)
+    try:
+        trip = measure(rate, quantum, args.clicks)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"ERROR: could not set up the null sink: {e}", file=sys.stderr)
+        return 2
+    if not trip.latencies:
+        print("ERROR: no click came back; is PipeWire running?", file=sys.stderr)
+        return 1
+    latencies_ms = sorted(t * 1000 for t in trip.latencies)
+    results = {
+        "latency_median": statistics.median(latencies_ms),
+        "latency_p95": latencies_ms[min(len(latencies_ms) - 1, len(latencies_ms) * 95 // 100)],
+        "latency_max": latencies_ms[-1],
+    }
+    baseline = load_baseline(baseline_path)
+    print(f"   {len(latencies_ms)} clicks measured, {trip.lost} lost\n")
+    print(format_table(results, baseline, unit="ms"))
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "rate": rate, "quantum": quantum, "lost": trip.lost,
+            "latencies_ms": latencies_ms, "summary": results,
+        }, indent=2) + "\n")
+    if args.save_baseline:
+        save_baseline(baseline_path, results)
+        print(f"\n:: Baseline saved to {baseline_path}")
+        return 0
+
+    # The maximum is too noisy to gate on
+    gated = {name: results[name] for name in ("latency_median", "latency_p95")}
+    regressions = compare(gated, baseline, args.tolerance, slack=quantum * 1000 / rate)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
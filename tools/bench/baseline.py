@@ -0,0 +1,61 @@
+"""Stored-baseline comparison shared by the benchmark suites.
+
+A baseline is a flat JSON object mapping metric names to numbers, saved
+from a reference run.  A metric regresses when it exceeds its baseline by
+more than the relative tolerance *and* the absolute slack (so tiny steps
+that jitter by a few milliseconds don't trip the check).
+"""
+
+import json
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def load_baseline(path: Path) -> dict[str, float]:
+    """Load a baseline file, returning {} if it does not exist yet."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_baseline(path: Path, metrics: dict[str, float]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(metrics, indent=2, sort_keys=True) + "\n")
+
+
+def compare(
+    metrics: dict[str, float],
+    baseline: dict[str, float],
+    tolerance: float,
+    slack: float = 0.0,
+) -> list[str]:
+    """Return a human-readable line for every regressed metric."""
+    regressions: list[str] = []
+    for name, value in metrics.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        limit = max(ref * (1.0 + tolerance), ref + slack)
+        if value > limit:
+            pct = (value / ref - 1.0) * 100 if ref else float("inf")
+            regressions.append(
+                f"{name}: {value:.3f} vs baseline {ref:.3f} (+{pct:.0f}%)"
+            )
+    return regressions
+
+
+def format_table(
+    metrics: dict[str, float],
+    baseline: dict[str, float],
+    unit: str = "s",
+) -> str:
+    """Render metrics next to their baseline values."""
+    width = max((len(name) for name in metrics), default=10)
+    lines = [f"{'metric':<{width}}  {'value':>12}  {'baseline':>12}"]
+    for name, value in metrics.items():
+        ref = baseline.get(name)
+        ref_text = f"{ref:.3f}{unit}" if ref is not None else "-"
+        lines.append(f"{name:<{width}}  {value:>11.3f}{unit}  {ref_text:>12}")
+    return "\n".join(lines)
@@ -0,0 +1,345 @@
+"""Boot-to-emulator latency benchmark on the dev VM.
+
+Boots the dev VM disk (tools/dev_vm.sh create) headless in QEMU, several
+times, and timestamps each boot phase from the serial console: kernel
+messages carry printk timestamps, journald forwards the journal to the
+console with the same monotonic clock, and amilaunch.sh logs markers
+when the kernel command line has ``amibench=1``.  Per-phase medians are
+compared against a stored baseline.
+
+The kernel and initramfs of the profile's boot entry are taken from the
+disk's EFI partition and booted directly (so systemd-boot is not timed;
+"firmware" is OVMF up to the first kernel message).  The disk is opened
+with snapshot=on: every run is a first boot from the same state, and
+nothing it writes (logs, readahead lists) survives.
+
+Phases, each measured to the start of the next one:
+
+    firmware     QEMU start -> kernel banner
+    kernel       kernel banner -> /init of the initramfs
+    initramfs    /init -> switch to the real root
+    system       switch root -> getty autologin on tty1
+    login        autologin -> amilaunch.sh start
+    hotkey       amilaunch.sh start -> F5 hotkey check done
+    session      hotkey check done -> cage starting
+    emulator     cage starting -> first line of Amiberry output (50 ms polls)
+
+Usage (from tools/; needs sudo for qemu-nbd, TCG is the default):
+    python3 -m bench.boot_bench --profile classic_68k --runs 3
+    python3 -m bench.boot_bench --profile ppc_nitro --kvm --save-baseline
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .baseline import BASELINE_DIR, compare, format_table, load_baseline, save_baseline
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+DEV_DISK = PROJECT_DIR / "dev" / "amicachy-dev.qcow2"
+
+OVMF_CODE_PATHS = (
+    "/usr/share/OVMF/OVMF_CODE_4M.fd",
+    "/usr/share/OVMF/OVMF_CODE.fd",
+    "/usr/share/edk2/ovmf/OVMF_CODE.fd",
+    "/usr/share/edk2-ovmf/x64/OVMF_CODE.fd",
+)
+
+# Kernel parameters appended to the boot entry's own.  Plymouth keeps its
+# graphical splash despite the serial console, and the journal is echoed
+# to the console so systemd and amilaunch.sh messages can be timestamped.
+BENCH_CMDLINE = (
+    "console=tty0 console=ttyS0,115200 plymouth.ignore-serial-consoles "
+    "loglevel=6 printk.time=1 "
+    "systemd.journald.forward_to_console=1 systemd.journald.max_level_console=info "
+    "amibench=1"
+)
+# Entry options replaced by BENCH_CMDLINE
+DROPPED_OPTIONS = ("quiet", "loglevel=", "console=")
+
+# (marker, pattern), in boot order; a phase runs from its marker to the next
+MARKERS = [
+    ("kernel", re.compile(r"Linux version \d")),
+    ("initramfs", re.compile(r"Run /init as init process")),
+    ("switch_root", re.compile(r"Switching root")),
+    ("autologin", re.compile(r"Started (getty@tty1\.service|Getty on tty1)")),
+    ("amilaunch", re.compile(r"amibench: start")),
+    ("hotkey", re.compile(r"amibench: hotkey-checked")),
+    ("cage", re.compile(r"amibench: cage-start")),
+    ("amiberry", re.compile(r"amibench: amiberry-log")),
+]
+PHASES = {
+    "kernel": "firmware",
+    "initramfs": "kernel",
+    "switch_root": "initramfs",
+    "autologin": "system",
+    "amilaunch": "login",
+    "hotkey": "hotkey",
+    "cage": "session",
+    "amiberry": "emulator",
+}
+
+_TIMESTAMP_RE = re.compile(r"^\[\s*(\d+\.\d+)\]")
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+def _sudo(cmd: list[str]) -> list[str]:
+    return cmd if os.geteuid() == 0 else ["sudo"] + cmd
+
+
+def _find_ovmf() -> str:
+    for path in OVMF_CODE_PATHS:
+        if Path(path).exists():
+            return path
+    raise FileNotFoundError("OVMF firmware not found (install ovmf or edk2-ovmf)")
+
+
+def _free_nbd() -> str:
+    for i in range(16):
+        if not Path(f"/sys/block/nbd{i}/pid").exists():
+            return f"/dev/nbd{i}"
+    raise RuntimeError("no free /dev/nbd* device")
+
+
+def _entry_for(entries: Path, profile: str) -> dict[str, list[str]]:
+    """Parse the boot entry whose options select ``profile``."""
+    for conf in sorted(entries.glob("*.conf")):
+        entry: dict[str, list[str]] = {}
+        for line in conf.read_text().splitlines():
+            key, _, value = line.strip().partition(" ")
+            if key:
+                entry.setdefault(key, []).append(value.strip())
+        if f"amiprofile={profile}" in " ".join(entry.get("options", [])).split():
+            return entry
+    raise LookupError(f"no boot entry for amiprofile={profile} in {entries}")
+
+
+def extract_boot_files(disk: Path, profile: str, dest: Path) -> tuple[Path, Path, str]:
+    """Copy the profile's kernel and initramfs off the disk's EFI partition.
+
+    Returns (kernel, initrd, options).  Several initrd lines (microcode
+    first) are concatenated into one image, as the boot loader would.
+    """
+    subprocess.run(_sudo(["modprobe", "nbd", "max_part=16"]), check=False)
+    nbd = _free_nbd()
+    mnt = Path(tempfile.mkdtemp(prefix="amicachy-boot-"))
+    subprocess.run(_sudo(["qemu-nbd", "--read-only", f"--connect={nbd}", str(disk)]), check=True)
+    try:
+        for _ in range(50):
+            if Path(f"{nbd}p1").exists():
+                break
+            time.sleep(0.1)
+        subprocess.run(_sudo(["mount", "-o", "ro", f"{nbd}p1", str(mnt)]), check=True)
+        try:
+            entry = _entry_for(mnt / "loader" / "entries", profile)
+            kernel = dest / "vmlinuz"
+            shutil.copyfile(mnt / entry["linux"][0].lstrip("/"), kernel)
+            initrd = dest / "initrd.img"
+            with initrd.open("wb") as out:
+                for image in entry.get("initrd", []):
+                    with (mnt / image.lstrip("/")).open("rb") as f:
+                        shutil.copyfileobj(f, out)
+        finally:
+            subprocess.run(_sudo(["umount", str(mnt)]), check=False)
+    finally:
+        subprocess.run(_sudo(["qemu-nbd", "--disconnect", nbd]), check=False)
+        mnt.rmdir()
+    return kernel, initrd, " ".join(entry.get("options", []))
+
+
+def bench_cmdline(options: str) -> str:
+    kept = [opt for opt in options.split() if not opt.startswith(DROPPED_OPTIONS)]
+    return " ".join(kept + [BENCH_CMDLINE])
+
+
+def qemu_command(
+    disk: Path, kernel: Path, initrd: Path, cmdline: str, kvm: bool, ram: int, cpus: int
+) -> list[str]:
+    accel = ["-accel", "kvm", "-cpu", "host"] if kvm else ["-accel", "tcg", "-cpu", "max"]
+    return [
+        "qemu-system-x86_64", *accel,
+        "-machine", "q35",
+        "-m", str(ram),
+        "-smp", str(cpus),
+        "-drive", f"if=pflash,format=raw,readonly=on,file={_find_ovmf()}",
+        "-drive", f"file={disk},format=qcow2,if=virtio,snapshot=on",
+        "-kernel", str(kernel),
+        "-initrd", str(initrd),
+        "-append", cmdline,
+        "-device", "virtio-vga",
+        "-display", "none",
+        "-audiodev", "none,id=snd0",
+        "-device", "ich9-intel-hda",
+        "-device", "hda-duplex,audiodev=snd0",
+        "-nic", "none",
+        "-monitor", "none",
+        "-serial", "stdio",
+    ]
+
+
+def parse_markers(lines: list[tuple[float, str]], start: float) -> dict[str, float]:
+    """Return marker -> seconds since QEMU start from timestamped serial lines.
+
+    ``lines`` holds (host monotonic arrival time, text).  Console
+    timestamps are mapped onto the host clock with the smallest observed
+    arrival delay (early kernel messages only reach the serial console
+    once it registers); lines without one use their arrival time.
+    """
+    stamped = []
+    for arrival, text in lines:
+        match = _TIMESTAMP_RE.match(text)
+        stamped.append((arrival - start, float(match.group(1)) if match else None, text))
+    offsets = [host - guest for host, guest, _ in stamped if guest is not None]
+    offset = min(offsets) if offsets else None
+
+    found: dict[str, float] = {}
+    pending = list(MARKERS)
+    for host, guest, text in stamped:
+        for index, (name, pattern) in enumerate(pending):
+            if pattern.search(text):
+                found[name] = offset + guest if guest is not None and offset is not None else host
+                del pending[index]
+                break
+    return found
+
+
+def boot_once(cmd: list[str], timeout: float, log: Path | None) -> dict[str, float]:
+    """Boot once; return marker times, stopping at the last marker or timeout."""
+    lines: list[tuple[float, str]] = []
+    last = MARKERS[-1][1]
+    done = threading.Event()
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+
+    def reader() -> None:
+        for raw in proc.stdout:
+            text = _ANSI_RE.sub("", raw.decode(errors="replace")).strip("\r\n")
+            lines.append((time.monotonic(), text))
+            if last.search(text):
+                done.set()
+        done.set()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        done.wait(timeout)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        thread.join(timeout=5)
+    if log is not None:
+        log.write_text("".join(f"{t - start:10.3f} {text}\n" for t, text in lines))
+    return parse_markers(lines, start)
+
+
+def phase_times(markers: dict[str, float]) -> dict[str, float]:
+    """Turn marker times into per-phase durations plus the total."""
+    phases: dict[str, float] = {}
+    previous = 0.0
+    for name, _ in MARKERS:
+        if name not in markers:
+            break
+        phases[PHASES[name]] = markers[name] - previous
+        previous = markers[name]
+    if len(phases) == len(MARKERS):
+        phases["total"] = previous
+    return phases
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--disk", type=Path, default=DEV_DISK, help="dev VM disk image")
+    parser.add_argument("--profile", default="classic_68k",
+                        choices=["classic_68k", "ppc_nitro"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--kvm", action="store_true",
+                        help="use KVM instead of TCG (not comparable with TCG baselines)")
+    parser.add_argument("--ram", type=int, default=4096, help="VM memory in MiB")
+    parser.add_argument("--cpus", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=900.0,
+                        help="seconds to wait for the emulator per boot")
+    parser.add_argument("--baseline", type=Path,
+                        help="baseline file (default: baselines/boot_<profile>_<accel>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown per phase (default: 0.15)")
+    parser.add_argument("--keep-logs", type=Path,
+                        help="directory for the timestamped serial log of every run")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    args = parser.parse_args()
+
+    if not args.disk.exists():
+        print(f"ERROR: {args.disk} not found (run tools/dev_vm.sh create).", file=sys.stderr)
+        return 2
+    if shutil.which("qemu-system-x86_64") is None:
+        print("ERROR: qemu-system-x86_64 is not installed.", file=sys.stderr)
+        return 2
+    accel = "kvm" if args.kvm else "tcg"
+    baseline_path = args.baseline or BASELINE_DIR / f"boot_{args.profile}_{accel}.json"
+    if args.keep_logs:
+        args.keep_logs.mkdir(parents=True, exist_ok=True)
+
+    runs: list[dict[str, float]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f":: Extracting the {args.profile} kernel and initramfs from {args.disk}")
+        kernel, initrd, options = extract_boot_files(args.disk, args.profile, Path(tmp))
+        cmdline = bench_cmdline(options)
+        cmd = qemu_command(args.disk, kernel, initrd, cmdline, args.kvm, args.ram, args.cpus)
+        print(f"   cmdline: {cmdline}")
+        for i in range(args.runs):
+            print(f":: Run {i + 1}/{args.runs} ({accel})", flush=True)
+            log = args.keep_logs / f"boot-{args.profile}-{i + 1}.log" if args.keep_logs else None
+            phases = phase_times(boot_once(cmd, args.timeout, log))
+            missing = [PHASES[name] for name, _ in MARKERS if PHASES[name] not in phases]
+            if missing:
+                print(f"   incomplete boot, no {', '.join(missing)} phase(s)")
+            runs.append(phases)
+
+    complete = [run for run in runs if "total" in run]
+    if not complete:
+        print("ERROR: no boot reached the emulator; see --keep-logs.", file=sys.stderr)
+        if args.output:
+            args.output.write_text(json.dumps({"runs": runs}, indent=2) + "\n")
+        return 1
+    results = {name: statistics.median(run[name] for run in complete) for name in complete[0]}
+    baseline = load_baseline(baseline_path)
+    print()
+    print(format_table(results, baseline))
+
+    if args.output:
+        args.output.write_text(json.dumps(
+            {"cmdline": cmdline, "runs": runs, "median": results}, indent=2
+        ) + "\n")
+    if args.save_baseline:
+        save_baseline(baseline_path, results)
+        print(f"\n:: Baseline saved to {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, slack=0.25)
+    if len(complete) < len(runs):
+        regressions.append(f"{len(runs) - len(complete)} of {len(runs)} boots did not reach the emulator")
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Initramfs compression benchmark: image size versus decompression time.
+
+Unpacks an existing initramfs to its raw cpio archive, recompresses it
+with every COMPRESSION the installer offers (using the options mkinitcpio
+passes), and times decompression.  Early boot pays for both reading the
+image from the EFI partition and unpacking it, so each codec is also
+scored at the read throughput of every storage profile; the fastest per
+profile should match FS_PROFILES[...]["initramfs_compression"].
+
+Images with uncompressed early archives in front (CPU microcode, ACPI
+tables) are supported: those are skipped and only the compressed main
+archive that follows is benchmarked, as mkinitcpio only compresses that.
+
+Usage (from tools/):
+    python3 -m bench.initramfs_compression
+    python3 -m bench.initramfs_compression --image /boot/initramfs-linux-cachyos.img
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from installer.resources import INITRAMFS_COMPRESSIONS
+from installer.storage import FS_PROFILES
+
+# Compress/decompress commands, as mkinitcpio invokes them (lz4 must be
+# the legacy frame format for the kernel's unpacker).
+CODECS: dict[str, tuple[list[str], list[str]]] = {
+    "zstd": (["zstd", "-q", "-c", "-T0", "-3"], ["zstd", "-q", "-d", "-c"]),
+    "lz4": (["lz4", "-q", "-c", "-l"], ["lz4", "-q", "-d", "-c"]),
+    "cat": (["cat"], ["cat"]),
+}
+
+# Magic bytes -> decompress command, to unpack the input image
+MAGIC: list[tuple[bytes, list[str]]] = [
+    (b"\x28\xb5\x2f\xfd", ["zstd", "-q", "-d", "-c"]),
+    (b"\x02\x21\x4c\x18", ["lz4", "-q", "-d", "-c"]),
+    (b"\x1f\x8b", ["gzip", "-d", "-c"]),
+    (b"\xfd7zXZ", ["xz", "-d", "-c"]),
+]
+CPIO_MAGIC = b"070701"
+CPIO_HEADER_SIZE = 110
+CPIO_TRAILER = b"TRAILER!!!"
+
+# Sequential read throughput (MiB/s) assumed for the EFI partition
+READ_MIBS: dict[str, float] = {"nvme": 2000.0, "ssd": 450.0, "hdd": 120.0, "flash": 30.0}
+
+MIB = 1024 * 1024
+
+
+def _align4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def skip_cpio(data: bytes, offset: int) -> int:
+    """Offset just past the uncompressed newc cpio archive at ``offset``.
+
+    Walks the entry headers up to the TRAILER!!! entry, then skips the
+    zero padding that separates concatenated archives.
+    """
+    while True:
+        if data[offset:offset + 6] != CPIO_MAGIC:
+            raise SystemExit(f"ERROR: corrupt cpio header at offset {offset}")
+        header = data[offset:offset + CPIO_HEADER_SIZE]
+        filesize = int(header[54:62], 16)
+        namesize = int(header[94:102], 16)
+        name_end = offset + CPIO_HEADER_SIZE + namesize
+        name = data[offset + CPIO_HEADER_SIZE:name_end - 1]
+        offset = _align4(_align4(name_end) + filesize)
+        if name == CPIO_TRAILER:
+            break
+    while offset < len(data) and data[offset] == 0:
+        offset += 1
+    return offset
+
+
+def unpack(image: Path, dest: Path) -> int:
+    """Write the raw cpio archive of ``image`` to ``dest``.
+
+    Uncompressed early archives are skipped; returns their total size.
+    An image that is entirely uncompressed cpio is copied as is.
+    """
+    data = image.read_bytes()
+    offset = 0
+    while data.startswith(CPIO_MAGIC, offset):
+        offset = skip_cpio(data, offset)
+    if offset >= len(data):
+        dest.write_bytes(data)
+        return 0
+    for magic, cmd in MAGIC:
+        if data.startswith(magic, offset):
+            with dest.open("wb") as out:
+                subprocess.run(cmd, input=data[offset:], stdout=out, check=True)
+            return offset
+    raise SystemExit(
+        f"ERROR: unrecognised initramfs format at offset {offset}: {image}"
+    )
+
+
+def measure(raw: Path, codec: str, repeat: int) -> dict[str, float]:
+    """Compress ``raw`` with ``codec`` and time decompression."""
+    compress, decompress = CODECS[codec]
+    packed = raw.with_suffix(f".{codec}")
+    with raw.open("rb") as src, packed.open("wb") as out:
+        subprocess.run(compress, stdin=src, stdout=out, check=True)
+
+    times: list[float] = []
+    for _ in range(repeat):
+        with packed.open("rb") as src:
+            start = time.perf_counter()
+            subprocess.run(decompress, stdin=src, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start)
+    size = packed.stat().st_size
+    packed.unlink()
+    return {"size_mib": size / MIB, "decompress_s": statistics.median(times)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", type=Path,
+                        default=Path("/boot/initramfs-linux-cachyos.img"),
+                        help="initramfs to recompress (any mkinitcpio compression)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    args = parser.parse_args()
+
+    if not args.image.exists():
+        print(f"ERROR: {args.image} not found (use --image).", file=sys.stderr)
+        return 2
+    for codec in INITRAMFS_COMPRESSIONS:
+        if shutil.which(CODECS[codec][0][0]) is None:
+            print(f"ERROR: {CODECS[codec][0][0]} is not installed.", file=sys.stderr)
+            return 2
+
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = Path(tmp) / "initramfs.cpio"
+        early = unpack(args.image, raw)
+        if early:
+            print(f"Skipped {early / MIB:.1f} MiB of uncompressed early archives "
+                  "(microcode); benchmarking the main archive.\n")
+        for codec in INITRAMFS_COMPRESSIONS:
+            results[codec] = measure(raw, codec, args.repeat)
+
+    print(f"{'codec':<6}  {'size':>10}  {'unpack':>9}  " + "  ".join(
+        f"{name:>7}" for name in READ_MIBS))
+    for codec, r in results.items():
+        loads = [r["size_mib"] / mibs + r["decompress_s"] for mibs in READ_MIBS.values()]
+        print(f"{codec:<6}  {r['size_mib']:>7.1f}MiB  {r['decompress_s']:>8.3f}s  "
+              + "  ".join(f"{t:>6.3f}s" for t in loads))
+
+    print("\nFastest load per storage profile (read + unpack):")
+    for name, mibs in READ_MIBS.items():
+        best = min(results, key=lambda c: results[c]["size_mib"] / mibs + results[c]["decompress_s"])
+        current = FS_PROFILES[name]["initramfs_compression"]
+        note = "" if best == current else f"  (profile uses {current})"
+        print(f"  {name:<6} {best}{note}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
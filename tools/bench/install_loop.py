@@ -0,0 +1,226 @@
+"""Loop-device end-to-end installer benchmark.
+
+Drives the installer backend (the same step functions InstallWorker runs)
+against a sparse disk image attached as a loop device, installing from a
+local file:// package repository instead of a live mirror.  Per-step
+timings and the total are compared against a stored baseline, so changes
+to partitioning, system configuration or the package list can be checked
+for install-time regressions on any Linux box with arch-install-scripts.
+
+Usage (as root, from tools/):
+    # One-time: download the package set into a local repository
+    python3 -m bench.install_loop --repo /var/tmp/amicachy-repo --populate
+    # Benchmark (offline), then record the result as the new baseline
+    python3 -m bench.install_loop --repo /var/tmp/amicachy-repo --runs 3
+    python3 -m bench.install_loop --repo /var/tmp/amicachy-repo --save-baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from installer.backend import (
+    CommandRunner,
+    InstallError,
+    configure_system,
+    emergency_cleanup,
+    final_cleanup,
+    generate_fstab,
+    install_bootloader,
+    mount_filesystems,
+    partition_disk,
+    run_pacstrap,
+    stage_boot_config,
+)
+from installer.hardware import (
+    detect_arch_level,
+    detect_gpu_vendors,
+    read_cpuinfo,
+    read_meminfo,
+)
+from installer.packages import resolve_packages
+from installer.resources import MOUNTPOINT
+from installer.storage import FS_PROFILES
+
+from .baseline import BASELINE_DIR, compare, format_table, load_baseline, save_baseline
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+REPO_NAME = "amicachy-bench"
+
+BENCH_PACMAN_CONF = """\
+[options]
+Architecture = auto
+SigLevel = Never
+LocalFileSigLevel = Never
+
+[{repo_name}]
+Server = file://{repo_dir}
+"""
+
+
+def _sh(cmd: list[str]) -> str:
+    return subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def prepare_repo(repo: Path, packages: list[str], pacman_conf: Path) -> None:
+    """Download the package set once and index it as a local repository."""
+    db = repo / f"{REPO_NAME}.db.tar.gz"
+    if db.exists():
+        print(f":: Local repository already populated: {repo}")
+        return
+    repo.mkdir(parents=True, exist_ok=True)
+    print(f":: Downloading {len(packages)} packages (plus dependencies) into {repo}")
+    with tempfile.TemporaryDirectory() as dbpath:
+        subprocess.run(
+            ["pacman", "-Syw", "--noconfirm",
+             "--config", str(pacman_conf),
+             "--dbpath", dbpath,
+             "--cachedir", str(repo)] + packages,
+            check=True,
+        )
+    pkgs = sorted(str(p) for p in repo.glob("*.pkg.tar.zst"))
+    subprocess.run(["repo-add", "-q", str(db)] + pkgs, check=True)
+
+
+def attach_image(image: Path, size: str) -> str:
+    """Create a fresh sparse image and attach it as a partitioned loop device."""
+    image.unlink(missing_ok=True)
+    subprocess.run(["truncate", "-s", size, str(image)], check=True)
+    return _sh(["losetup", "--find", "--show", "--partscan", str(image)])
+
+
+def detach_image(device: str) -> None:
+    subprocess.run(["losetup", "-d", device], check=False)
+
+
+def run_install(
+    device: str,
+    packages: list[str],
+    pacman_conf: Path,
+    profiles: list[str],
+    fs_profile: str,
+    verbose: bool,
+) -> dict[str, float]:
+    """Run the install sequence against ``device`` and time every step.
+
+    Mirrors InstallWorker._do_install, minus the signing key setup in
+    setup_pacman (the local repository is unsigned).
+    """
+    runner = CommandRunner(log_callback=print if verbose else (lambda line: None))
+    timings: dict[str, float] = {}
+
+    def timed(name, fn, *args):
+        print(f"   {name}...", flush=True)
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    Path(MOUNTPOINT).mkdir(parents=True, exist_ok=True)
+    try:
+        partitions = timed("partition_disk", partition_disk, runner, device, fs_profile)
+        timed("mount_filesystems", mount_filesystems, runner, partitions, fs_profile)
+        timed("stage_boot_config", stage_boot_config,
+              FS_PROFILES[fs_profile]["initramfs_compression"])
+        timed("run_pacstrap", run_pacstrap, runner, packages, str(pacman_conf))
+        timed("generate_fstab", generate_fstab, runner)
+        timed("configure_system", configure_system, runner, fs_profile,
+              read_meminfo()["total_kib"], str(pacman_conf), profiles)
+        timed("install_bootloader", install_bootloader, runner, profiles, profiles[0])
+        timed("final_cleanup", final_cleanup, runner)
+    except InstallError:
+        emergency_cleanup(runner)
+        raise
+    finally:
+        runner.close()
+
+    timings["total"] = sum(timings.values())
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", type=Path, required=True,
+                        help="local package repository directory")
+    parser.add_argument("--populate", action="store_true",
+                        help="download the package set into --repo first (needs network)")
+    parser.add_argument("--pacman-conf", type=Path,
+                        default=PROJECT_DIR / "archiso" / "pacman.conf",
+                        help="pacman.conf used by --populate")
+    parser.add_argument("--manifest", type=Path,
+                        default=PROJECT_DIR / "archiso" / "packages.manifest")
+    parser.add_argument("--profiles", default="classic_68k",
+                        help="comma-separated boot profiles (first is default)")
+    parser.add_argument("--fs-profile", default="ssd", choices=sorted(FS_PROFILES),
+                        help="storage profile (loop devices report as rotational)")
+    parser.add_argument("--image", type=Path, default=Path("/var/tmp/amicachy-bench.img"))
+    parser.add_argument("--size", default="24G", help="sparse image size")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_DIR / "install_loop.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown per step (default: 0.15)")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show command output")
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print("ERROR: the loop-device benchmark must run as root.", file=sys.stderr)
+        return 2
+
+    profiles = args.profiles.split(",")
+    cpuinfo = read_cpuinfo()
+    packages = resolve_packages(
+        str(args.manifest),
+        profiles,
+        detect_gpu_vendors(),
+        cpuinfo["vendor"],
+        detect_arch_level(cpuinfo["flags"]),
+    )
+    if args.populate:
+        prepare_repo(args.repo, packages, args.pacman_conf)
+
+    runs: list[dict[str, float]] = []
+    with tempfile.NamedTemporaryFile("w", suffix=".conf") as conf:
+        conf.write(BENCH_PACMAN_CONF.format(repo_name=REPO_NAME, repo_dir=args.repo.resolve()))
+        conf.flush()
+        for i in range(args.runs):
+            print(f":: Run {i + 1}/{args.runs}")
+            device = attach_image(args.image, args.size)
+            try:
+                runs.append(run_install(
+                    device, packages, Path(conf.name), profiles, args.fs_profile, args.verbose
+                ))
+            finally:
+                detach_image(device)
+                args.image.unlink(missing_ok=True)
+
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    baseline = load_baseline(args.baseline)
+    print()
+    print(format_table(results, baseline))
+
+    if args.output:
+        args.output.write_text(json.dumps({"runs": runs, "median": results}, indent=2) + "\n")
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n:: Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, slack=0.5)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Stub-command microbenchmarks for the installer's Python overhead.
+
+Fake ``parted``/``mkfs``/``pacstrap``/``arch-chroot``/... executables are
+placed first on PATH.  Each one emits a realistic volume of output at a
+realistic rate, so the measurements isolate what the installer itself
+costs: CommandRunner line handling, _write_log, the Qt signal fan-out to
+the log view, and the GUI event loop's responsiveness while a simulated
+install runs.
+
+Metrics are checked against fixed thresholds (and, when present, a
+stored baseline); the suite exits non-zero when overhead regresses.
+
+Usage (from tools/):
+    python3 -m bench.installer_overhead
+    python3 -m bench.installer_overhead --scale 0.2 --save-baseline
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QThread, QTimer, Qt, Signal  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from installer import backend  # noqa: E402
+from installer.backend import CommandRunner, InstallError  # noqa: E402
+from installer.pages import InstallPage  # noqa: E402
+from installer.workers import InstallerState  # noqa: E402
+
+from .baseline import (  # noqa: E402
+    BASELINE_DIR,
+    compare,
+    format_table,
+    load_baseline,
+    save_baseline,
+)
+
+# Output volume per command: (lines, lines per second).  Rates are rough
+# figures from real installs on an SSD with a fast mirror.
+STUB_PROFILES: dict[str, tuple[int, float]] = {
+    "wipefs": (3, 0),
+    "parted": (0, 0),
+    "partprobe": (0, 0),
+    "mkfs.fat": (2, 0),
+    "mkfs.ext4": (15, 60),
+    "mkfs.btrfs": (25, 100),
+    "pacman-key": (6, 30),
+    "gpg": (5, 0),
+    "pacstrap": (30_000, 1_500),
+    "arch-chroot": (40, 200),
+    "sync": (0, 0),
+    "umount": (0, 0),
+}
+
+# Command sequence of a simulated install, in InstallWorker order
+SIM_SEQUENCE: list[tuple[str, list[str]]] = [
+    ("Preparing disk...", ["wipefs", "--all", "--force", "/dev/stub"]),
+    ("Preparing disk...", ["parted", "-s", "/dev/stub", "mklabel", "gpt"]),
+    ("Preparing disk...", ["parted", "-s", "/dev/stub", "mkpart", "EFI"]),
+    ("Preparing disk...", ["parted", "-s", "/dev/stub", "set", "1", "esp", "on"]),
+    ("Preparing disk...", ["parted", "-s", "/dev/stub", "mkpart", "AMICACHY"]),
+    ("Preparing disk...", ["parted", "-s", "/dev/stub", "mkpart", "AMIGADATA"]),
+    ("Preparing disk...", ["partprobe", "/dev/stub"]),
+    ("Preparing disk...", ["mkfs.fat", "-F", "32", "/dev/stub1"]),
+    ("Preparing disk...", ["mkfs.ext4", "-F", "/dev/stub2"]),
+    ("Preparing disk...", ["mkfs.btrfs", "-f", "/dev/stub3"]),
+    ("Configuring package manager...", ["pacman-key", "--populate", "cachyos"]),
+    ("Configuring package manager...", ["gpg", "--with-colons", "--fingerprint"]),
+    ("Installing packages...", ["pacstrap", "/mnt/stub"]),
+] + [
+    ("Configuring system...", ["arch-chroot", "/mnt/stub", f"step{i}"])
+    for i in range(12)
+] + [
+    ("Finalizing...", ["sync"]),
+    ("Finalizing...", ["umount", "-R", "/mnt/stub"]),
+]
+
+# Fail thresholds (absolute).  Generous enough for a slow live system.
+THRESHOLDS: dict[str, float] = {
+    "per_command_overhead_ms": 15.0,
+    "per_line_overhead_us": 25.0,
+    "gui_latency_p99_ms": 30.0,
+    "gui_latency_max_ms": 200.0,
+}
+
+STUB_SOURCE = """\
+#!{python}
+import os, sys, time
+PROFILES = {profiles!r}
+lines, rate = PROFILES.get(os.path.basename(sys.argv[0]), (0, 0))
+scale = float(os.environ.get("AMICACHY_STUB_SCALE", "1"))
+lines = int(lines * scale) if scale > 0 else lines
+# Emit in 10 ms bursts so the pipe sees output arrive at the target rate
+burst = max(1, int(rate / 100)) if rate and scale > 0 else lines or 1
+out = sys.stdout
+n = 0
+while n < lines:
+    chunk = min(burst, lines - n)
+    out.write("".join(
+        f"({{n + i + 1}}/{{lines}}) installing stub-package-{{n + i}} [####----] 50%\\n"
+        for i in range(chunk)
+    ))
+    out.flush()
+    n += chunk
+    if rate and scale > 0:
+        time.sleep(chunk / rate)
+"""
+
+
+def create_stubs(bin_dir: Path) -> None:
+    """Write the stub generator and link every stubbed command to it."""
+    generator = bin_dir / "amicachy-stub"
+    generator.write_text(STUB_SOURCE.format(python=sys.executable, profiles=STUB_PROFILES))
+    generator.chmod(0o755)
+    for name in STUB_PROFILES:
+        (bin_dir / name).symlink_to(generator)
+
+
+def _check_stubbed(bin_dir: Path) -> None:
+    """Refuse to run unless every command in the sequence is a stub."""
+    for _, cmd in SIM_SEQUENCE:
+        found = shutil.which(cmd[0])
+        if found is None or Path(found).parent != bin_dir:
+            raise SystemExit(f"ERROR: {cmd[0]} does not resolve to a stub ({found})")
+
+
+def _time_raw(cmd: list[str], env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def _time_runner(runner: CommandRunner, cmd: list[str], env: dict) -> float:
+    start = time.perf_counter()
+    runner.run(cmd, env=env)
+    return time.perf_counter() - start
+
+
+def measure_runner(repeat: int) -> dict[str, float]:
+    """Per-command and per-line CommandRunner overhead versus a bare spawn."""
+    env = dict(os.environ, AMICACHY_STUB_SCALE="0")
+    runner = CommandRunner(log_callback=lambda line: None)
+    try:
+        raw = [_time_raw(["parted"], env) for _ in range(repeat)]
+        wrapped = [_time_runner(runner, ["parted"], env) for _ in range(repeat)]
+        per_command = statistics.median(wrapped) - statistics.median(raw)
+
+        lines = STUB_PROFILES["pacstrap"][0]
+        raw_bulk = min(_time_raw(["pacstrap"], env) for _ in range(3))
+        wrapped_bulk = min(_time_runner(runner, ["pacstrap"], env) for _ in range(3))
+        per_line = (wrapped_bulk - raw_bulk) / lines
+    finally:
+        runner.close()
+    return {
+        "per_command_overhead_ms": max(per_command, 0.0) * 1e3,
+        "per_line_overhead_us": max(per_line, 0.0) * 1e6,
+    }
+
+
+class SimulatedInstallWorker(QThread):
+    """InstallWorker stand-in that replays SIM_SEQUENCE through CommandRunner."""
+
+    step_changed = Signal(str, int)
+    log_line = Signal(str)
+    finished = Signal(bool, str)
+
+    def __init__(self, scale: float):
+        super().__init__()
+        self.scale = scale
+
+    def run(self):
+        runner = CommandRunner(log_callback=self.log_line.emit)
+        env = {"AMICACHY_STUB_SCALE": str(self.scale)}
+        try:
+            for i, (desc, cmd) in enumerate(SIM_SEQUENCE):
+                self.step_changed.emit(desc, int(100 * i / len(SIM_SEQUENCE)))
+                runner.run(cmd, env=env)
+            self.finished.emit(True, "")
+        except InstallError as e:
+            self.finished.emit(False, str(e))
+        finally:
+            runner.close()
+
+
+def measure_gui(scale: float, tick_ms: int = 5) -> dict[str, float]:
+    """Event-loop lateness on the GUI thread while a simulated install runs."""
+    app = QApplication.instance() or QApplication(sys.argv)
+    page = InstallPage(InstallerState())
+    page.resize(1280, 800)
+    page.show()
+
+    lateness: list[float] = []
+    last = time.perf_counter()
+
+    def on_tick():
+        nonlocal last
+        now = time.perf_counter()
+        lateness.append(max(0.0, now - last - tick_ms / 1e3))
+        last = now
+
+    timer = QTimer()
+    timer.setTimerType(Qt.PreciseTimer)
+    timer.timeout.connect(on_tick)
+
+    worker = SimulatedInstallWorker(scale)
+    worker.step_changed.connect(page._on_step_changed)
+    worker.log_line.connect(page._on_log_line)
+    result: dict = {}
+
+    def on_finished(success: bool, error: str):
+        result.update(success=success, error=error)
+        timer.stop()
+        app.quit()
+
+    worker.finished.connect(on_finished)
+    page._toggle_details()  # log view visible, as when a user watches it
+
+    start = time.perf_counter()
+    timer.start(tick_ms)
+    worker.start()
+    app.exec()
+    worker.wait()
+    elapsed = time.perf_counter() - start
+
+    if not result.get("success"):
+        raise SystemExit(f"ERROR: simulated install failed: {result.get('error')}")
+    lateness.sort()
+    return {
+        "gui_install_s": elapsed,
+        "gui_latency_p99_ms": lateness[int(len(lateness) * 0.99)] * 1e3 if lateness else 0.0,
+        "gui_latency_max_ms": lateness[-1] * 1e3 if lateness else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=0.25,
+                        help="fraction of realistic output volume for the GUI run")
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="spawns per command for the per-command metric")
+    parser.add_argument("--thresholds", type=Path, help="JSON file overriding THRESHOLDS")
+    parser.add_argument("--baseline", type=Path,
+                        default=BASELINE_DIR / "installer_overhead.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    thresholds = dict(THRESHOLDS)
+    if args.thresholds:
+        thresholds.update(json.loads(args.thresholds.read_text()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_dir = Path(tmp) / "bin"
+        bin_dir.mkdir()
+        create_stubs(bin_dir)
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        _check_stubbed(bin_dir)
+        # Keep the real install log clean
+        backend.INSTALL_LOG_PATH = str(Path(tmp) / "install.log")
+
+        metrics = measure_runner(args.repeat)
+        metrics.update(measure_gui(args.scale))
+
+    baseline = load_baseline(args.baseline)
+    print(format_table(metrics, baseline, unit=""))
+
+    if args.save_baseline:
+        save_baseline(args.baseline, metrics)
+        print(f"\n:: Baseline saved to {args.baseline}")
+        return 0
+
+    failures = [
+        f"{name}: {metrics[name]:.3f} exceeds threshold {limit:.3f}"
+        for name, limit in thresholds.items()
+        if metrics.get(name, 0.0) > limit
+    ]
+    failures += compare(metrics, baseline, args.tolerance)
+    if failures:
+        print("\nREGRESSIONS:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
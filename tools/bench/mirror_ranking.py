@@ -0,0 +1,160 @@
+"""Mirror ranking of installer/mirrors.py against local stand-in mirrors.
+
+One local HTTP server plays several mirrors, told apart by the first path
+component of their Server line:
+
+- fast:    serves the probed range at once
+- moved:   redirects to the fast mirror (the hop counts as latency)
+- slow:    waits SLOW_DELAY_S, then trickles the range out at SLOW_RATE
+- missing: answers 404
+- stalled: accepts the request but never answers (hits the timeout)
+
+plus a dead mirror on a closed port (connection refused).  A mirrorlist
+holding them all in worst-first order is ranked with rank_mirrorlists(),
+and the rewritten file is checked: live mirrors first with the slow one
+last among them, every failing mirror commented out with its reason.  A
+second list with only failing mirrors must be left untouched.
+
+Usage (no root or network needed; from /usr/share/amicachy/tools, or
+from tools/ of a checkout):
+    python3 -m bench.mirror_ranking
+"""
+
+import argparse
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from installer.mirrors import rank_mirrorlists
+
+REPO = "core"
+DB_BYTES = 512 * 1024
+PROBE_BYTES = 256 * 1024
+TIMEOUT_S = 1.5
+SLOW_DELAY_S = 0.3
+SLOW_RATE = 1024 * 1024
+CHUNK = 16 * 1024
+
+LIVE = ("fast", "moved", "slow")
+FAILING = ("missing", "stalled", "dead")
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """Serves /<mirror>/<repo>/<repo>.db with the mirror's behaviour."""
+
+    protocol_version = "HTTP/1.1"
+    data = bytes(range(256)) * (DB_BYTES // 256)
+
+    def do_GET(self) -> None:
+        mirror, _, rest = self.path.lstrip("/").partition("/")
+        if mirror == "moved":
+            self.send_response(302)
+            self.send_header("Location", f"/fast/{rest}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if mirror == "stalled":
+            time.sleep(TIMEOUT_S * 2)
+            return
+        if mirror not in ("fast", "slow") or rest != f"{REPO}/{REPO}.db":
+            self.send_error(404)
+            return
+        start, _, end = self.headers.get("Range", "bytes=0-").removeprefix("bytes=").partition("-")
+        body = self.data[int(start):int(end) + 1 if end else None]
+        if mirror == "slow":
+            time.sleep(SLOW_DELAY_S)
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if mirror == "fast":
+            self.wfile.write(body)
+            return
+        for offset in range(0, len(body), CHUNK):
+            self.wfile.write(body[offset:offset + CHUNK])
+            self.wfile.flush()
+            time.sleep(CHUNK / SLOW_RATE)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def closed_port() -> int:
+    """A local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def check(ranked_text: str, base: str) -> list[str]:
+    """Return a line for every way the ranked mirrorlist is wrong."""
+    failures: list[str] = []
+    lines = ranked_text.splitlines()
+    active = [line.split("=", 1)[1].split("#")[0].strip()
+              for line in lines if line.startswith("Server =")]
+    commented = [line for line in lines if line.startswith("#Server =")]
+    active_names = [server.removeprefix(base).split("/")[1] for server in active
+                    if server.startswith(base)]
+    if sorted(active_names) != sorted(LIVE):
+        failures.append(f"active mirrors {active_names}, expected {sorted(LIVE)}")
+    elif active_names[-1] != "slow":
+        failures.append(f"slow mirror ranked {active_names.index('slow') + 1} of {len(LIVE)}")
+    for name in FAILING:
+        if not any(f"/{name}/" in line and "unreachable" in line for line in commented):
+            failures.append(f"{name} mirror is not commented out as unreachable")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MirrorHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    dead = f"http://127.0.0.1:{closed_port()}/dead/$repo"
+    failing = [f"{base}/missing/$repo", f"{base}/stalled/$repo", dead]
+    try:
+        with tempfile.TemporaryDirectory(prefix="amibench-mirrors-") as tmp:
+            mirrorlist = Path(tmp) / "mirrorlist"
+            mirrorlist.write_text("".join(
+                f"Server = {server_url}\n"
+                for server_url in [*failing, f"{base}/slow/$repo", f"{base}/moved/$repo",
+                                   f"{base}/fast/$repo"]
+            ))
+            offline = Path(tmp) / "offline-mirrorlist"
+            offline_text = "".join(f"Server = {server_url}\n" for server_url in failing)
+            offline.write_text(offline_text)
+
+            start = time.monotonic()
+            ranked = rank_mirrorlists(
+                {mirrorlist: REPO, offline: REPO}, log=lambda line: print(f"   {line}"),
+                timeout=TIMEOUT_S, probe_bytes=PROBE_BYTES,
+            )
+            elapsed = time.monotonic() - start
+            for r in ranked.get(mirrorlist, []):
+                state = (f"{r.latency * 1000:.0f} ms, {r.throughput / 1024 / 1024:.1f} MiB/s"
+                         if r.alive else r.error)
+                print(f"   {r.server.removeprefix(base):<40} {state}")
+
+            failures = check(mirrorlist.read_text(), base)
+            if offline.read_text() != offline_text:
+                failures.append("a list without reachable mirrors was rewritten")
+            # Probes run in parallel: the stalled mirror's timeout bounds the run
+            if elapsed > TIMEOUT_S * 2:
+                failures.append(f"ranking took {elapsed:.1f}s, probes are not concurrent")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"\n:: {len(failures)} problems, ranking took {elapsed:.2f}s")
+    for line in failures:
+        print(f"  FAIL {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
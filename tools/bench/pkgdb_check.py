@@ -0,0 +1,135 @@
+"""Dependency closure and sizing of installer/pkgdb.py on a fixture sync DB.
+
+The fixture under fixtures/syncdb/ holds the ``<name>-<version>/desc``
+entries of two small repositories, ``core`` and ``extra``, laid out as in
+a real sync database.  They are packed into ``core.db`` and ``extra.db``
+(gzip, and zstd when the zstd tool is installed) in a temporary dbpath
+next to a pacman.conf, and estimate_install() is checked against the
+closures worked out by hand below:
+
+- plain and versioned dependencies ("readline>=7.0"),
+- virtual dependencies: "sh" provided by bash; "opengl-driver" provided
+  by mesa (core) and nvidia-utils (extra), where the first repository
+  wins unless a provider is already selected,
+- groups, names shadowed by an earlier repository, unresolved
+  dependencies and targets,
+- package count, download size and installed size.
+
+Usage (no root or network needed; from /usr/share/amicachy/tools, or
+from tools/ of a checkout):
+    python3 -m bench.pkgdb_check
+"""
+
+import argparse
+import gzip
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+from installer.pkgdb import estimate_install
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures" / "syncdb"
+REPOS = ("core", "extra")
+
+# (csize, isize) of each fixture package, as in its desc
+SIZES = {
+    "glibc": (10_000_000, 50_000_000),
+    "ncurses": (1_000_000, 4_000_000),
+    "readline": (400_000, 1_000_000),
+    "bash": (2_000_000, 9_000_000),
+    "mesa": (30_000_000, 120_000_000),
+    "nvidia-utils": (200_000_000, 700_000_000),
+    "sdl2": (800_000, 3_000_000),
+    "amiberry": (5_000_000, 20_000_000),
+    "amiga-tools": (100_000, 300_000),
+}
+BASH = {"bash", "readline", "ncurses", "glibc"}
+
+# (targets, expected packages, expected missing names)
+CASES = [
+    (["bash"], BASH, []),
+    # "sh" is virtual, provided by bash; libfoo exists nowhere
+    (["amiga-tools"], BASH | {"amiga-tools"}, ["libfoo"]),
+    # opengl-driver: mesa from core, the first repository
+    (["amiberry"], BASH | {"amiberry", "sdl2", "mesa"}, []),
+    # ... unless nvidia-utils is selected already
+    (["nvidia-utils", "amiberry"], BASH | {"amiberry", "sdl2", "nvidia-utils"}, []),
+    # A group, plus a target that does not exist
+    (["amicachy", "no-such-package"],
+     BASH | {"amiberry", "amiga-tools", "sdl2", "mesa"}, ["no-such-package", "libfoo"]),
+]
+
+
+def build_dbpath(root: Path, compression: str) -> Path:
+    """Pack the fixture repositories into ``root``/sync; return pacman.conf."""
+    sync = root / "sync"
+    sync.mkdir(parents=True)
+    for repo in REPOS:
+        tar_path = sync / f"{repo}.tar"
+        with tarfile.open(tar_path, "w") as tar:
+            for entry in sorted((FIXTURE_DIR / repo).iterdir()):
+                tar.add(entry, arcname=entry.name)
+        db = sync / f"{repo}.db"
+        if compression == "zstd":
+            subprocess.run(["zstd", "-q", "--rm", tar_path, "-o", db], check=True)
+        else:
+            db.write_bytes(gzip.compress(tar_path.read_bytes()))
+            tar_path.unlink()
+    conf = root / "pacman.conf"
+    conf.write_text("[options]\nArchitecture = auto\n\n" + "".join(
+        f"[{repo}]\nServer = file:///nonexistent/$repo\n\n" for repo in REPOS))
+    return conf
+
+
+def check(conf: Path, dbpath: Path) -> list[str]:
+    """Return a line for every case whose closure differs from the expected."""
+    failures: list[str] = []
+    for targets, expected, missing in CASES:
+        closure = estimate_install(str(conf), str(dbpath), targets)
+        if closure is None:
+            return ["no sync database was loaded"]
+        names = {p.name for p in closure.packages}
+        csize = sum(SIZES[name][0] for name in expected)
+        isize = sum(SIZES[name][1] for name in expected)
+        label = " ".join(targets)
+        if names != expected:
+            failures.append(f"{label}: extra {sorted(names - expected)}, "
+                            f"lacking {sorted(expected - names)}")
+        if closure.missing != missing:
+            failures.append(f"{label}: missing {closure.missing}, expected {missing}")
+        if closure.count != len(expected):
+            failures.append(f"{label}: count {closure.count}, expected {len(expected)}")
+        if (closure.download_size, closure.installed_size) != (csize, isize):
+            failures.append(f"{label}: sizes {closure.download_size}/{closure.installed_size}, "
+                            f"expected {csize}/{isize}")
+        glibc = next((p for p in closure.packages if p.name == "glibc"), None)
+        if glibc is not None and (glibc.repo, glibc.version) != ("core", "2.40-1"):
+            failures.append(f"{label}: glibc {glibc.version} from {glibc.repo}, "
+                            f"expected 2.40-1 from core")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    compressions = ["gzip"] + (["zstd"] if shutil.which("zstd") else [])
+    failed = False
+    for compression in compressions:
+        with tempfile.TemporaryDirectory(prefix="amibench-pkgdb-") as tmp:
+            conf = build_dbpath(Path(tmp), compression)
+            failures = check(conf, Path(tmp))
+        print(f":: {compression}: {len(CASES)} closures, {len(failures)} mismatches")
+        for line in failures:
+            print(f"  FAIL {line}")
+        failed = failed or bool(failures)
+    if "zstd" not in compressions:
+        print(":: zstd is not installed; zstd databases were not checked")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,8 +19,8 @@ usage() {
     echo "Options:"
     echo "  --clean    Remove work/ directory before building"
     echo ""
-    echo "Bundles installer data (tools/installer/, hardware_audit.py,"
-    echo "packages.x86_64, pacman.conf) into airootfs before calling mkarchiso,"
+    echo "Bundles installer data (tools/installer/, tools/earlystartup/, tools/launcher/,"
+    echo "hardware_audit.py, packages.x86_64, pacman.conf) into airootfs before calling mkarchiso,"
     echo "and cleans up bundled files afterwards."
     echo ""
     echo "Requires: archiso package installed, root privileges."
@@ -69,15 +69,31 @@ bundle_installer_data() {
     cp -a "${PROJECT_DIR}/tools/installer/"* "${DEST_TOOLS}/installer/"
     echo "   -> tools/installer/ -> airootfs (tools/installer/)"
 
+    # Early Startup Control (also runs the boot hotkey service)
+    mkdir -p "${DEST_TOOLS}/earlystartup"
+    cp -a "${PROJECT_DIR}/tools/earlystartup/"* "${DEST_TOOLS}/earlystartup/"
+    echo "   -> tools/earlystartup/ -> airootfs (tools/earlystartup/)"
+
+    # Emulator launch helpers (readahead, run from amilaunch.sh)
+    mkdir -p "${DEST_TOOLS}/launcher"
+    cp -a "${PROJECT_DIR}/tools/launcher/"* "${DEST_TOOLS}/launcher/"
+    echo "   -> tools/launcher/ -> airootfs (tools/launcher/)"
+
     # hardware_audit bridge
     cp -a "${PROJECT_DIR}/tools/hardware_audit.py" "${DEST_TOOLS}/hardware_audit.py"
     echo "   -> tools/hardware_audit.py -> airootfs (tools/)"
 
     # packages list and pacman.conf for the installer's install-to-disk step
     mkdir -p "${DEST_INST}"
-    cp -a "${PROFILE_DIR}/packages.x86_64" "${DEST_INST}/packages.x86_64"
-    cp -a "${PROFILE_DIR}/pacman.conf"     "${DEST_INST}/pacman.conf"
-    echo "   -> packages.x86_64, pacman.conf -> airootfs (installer/)"
+    cp -a "${PROFILE_DIR}/packages.x86_64"  "${DEST_INST}/packages.x86_64"
+    cp -a "${PROFILE_DIR}/packages.manifest" "${DEST_INST}/packages.manifest"
+    cp -a "${PROFILE_DIR}/pacman.conf"      "${DEST_INST}/pacman.conf"
+    echo "   -> packages.x86_64, packages.manifest, pacman.conf -> airootfs (installer/)"
+
+    # CachyOS signing key, so the installer never needs a keyserver (the
+    # live system's cachyos-keyring package is preferred when present)
+    pacman-key --export "$CACHYOS_KEY" > "${DEST_INST}/cachyos-key.gpg"
+    echo "   -> CachyOS signing key -> airootfs (installer/cachyos-key.gpg)"
 
     echo "   Bundle complete."
 }
@@ -89,9 +105,13 @@ unbundle_installer_data() {
 
     local AIROOTFS="${PROFILE_DIR}/airootfs"
     rm -rf "${AIROOTFS}/usr/share/amicachy/tools/installer"
+    rm -rf "${AIROOTFS}/usr/share/amicachy/tools/earlystartup"
+    rm -rf "${AIROOTFS}/usr/share/amicachy/tools/launcher"
     rm -f  "${AIROOTFS}/usr/share/amicachy/tools/hardware_audit.py"
     rm -f  "${AIROOTFS}/usr/share/amicachy/installer/packages.x86_64"
+    rm -f  "${AIROOTFS}/usr/share/amicachy/installer/packages.manifest"
     rm -f  "${AIROOTFS}/usr/share/amicachy/installer/pacman.conf"
+    rm -f  "${AIROOTFS}/usr/share/amicachy/installer/cachyos-key.gpg"
 }
 
 setup_local_packages() {
@@ -133,8 +153,10 @@ SigLevel = Never
 Server = file://${LOCAL_REPO}
 EOF
 
-    # Add amiberry to the package list
+    # Add amiberry to the package list and the installed-system manifest
     echo "amiberry" >> "${PROFILE_DIR}/packages.x86_64"
+    printf '\n# --- AmiCachy Local Repo (auto-generated, removed after build) ---\n[base]\namiberry\n' \
+        >> "${PROFILE_DIR}/packages.manifest"
 
     HAS_LOCAL_REPO=1
     echo "   Local repo ready. amiberry will be included in the ISO."
@@ -148,6 +170,9 @@ cleanup_local_packages() {
         sed -i '/^# --- AmiCachy Local Repo/,$ d' "${PROFILE_DIR}/pacman.conf"
         # Remove amiberry line from packages.x86_64
         sed -i '/^amiberry$/d' "${PROFILE_DIR}/packages.x86_64"
+        sed -i '/^# --- AmiCachy Local Repo/,$ d' "${PROFILE_DIR}/packages.manifest"
+        # Drop the blank line left in front of the removed block
+        sed -i '${/^$/d}' "${PROFILE_DIR}/packages.manifest"
     fi
 }
 
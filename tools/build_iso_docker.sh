@@ -39,11 +39,11 @@ if ! command -v docker &>/dev/null; then
     exit 1
 fi
 
-# Generate filtered pacman.conf if needed (generic CPU or --generic flag)
+# Generate an adapted pacman.conf if needed (v4 CPU, generic CPU or --generic flag)
 PACMAN_CONF=$(get_pacman_conf "$PROJECT_DIR/archiso/pacman.conf")
 EXTRA_DOCKER_ARGS=()
 if [[ "$PACMAN_CONF" != "$PROJECT_DIR/archiso/pacman.conf" ]]; then
-    # Mount filtered pacman.conf into the container
+    # Mount the adapted pacman.conf into the container
     EXTRA_DOCKER_ARGS=(-v "${PACMAN_CONF}:/work/archiso/pacman.conf")
 fi
 
@@ -51,7 +51,11 @@ echo ":: Building AmiCachy ISO in Docker container..."
 echo "   Project dir: ${PROJECT_DIR}"
 echo "   Docker image: ${DOCKER_IMAGE}"
 echo "   CPU arch level: ${CPU_ARCH_LEVEL}"
-echo "   Packages: $(if [[ "$CPU_ARCH_LEVEL" == "x86-64" ]]; then echo "generic x86-64"; else echo "x86-64-v3 (AVX2)"; fi)"
+case "$CPU_ARCH_LEVEL" in
+    x86-64-v4) echo "   Packages: x86-64-v4 (AVX-512)" ;;
+    x86-64-v3) echo "   Packages: x86-64-v3 (AVX2)" ;;
+    *)         echo "   Packages: generic x86-64" ;;
+esac
 echo ""
 
 docker run --rm --privileged \
@@ -71,9 +75,11 @@ docker run --rm --privileged \
 
         echo ":: Setting up CachyOS mirrorlists..."
         cp /work/archiso/airootfs/etc/pacman.d/cachyos-mirrorlist    /etc/pacman.d/
-        if [[ -f /work/archiso/airootfs/etc/pacman.d/cachyos-v3-mirrorlist ]]; then
-            cp /work/archiso/airootfs/etc/pacman.d/cachyos-v3-mirrorlist /etc/pacman.d/
-        fi
+        for ml in cachyos-v3-mirrorlist cachyos-v4-mirrorlist; do
+            if [[ -f /work/archiso/airootfs/etc/pacman.d/$ml ]]; then
+                cp /work/archiso/airootfs/etc/pacman.d/$ml /etc/pacman.d/
+            fi
+        done
 
         echo ""
         bash /work/tools/build_iso.sh --clean
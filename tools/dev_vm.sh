@@ -154,10 +154,23 @@ sync_files() {
     sudo rsync -a "$PROJECT_DIR/tools/earlystartup/" \
         "$MNT/usr/share/amicachy/tools/earlystartup/"
 
+    # 3c. Emulator launch helpers (readahead)
+    echo ":: Syncing launcher tools..."
+    sudo mkdir -p "$MNT/usr/share/amicachy/tools/launcher"
+    sudo rsync -a "$PROJECT_DIR/tools/launcher/" \
+        "$MNT/usr/share/amicachy/tools/launcher/"
+
+    # 3d. Benchmarks that run inside the VM (bench.audio_latency)
+    echo ":: Syncing bench tools..."
+    sudo mkdir -p "$MNT/usr/share/amicachy/tools/bench"
+    sudo rsync -a --exclude __pycache__ "$PROJECT_DIR/tools/bench/" \
+        "$MNT/usr/share/amicachy/tools/bench/"
+
     # 4. Fix permissions for executable scripts
     sudo chmod 755 "$MNT/usr/bin/amilaunch.sh" \
                     "$MNT/usr/bin/amicachy-installer" \
                     "$MNT/usr/bin/amicachy-earlystartup" \
+                    "$MNT/usr/bin/amicachy-tune" \
                     "$MNT/usr/bin/start_dev_env.sh" 2>/dev/null || true
 
     # 5. Fix ownership: rsync -a preserves host uid which maps to amiga (1000)
@@ -167,6 +180,9 @@ sync_files() {
     sudo chmod 440 "$MNT/etc/sudoers.d/"* 2>/dev/null || true
     sudo chown -R root:root "$MNT/etc/systemd" 2>/dev/null || true
     sudo chown -R root:root "$MNT/etc/sysusers.d" 2>/dev/null || true
+    sudo chown -R root:root "$MNT/etc/tmpfiles.d" 2>/dev/null || true
+    # amicachy-tune runs launcher/ as root: only root may change the tools
+    sudo chown -R root:root "$MNT/usr/share/amicachy/tools" "$MNT/usr/bin/amicachy-tune" 2>/dev/null || true
     sudo chown root:root "$MNT/etc/vconsole.conf" "$MNT/etc/hostname" \
                           "$MNT/etc/locale.conf" "$MNT/etc/locale.gen" 2>/dev/null || true
     # Amiberry data dir must be writable by amiga (creates configs at runtime)
@@ -181,11 +197,14 @@ sync_files() {
     fi
 
     # 7. Ensure VM's /etc/pacman.conf matches CPU arch level
-    #    On generic CPUs, remove [cachyos-v3] repo to prevent SIGILL
-    if [[ "$CPU_ARCH_LEVEL" == "x86-64" ]]; then
+    #    On generic CPUs, remove [cachyos-v3] repo to prevent SIGILL;
+    #    on AVX-512 CPUs, switch it to [cachyos-v4]
+    if [[ "$CPU_ARCH_LEVEL" != "x86-64-v3" ]]; then
         if sudo grep -q '\[cachyos-v3\]' "$MNT/etc/pacman.conf" 2>/dev/null; then
-            echo ":: Removing [cachyos-v3] repo from VM (CPU lacks AVX2)..."
-            sudo sed -i '/^\[cachyos-v3\]/,/^$/d' "$MNT/etc/pacman.conf"
+            echo ":: Adapting VM repos to ${CPU_ARCH_LEVEL}..."
+            pacman_conf_for_level < "$MNT/etc/pacman.conf" \
+                | sudo tee "$MNT/etc/pacman.conf.new" >/dev/null
+            sudo mv "$MNT/etc/pacman.conf.new" "$MNT/etc/pacman.conf"
         fi
     fi
 
@@ -305,7 +324,7 @@ cmd_create() {
     echo "   This will take several minutes on first run."
     echo ""
 
-    # If generic CPU, mount the filtered pacman.conf over the original
+    # If not a v3 CPU, mount the adapted pacman.conf next to the original
     local EXTRA_DOCKER_ARGS=()
     if [[ "$PACMAN_CONF" != "$PROJECT_DIR/archiso/pacman.conf" ]]; then
         EXTRA_DOCKER_ARGS=(-v "${PACMAN_CONF}:/work/archiso/pacman-build.conf:ro")
@@ -323,7 +342,7 @@ cmd_create() {
             # Select the right pacman.conf inside the container
             if [[ -f /work/archiso/pacman-build.conf ]]; then
                 PACMAN_CONF=/work/archiso/pacman-build.conf
-                echo ':: Using generic pacman.conf (CPU lacks AVX2)'
+                echo ':: Using pacman.conf adapted for $CPU_ARCH_LEVEL'
             else
                 PACMAN_CONF=/work/archiso/pacman.conf
             fi
@@ -338,9 +357,11 @@ cmd_create() {
 
             # Ensure CachyOS mirrorlists are available for pacstrap
             cp /work/archiso/airootfs/etc/pacman.d/cachyos-mirrorlist    /etc/pacman.d/
-            if [[ -f /work/archiso/airootfs/etc/pacman.d/cachyos-v3-mirrorlist ]]; then
-                cp /work/archiso/airootfs/etc/pacman.d/cachyos-v3-mirrorlist /etc/pacman.d/
-            fi
+            for ml in cachyos-v3-mirrorlist cachyos-v4-mirrorlist; do
+                if [[ -f /work/archiso/airootfs/etc/pacman.d/\$ml ]]; then
+                    cp /work/archiso/airootfs/etc/pacman.d/\$ml /etc/pacman.d/
+                fi
+            done
 
             echo ':: Running pacstrap (this takes a while)...'
             pacstrap -C \"\$PACMAN_CONF\" \"$MNT\" $PACKAGES
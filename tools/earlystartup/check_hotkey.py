@@ -4,16 +4,32 @@
 Uses Linux evdev ioctls via ctypes — no external dependencies.
 The user must have read access to /dev/input/event* (group 'input').
 
-Exit codes:
-    0 — F5 detected as held
-    1 — F5 not held (or no keyboard found)
+Keyboards are found from sysfs capability bitmaps, without opening
+devices, and remembered in a small cache keyed by device identity so
+later boots skip non-keyboards outright.  Each keyboard is opened once:
+EVIOCGKEY answers "held right now" immediately, and otherwise the
+devices are watched with epoll for a press.  Only a few stdlib modules
+are imported, to keep startup short.
+
+Two modes:
+
+    check_hotkey.py [--window-ms MS]
+        One-shot check: F5 held now or pressed within MS (default 250).
+        Exit 0 — F5 detected; exit 1 — not held (or no keyboard found).
+
+    check_hotkey.py --watch [FILE] [--timeout-ms MS]
+        Service mode (amicachy-hotkeys.service, started with Plymouth):
+        watches from early boot, as input devices appear, and writes the
+        detected hotkeys to FILE (default /run/amicachy/hotkeys), one per
+        line.  amilaunch.sh then only reads the file.
 """
 
 import fcntl
 import os
+import select
+import struct
 import sys
 import time
-from pathlib import Path
 
 # Linux input event constants (from <linux/input-event-codes.h>)
 EV_KEY = 0x01
@@ -22,6 +38,21 @@ KEY_F5 = 63
 # ioctl numbers (from <linux/input.h>)
 _IOC_READ = 2
 
+# struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+_EVENT = struct.Struct("llHHi")
+
+# Boot hotkeys reported by the watch service (name -> key code)
+HOTKEYS = {"F5": KEY_F5}
+
+INPUT_DIR = "/dev/input"
+SYSFS_INPUT_DIR = "/sys/class/input"
+DEFAULT_WINDOW_MS = 250
+
+# Service mode (amicachy-hotkeys.service)
+RESULT_PATH = "/run/amicachy/hotkeys"
+WATCH_TIMEOUT_MS = 15000
+RESCAN_S = 0.1
+
 
 def _ioc(direction: int, typ: int, nr: int, size: int) -> int:
     return (direction << 30) | (typ << 8) | nr | (size << 16)
@@ -43,42 +74,50 @@ def _test_bit(array: bytes, bit: int) -> bool:
     return bool(array[byte_idx] & (1 << bit_idx))
 
 
-def _find_keyboards() -> list[Path]:
-    """Find /dev/input/event* devices that have KEY_F5 capability."""
-    keyboards = []
-    input_dir = Path("/dev/input")
-    if not input_dir.exists():
-        return keyboards
-
-    for dev in sorted(input_dir.glob("event*")):
-        try:
-            fd = os.open(str(dev), os.O_RDONLY | os.O_NONBLOCK)
-        except OSError:
-            continue
-        try:
-            # Query EV_KEY capability bitmap — 96 bytes = 768 bits,
-            # more than enough for KEY_F5 (63)
-            buf = bytearray(96)
-            fcntl.ioctl(fd, _eviocgbit(EV_KEY, len(buf)), buf)
-            if _test_bit(buf, KEY_F5):
-                keyboards.append(dev)
-        except OSError:
-            pass
-        finally:
-            os.close(fd)
+def _cache_path() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "amicachy", "keyboards")
+
+
+def _read_sysfs(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
 
-    return keyboards
 
+def _identity(event: str) -> str:
+    """Stable identity of an event node (event numbers change across boots)."""
+    device = f"{SYSFS_INPUT_DIR}/{event}/device"
+    return "|".join((
+        _read_sysfs(f"{device}/name"),
+        _read_sysfs(f"{device}/phys"),
+        _read_sysfs(f"{device}/id/vendor"),
+        _read_sysfs(f"{device}/id/product"),
+    ))
 
-def _check_key(dev: Path) -> bool:
-    """Return True if F5 is currently pressed on the given device."""
+
+def _has_f5(event: str) -> bool:
+    """Check KEY_F5 capability from sysfs, falling back to EVIOCGBIT."""
+    words = _read_sysfs(f"{SYSFS_INPUT_DIR}/{event}/device/capabilities/key").split()
+    if words:
+        # Hex longs, most significant first
+        bits = 0
+        for word in words:
+            bits = (bits << 64) | int(word, 16)
+        return bool(bits >> KEY_F5 & 1)
     try:
-        fd = os.open(str(dev), os.O_RDONLY | os.O_NONBLOCK)
+        fd = os.open(f"{INPUT_DIR}/{event}", os.O_RDONLY | os.O_NONBLOCK)
     except OSError:
         return False
     try:
+        # Query EV_KEY capability bitmap — 96 bytes = 768 bits,
+        # more than enough for KEY_F5 (63)
         buf = bytearray(96)
-        fcntl.ioctl(fd, _eviocgkey(len(buf)), buf)
+        fcntl.ioctl(fd, _eviocgbit(EV_KEY, len(buf)), buf)
         return _test_bit(buf, KEY_F5)
     except OSError:
         return False
@@ -86,19 +125,202 @@ def _check_key(dev: Path) -> bool:
         os.close(fd)
 
 
-def main() -> int:
+def _load_cache(path: str) -> dict[str, bool]:
+    cache: dict[str, bool] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                flag, _, identity = line.rstrip("\n").partition("\t")
+                if identity:
+                    cache[identity] = flag == "1"
+    except OSError:
+        pass
+    return cache
+
+
+def _save_cache(path: str, cache: dict[str, bool]) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            for identity, is_keyboard in sorted(cache.items()):
+                f.write(f"{int(is_keyboard)}\t{identity}\n")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _find_keyboards() -> list[str]:
+    """Return /dev/input/event* paths of devices that have KEY_F5."""
+    try:
+        events = sorted(e for e in os.listdir(INPUT_DIR) if e.startswith("event"))
+    except OSError:
+        return []
+
+    cache_path = _cache_path()
+    cache = _load_cache(cache_path)
+    # Rewritten when devices come or go, so the cache never grows stale
+    current: dict[str, bool] = {}
+    keyboards = []
+    for event in events:
+        identity = _identity(event)
+        if identity not in current:
+            current[identity] = cache[identity] if identity in cache else _has_f5(event)
+        if current[identity]:
+            keyboards.append(f"{INPUT_DIR}/{event}")
+    if current != cache:
+        _save_cache(cache_path, current)
+    return keyboards
+
+
+def _held_keys(fd: int) -> list[str]:
+    """Return the hotkeys currently pressed on the device."""
+    try:
+        buf = bytearray(96)
+        fcntl.ioctl(fd, _eviocgkey(len(buf)), buf)
+    except OSError:
+        return []
+    return [name for name, code in HOTKEYS.items() if _test_bit(buf, code)]
+
+
+def _pressed_keys(fd: int) -> list[str]:
+    """Drain pending events; return hotkeys pressed (or autorepeating)."""
+    try:
+        data = os.read(fd, _EVENT.size * 64)
+    except OSError:
+        return []
+    pressed = []
+    for offset in range(0, len(data) - _EVENT.size + 1, _EVENT.size):
+        _, _, typ, code, value = _EVENT.unpack_from(data, offset)
+        if typ == EV_KEY and value in (1, 2):
+            pressed += [name for name, key in HOTKEYS.items() if key == code]
+    return pressed
+
+
+class _Watcher:
+    """Keyboards opened once and watched together with epoll."""
+
+    def __init__(self):
+        self.poller = select.epoll()
+        self.fds: dict[str, int] = {}
+
+    def add(self, devices: list[str]) -> list[str]:
+        """Open new devices; return hotkeys already held on them."""
+        held = []
+        for dev in devices:
+            if dev in self.fds:
+                continue
+            try:
+                fd = os.open(dev, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                continue
+            self.fds[dev] = fd
+            self.poller.register(fd, select.EPOLLIN)
+            held += _held_keys(fd)
+        return held
+
+    def poll(self, timeout_s: float) -> list[str]:
+        """Wait up to ``timeout_s`` for events; return hotkeys pressed."""
+        pressed = []
+        for fd, mask in self.poller.poll(max(timeout_s, 0)):
+            pressed += _pressed_keys(fd)
+            if mask & (select.EPOLLERR | select.EPOLLHUP):
+                # Unplugged: forget it, so a replug is picked up again
+                self.poller.unregister(fd)
+                os.close(fd)
+                self.fds = {dev: f for dev, f in self.fds.items() if f != fd}
+        return pressed
+
+    def close(self) -> None:
+        for fd in self.fds.values():
+            os.close(fd)
+        self.poller.close()
+
+
+def wait_for_f5(devices: list[str], window_s: float) -> bool:
+    """Return True if F5 is held now or pressed within ``window_s``."""
+    watcher = _Watcher()
+    try:
+        if "F5" in watcher.add(devices):
+            return True
+        deadline = time.monotonic() + window_s
+        while watcher.fds:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if "F5" in watcher.poll(remaining):
+                return True
+        return False
+    finally:
+        watcher.close()
+
+
+def _write_result(path: str, keys: list[str]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write("".join(f"{key}\n" for key in keys))
+    os.replace(tmp, path)
+
+
+def watch(result_path: str, timeout_s: float) -> list[str]:
+    """Service mode: capture boot hotkeys from early boot on.
+
+    ``result_path`` is created empty at once (so readers know the watch
+    is running) and rewritten with the detected hotkeys, one per line.
+    Input devices that appear later (USB keyboards, late drivers) are
+    picked up by rescanning /dev/input.  Returns after the first hotkey
+    or when ``timeout_s`` has passed.
+    """
+    _write_result(result_path, [])
+    watcher = _Watcher()
+    nodes: set[str] = set()
+    deadline = time.monotonic() + timeout_s
+    try:
+        while True:
+            try:
+                current = set(os.listdir(INPUT_DIR))
+            except OSError:
+                current = set()
+            keys: list[str] = []
+            if current != nodes:
+                nodes = current
+                keys += watcher.add(_find_keyboards())
+            remaining = deadline - time.monotonic()
+            if not keys and remaining > 0:
+                keys += watcher.poll(min(RESCAN_S, remaining))
+            if keys:
+                keys = sorted(set(keys))
+                _write_result(result_path, keys)
+                return keys
+            if remaining <= 0:
+                return []
+    finally:
+        watcher.close()
+
+
+def _option(argv: list[str], name: str, default: int) -> int:
+    if name in argv:
+        index = argv.index(name)
+        if index + 1 < len(argv) and argv[index + 1].isdigit():
+            return int(argv[index + 1])
+    return default
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if "--watch" in argv:
+        index = argv.index("--watch")
+        result_path = RESULT_PATH
+        if index + 1 < len(argv) and not argv[index + 1].startswith("--"):
+            result_path = argv[index + 1]
+        watch(result_path, _option(argv, "--timeout-ms", WATCH_TIMEOUT_MS) / 1000)
+        return 0
+    window_ms = _option(argv, "--window-ms", DEFAULT_WINDOW_MS)
     keyboards = _find_keyboards()
     if not keyboards:
         return 1
-
-    # Sample 5 times over 500ms — F5 must be held on at least one sample.
-    for _ in range(5):
-        for dev in keyboards:
-            if _check_key(dev):
-                return 0
-        time.sleep(0.1)
-
-    return 1
+    return 0 if wait_for_f5(keyboards, window_ms / 1000) else 1
 
 
 if __name__ == "__main__":
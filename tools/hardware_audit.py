@@ -33,9 +33,22 @@ from PySide6.QtWidgets import (
 # Hardware detection helpers
 # ---------------------------------------------------------------------------
 
+CPU_VENDORS = {"GenuineIntel": "intel", "AuthenticAMD": "amd"}
+
+# PCI vendor IDs of display devices
+GPU_VENDORS = {
+    "0x1002": "amd",
+    "0x8086": "intel",
+    "0x10de": "nvidia",
+    "0x1af4": "virtio",
+    "0x15ad": "vmware",
+    "0x1234": "qemu",
+}
+
+
 def read_cpuinfo() -> dict:
     """Parse /proc/cpuinfo and return a dict with relevant fields."""
-    info: dict = {"model": "Unknown", "flags": [], "cores": 0, "threads": 0}
+    info: dict = {"model": "Unknown", "vendor": "", "flags": [], "cores": 0, "threads": 0}
     try:
         text = Path("/proc/cpuinfo").read_text()
         processors = text.strip().split("\n\n")
@@ -49,6 +62,8 @@ def read_cpuinfo() -> dict:
                 value = value.strip()
                 if key == "model name":
                     info["model"] = value
+                elif key == "vendor_id":
+                    info["vendor"] = CPU_VENDORS.get(value, value.lower())
                 elif key == "flags":
                     info["flags"] = value.split()
                 elif key == "core id":
@@ -59,6 +74,37 @@ def read_cpuinfo() -> dict:
     return info
 
 
+def detect_gpu_vendors() -> list[str]:
+    """Return the vendors of all DRM display devices (hybrid: several)."""
+    vendors: list[str] = []
+    for card in sorted(Path("/sys/class/drm").glob("card[0-9]*")):
+        if "-" in card.name:  # connectors, e.g. card0-HDMI-A-1
+            continue
+        try:
+            vendor_id = (card / "device" / "vendor").read_text().strip()
+        except OSError:
+            continue
+        vendor = GPU_VENDORS.get(vendor_id)
+        if vendor and vendor not in vendors:
+            vendors.append(vendor)
+    return vendors
+
+
+def read_meminfo() -> dict:
+    """Parse /proc/meminfo and return total/available memory in KiB."""
+    info: dict = {"total_kib": 0, "available_kib": 0}
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key == "MemTotal":
+                info["total_kib"] = int(value.split()[0])
+            elif key == "MemAvailable":
+                info["available_kib"] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return info
+
+
 def detect_arch_level(flags: list[str]) -> str:
     """Determine x86-64 architecture level from CPU flags."""
     has = set(flags)
@@ -112,6 +158,33 @@ def run_benchmark(duration_s: float = 3.0) -> dict:
     }
 
 
+def measure_sched_latency(duration_s: float = 1.0, period_us: int = 1000) -> dict:
+    """Timer wakeup latency of a periodic thread, like cyclictest.
+
+    Sleeps to absolute deadlines ``period_us`` apart and records how late
+    each wakeup is: the delay an audio thread sees before it can refill
+    its buffer.  Measured as a normal (not realtime) thread, so it is an
+    upper bound of what a realtime audio server gets.
+    """
+    period_ns = period_us * 1000
+    late_us: list[float] = []
+    deadline = time.monotonic_ns() + period_ns
+    end = deadline + int(duration_s * 1e9)
+    while deadline < end:
+        delay = deadline - time.monotonic_ns()
+        if delay > 0:
+            time.sleep(delay / 1e9)
+        late_us.append(max(0, time.monotonic_ns() - deadline) / 1000)
+        deadline += period_ns
+    late_us.sort()
+    return {
+        "samples": len(late_us),
+        "median_us": round(late_us[len(late_us) // 2]),
+        "p99_us": round(late_us[min(len(late_us) - 1, len(late_us) * 99 // 100)]),
+        "max_us": round(late_us[-1]),
+    }
+
+
 # ---------------------------------------------------------------------------
 # Profile recommendation
 # ---------------------------------------------------------------------------
@@ -340,7 +413,10 @@ class AuditWindow(QMainWindow):
                 "cores": self._cpuinfo["cores"],
                 "threads": self._cpuinfo["threads"],
                 "arch_level": self._arch_level,
+                "vendor": self._cpuinfo["vendor"],
             },
+            "gpu": {"vendors": detect_gpu_vendors()},
+            "memory": read_meminfo(),
             "virtualization": self._virt,
             "benchmark": self._bench_result,
             "profiles": self._profiles,
@@ -0,0 +1,133 @@
+"""Per-profile PipeWire and WirePlumber settings for the emulators.
+
+The UAE configs ask for exact-rate output (``sound_output=exact``) at
+44.1 or 48 kHz, while PipeWire's defaults (a 1024-frame quantum at 48 kHz)
+add latency, resample 44.1 kHz streams, and leave the audio server's
+realtime priority unrelated to the SCHED_FIFO emulation threads of
+launcher/rtsched.py.  For each selected emulation profile the installer
+writes drop-ins under AUDIO_DIR/<profile>/, relative to the user's
+~/.config, which amilaunch.sh links into place before the session:
+
+- pipewire.conf.d: graph rate of the UAE ``sound_frequency``, a quantum
+  sized from the audited scheduling latency, and the RT module with a
+  priority above the profile's emulation threads.
+- pipewire-pulse.conf.d: the same buffer size for PulseAudio clients.
+- wireplumber.conf.d: ALSA period size to match, no suspend on silence.
+
+The quantum is the shortest power of two whose period leaves a margin
+over the p99 wakeup latency measured during the audit, and no shorter
+than the profile's minimum.  bench/audio_latency.py measures the result.
+"""
+
+from launcher.rtsched import RT_PROFILES
+from launcher.uae import profile_config
+
+AUDIO_DIR = "/etc/amicachy/audio"
+DROPIN_NAME = "60-amicachy.conf"
+
+# Shortest buffer period per profile, in ms: PPC keeps both emulator
+# CPUs busy, leaving less slack for the audio server
+AUDIO_PROFILES = {
+    "classic_68k": {"min_period_ms": 2.0},
+    "ppc_nitro": {"min_period_ms": 4.0},
+}
+DEFAULT_RATE = 48000
+# Period = at least this many times the p99 scheduling latency
+LATENCY_MARGIN = 4
+# Assumed when the audit has no measurement
+DEFAULT_P99_US = 1000
+MIN_QUANTUM = 64
+MAX_QUANTUM = 2048
+# Audio server priority above the profile's highest emulation thread
+RT_PRIO_ABOVE_EMULATOR = 10
+RT_PRIO_MAX = 88
+
+
+def profile_rate(profile: str, uae_dir: str) -> int:
+    """The UAE config's sound_frequency, or DEFAULT_RATE."""
+    value = profile_config(profile, uae_dir).get("sound_frequency", "")
+    return int(value) if value.isdigit() else DEFAULT_RATE
+
+
+def select_quantum(profile: str, rate: int, audit: dict) -> int:
+    """Quantum in frames for ``profile`` on the audited machine."""
+    p99_us = audit.get("sched_latency", {}).get("p99_us") or DEFAULT_P99_US
+    period_s = max(
+        AUDIO_PROFILES[profile]["min_period_ms"] / 1000,
+        LATENCY_MARGIN * p99_us / 1e6,
+    )
+    # With one or two cores the emulator competes with the audio server
+    if audit.get("cpu", {}).get("cores", 0) in (1, 2):
+        period_s *= 2
+    quantum = MIN_QUANTUM
+    while quantum < rate * period_s and quantum < MAX_QUANTUM:
+        quantum *= 2
+    return quantum
+
+
+def rt_priority(profile: str) -> int:
+    """RT priority of the audio server: above every emulation thread."""
+    prios = [value for policy, value, _ in RT_PROFILES.get(profile, {}).values()
+             if policy != "other"]
+    return min(max(prios, default=0) + RT_PRIO_ABOVE_EMULATOR, RT_PRIO_MAX)
+
+
+def audio_dropins(profile: str, audit: dict, uae_dir: str) -> dict[str, str]:
+    """Return {path relative to ~/.config: content} for ``profile``."""
+    rate = profile_rate(profile, uae_dir)
+    quantum = select_quantum(profile, rate, audit)
+    rates = " ".join(str(r) for r in sorted({rate, 44100, 48000}))
+    p99 = audit.get("sched_latency", {}).get("p99_us")
+    header = (
+        f"# Generated by the AmiCachy installer for {profile}: {quantum} frames at "
+        f"{rate} Hz ({quantum * 1000 / rate:.1f} ms), "
+        + (f"scheduling latency p99 {p99} us\n" if p99 is not None else "no latency audit\n")
+    )
+    pipewire = header + f"""\
+context.properties = {{
+    default.clock.rate          = {rate}
+    default.clock.allowed-rates = [ {rates} ]
+    default.clock.quantum       = {quantum}
+    default.clock.min-quantum   = {quantum}
+    default.clock.max-quantum   = {quantum * 4}
+    # Replaces the default RT module with the one below
+    module.rt                   = false
+}}
+
+context.modules = [
+    {{  name = libpipewire-module-rt
+        args = {{
+            nice.level   = -11
+            rt.prio      = {rt_priority(profile)}
+            rt.time.soft = -1
+            rt.time.hard = -1
+        }}
+        flags = [ ifexists nofail ]
+    }}
+]
+"""
+    pulse = header + f"""\
+pulse.properties = {{
+    pulse.min.req     = {quantum}/{rate}
+    pulse.default.req = {quantum}/{rate}
+    pulse.min.quantum = {quantum}/{rate}
+}}
+"""
+    wireplumber = header + f"""\
+monitor.alsa.rules = [
+    {{
+        matches = [ {{ node.name = "~alsa_output.*" }} ]
+        actions = {{
+            update-props = {{
+                api.alsa.period-size            = {quantum}
+                session.suspend-timeout-seconds = 0
+            }}
+        }}
+    }}
+]
+"""
+    return {
+        f"pipewire/pipewire.conf.d/{DROPIN_NAME}": pipewire,
+        f"pipewire/pipewire-pulse.conf.d/{DROPIN_NAME}": pulse,
+        f"wireplumber/wireplumber.conf.d/{DROPIN_NAME}": wireplumber,
+    }
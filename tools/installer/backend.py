@@ -5,90 +5,247 @@ setup are encapsulated here. Every command runs through CommandRunner
 for consistent logging and error handling.
 """
 
+import asyncio
+import atexit
 import os
 import shutil
+import signal
 import subprocess
+import threading
 import time
+from collections import deque
 from pathlib import Path
-from typing import Callable
+from typing import Awaitable, Callable
 
+from launcher.hugepages import SMALL_GUEST_MIB, profile_ram_mib, thp_tmpfiles
+
+from .audio import AUDIO_DIR, AUDIO_PROFILES, audio_dropins
 from .resources import (
+    AMICACHY_TOOLS_DIR,
     AMIGA_DIRS,
     BOOT_ENTRIES,
     CACHYOS_GPG_KEY,
+    CACHYOS_KEY_FILE,
+    CACHYOS_KEYRING,
     INSTALLER_DATA_DIR,
     INSTALL_LOG_PATH,
+    FALLBACK_ENTRY,
+    GENERATED_PACMAN_CONF,
+    HOTKEY_SERVICE,
+    HUGEPAGES_TMPFILES,
+    INITRAMFS_COMPRESSIONS,
     LOADER_CONF_TEMPLATE,
+    MKINITCPIO_CONF_TEMPLATE,
+    MKINITCPIO_PRESET_TEMPLATE,
     MOUNTPOINT,
+    PACMAN_GNUPG_DIR,
+    PLYMOUTHD_CONF,
+    READAHEAD_SERVICE,
+    READAHEAD_TMPFILES,
+    TARGET_CACHE_DIR,
+    TUNING_HELPER,
+    TUNING_SUDOERS,
+)
+from .mirrors import MIRRORLIST_DIR
+from .repos import write_pacman_conf
+from .storage import (
+    FS_PROFILES,
+    mkfs_command,
+    partition_bounds,
+    udev_scheduler_rules,
+    writeback_sysctl,
 )
+from .swap import benchmark_zram, select_algorithm, zram_generator_conf, zram_sysctl
+
+# Markers in command output that indicate a download/network failure
+NETWORK_ERROR_MARKERS = ("could not resolve", "connection", "failed retrieving file")
 
 
 class InstallError(Exception):
     """Base exception for installation failures."""
 
-    def __init__(self, message: str, step: str = "", recoverable: bool = False):
+    def __init__(
+        self,
+        message: str,
+        step: str = "",
+        recoverable: bool = False,
+        output_tail: list[str] | None = None,
+    ):
         super().__init__(message)
         self.step = step
         self.recoverable = recoverable
+        # Last lines of command output, kept for error analysis
+        self.output_tail = output_tail or []
 
 
 class NetworkError(InstallError):
     """Network-related failures (pacstrap download)."""
 
-    def __init__(self, message: str):
-        super().__init__(message, step="pacstrap", recoverable=True)
+    def __init__(self, message: str, output_tail: list[str] | None = None):
+        super().__init__(
+            message, step="pacstrap", recoverable=True, output_tail=output_tail
+        )
+
+
+def _looks_like_network_error(lines: list[str]) -> bool:
+    """Return True if any output line matches a known network failure."""
+    return any(
+        marker in line.lower()
+        for line in lines
+        for marker in NETWORK_ERROR_MARKERS
+    )
+
+
+def _command_env(env: dict | None) -> dict:
+    """Build the environment for installer subprocesses."""
+    merged_env = os.environ.copy()
+    if env:
+        merged_env.update(env)
+    # Prevent interactive GPG prompts under Cage
+    merged_env["DISPLAY"] = ""
+    merged_env.pop("GPG_TTY", None)
+    return merged_env
 
 
 class CommandRunner:
-    """Runs shell commands with real-time output streaming."""
+    """Runs shell commands with real-time output streaming.
+
+    Output is streamed to the log callback and the install log as it
+    arrives.  Only the last ``TAIL_LINES`` lines are retained per command
+    (for error analysis) unless the caller asks for ``capture=True``.
+    The log file is written through a buffer that is flushed every
+    ``FLUSH_INTERVAL_S`` seconds, after every command, and on exit.
+
+    Commands run in their own process group so that ``abort()`` (called
+    from another thread, e.g. the pressure monitor) can stop them; every
+    command running or started while aborted raises InstallError.
+
+    A runner is used from one thread at a time: work running concurrently
+    gets its own runner, whose ``tag`` prefixes its log lines.
+    """
+
+    TAIL_LINES = 200
+    FLUSH_INTERVAL_S = 1.0
 
-    def __init__(self, log_callback: Callable[[str], None]):
+    def __init__(self, log_callback: Callable[[str], None], tag: str = ""):
         self.log = log_callback
-        self._log_file = open(INSTALL_LOG_PATH, "a")
+        self._prefix = f"[{tag}] " if tag else ""
+        self._log_file = open(INSTALL_LOG_PATH, "a", buffering=64 * 1024)
+        self._last_flush = time.monotonic()
+        self.abort_reason = ""
+        self._pgids: set[int] = set()
+        self._pgid_lock = threading.Lock()
+        # Guarantee buffered log lines reach disk even if the installer dies
+        atexit.register(self.close)
 
     def close(self):
+        if self._log_file.closed:
+            return
+        self._log_file.flush()
         self._log_file.close()
+        atexit.unregister(self.close)
+
+    def flush(self) -> None:
+        if not self._log_file.closed:
+            self._log_file.flush()
+        self._last_flush = time.monotonic()
+
+    def abort(self, reason: str) -> None:
+        """Terminate running commands and fail them with ``reason``."""
+        with self._pgid_lock:
+            if self.abort_reason:
+                return
+            self.abort_reason = reason
+            pgids = list(self._pgids)
+        for pgid in pgids:
+            try:
+                os.killpg(pgid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def clear_abort(self) -> None:
+        """Allow commands again, e.g. for cleanup after an abort."""
+        self.abort_reason = ""
+
+    def check_abort(self) -> None:
+        if self.abort_reason:
+            raise InstallError(self.abort_reason, step="resources")
+
+    def _track(self, pgid: int) -> None:
+        with self._pgid_lock:
+            self._pgids.add(pgid)
+        # abort() may have run between the spawn and the registration
+        if self.abort_reason:
+            try:
+                os.killpg(pgid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _untrack(self, pgid: int) -> None:
+        with self._pgid_lock:
+            self._pgids.discard(pgid)
+
+    def note(self, line: str) -> None:
+        """Report an installer message (not command output) like a log line."""
+        self._write_log(line)
 
     def _write_log(self, line: str) -> None:
+        line = self._prefix + line
         self.log(line)
         self._log_file.write(line + "\n")
-        self._log_file.flush()
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL_S:
+            self.flush()
 
     def run(
         self,
         cmd: list[str],
         check: bool = True,
         env: dict | None = None,
+        capture: bool = False,
+        on_line: Callable[[str], None] | None = None,
     ) -> subprocess.CompletedProcess:
-        """Run a command, streaming stdout/stderr line by line."""
-        self._write_log(f">>> {' '.join(cmd)}")
-        merged_env = os.environ.copy()
-        if env:
-            merged_env.update(env)
-        # Prevent interactive GPG prompts under Cage
-        merged_env["DISPLAY"] = ""
-        merged_env.pop("GPG_TTY", None)
+        """Run a command, streaming stdout/stderr line by line.
 
+        The returned ``stdout`` holds the full output when ``capture`` is
+        set, otherwise only the retained tail.  ``on_line`` additionally
+        receives every output line (e.g. for progress parsing).
+        """
+        self.check_abort()
+        self._write_log(f">>> {' '.join(cmd)}")
         proc = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
-            env=merged_env,
+            env=_command_env(env),
+            start_new_session=True,
         )
-        output_lines: list[str] = []
-        for line in proc.stdout:
-            line = line.rstrip("\n")
-            output_lines.append(line)
-            self._write_log(line)
-        proc.wait()
-
+        self._track(proc.pid)
+        tail: deque[str] = deque(maxlen=self.TAIL_LINES)
+        captured: list[str] | None = [] if capture else None
+        try:
+            for line in proc.stdout:
+                line = line.rstrip("\n")
+                tail.append(line)
+                if captured is not None:
+                    captured.append(line)
+                self._write_log(line)
+                if on_line is not None:
+                    on_line(line)
+            proc.wait()
+        finally:
+            self._untrack(proc.pid)
+            self.flush()
+
+        self.check_abort()
         if check and proc.returncode != 0:
             raise InstallError(
-                f"Command failed (exit {proc.returncode}): {' '.join(cmd)}"
+                f"Command failed (exit {proc.returncode}): {' '.join(cmd)}",
+                output_tail=list(tail),
             )
+        output = captured if captured is not None else tail
         return subprocess.CompletedProcess(
-            cmd, proc.returncode, "\n".join(output_lines), ""
+            cmd, proc.returncode, "\n".join(output), ""
         )
 
     def run_chroot(
@@ -98,6 +255,135 @@ class CommandRunner:
         return self.run(["arch-chroot", MOUNTPOINT] + cmd, check=check)
 
 
+class AsyncCommandRunner:
+    """Supervises several subprocesses concurrently on an asyncio loop.
+
+    Shares the log sink of a CommandRunner.  Every output line is prefixed
+    with the job tag so interleaved streams stay readable.  Each command
+    runs in its own process group, which is terminated on timeout or
+    cancellation.  Failures raise InstallError (or NetworkError for jobs
+    marked ``network=True``) exactly like CommandRunner.
+    """
+
+    KILL_GRACE_S = 5.0
+    LINE_LIMIT = 1024 * 1024
+
+    def __init__(self, runner: CommandRunner, max_parallel: int = 4):
+        self.runner = runner
+        self.max_parallel = max_parallel
+        self._slots = asyncio.Semaphore(max_parallel)
+
+    async def run(
+        self,
+        cmd: list[str],
+        tag: str = "",
+        check: bool = True,
+        env: dict | None = None,
+        timeout: float | None = None,
+        capture: bool = False,
+        network: bool = False,
+    ) -> subprocess.CompletedProcess:
+        """Run a command, streaming its output with a ``[tag]`` prefix."""
+        prefix = f"[{tag}] " if tag else ""
+        tail: deque[str] = deque(maxlen=self.runner.TAIL_LINES)
+        captured: list[str] | None = [] if capture else None
+
+        async with self._slots:
+            self.runner.check_abort()
+            self.runner._write_log(f"{prefix}>>> {' '.join(cmd)}")
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=_command_env(env),
+                start_new_session=True,
+                limit=self.LINE_LIMIT,
+            )
+            self.runner._track(proc.pid)
+
+            async def pump() -> None:
+                async for raw in proc.stdout:
+                    line = raw.decode(errors="replace").rstrip("\n")
+                    tail.append(line)
+                    if captured is not None:
+                        captured.append(line)
+                    self.runner._write_log(prefix + line)
+                await proc.wait()
+
+            try:
+                await asyncio.wait_for(pump(), timeout)
+            except asyncio.TimeoutError:
+                await self._terminate(proc)
+                error_cls = NetworkError if network else InstallError
+                raise error_cls(
+                    f"Command timed out after {timeout:g}s: {' '.join(cmd)}",
+                    output_tail=list(tail),
+                )
+            except BaseException:
+                # Cancellation, or a failure reading the output (a line over
+                # LINE_LIMIT): the process group must not run on detached
+                await self._terminate(proc)
+                raise
+            finally:
+                self.runner._untrack(proc.pid)
+                self.runner.flush()
+
+        self.runner.check_abort()
+        if check and proc.returncode != 0:
+            message = f"Command failed (exit {proc.returncode}): {' '.join(cmd)}"
+            if network and _looks_like_network_error(list(tail)):
+                raise NetworkError(message, output_tail=list(tail))
+            raise InstallError(message, output_tail=list(tail))
+        output = captured if captured is not None else tail
+        return subprocess.CompletedProcess(
+            cmd, proc.returncode, "\n".join(output), ""
+        )
+
+    async def run_chroot(
+        self, cmd: list[str], tag: str = "", check: bool = True
+    ) -> subprocess.CompletedProcess:
+        """Run a command inside arch-chroot at MOUNTPOINT."""
+        return await self.run(["arch-chroot", MOUNTPOINT] + cmd, tag=tag, check=check)
+
+    async def _terminate(self, proc: asyncio.subprocess.Process) -> None:
+        """SIGTERM the process group, escalating to SIGKILL after a grace period."""
+        if proc.returncode is not None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), self.KILL_GRACE_S)
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    def gather(self, *jobs: Awaitable) -> list:
+        """Run coroutines concurrently from synchronous code.
+
+        Returns their results in order.  The first failure cancels the
+        remaining jobs (killing their process groups) and is re-raised.
+        """
+        return asyncio.run(self._gather(jobs))
+
+    async def _gather(self, jobs) -> list:
+        # A semaphore binds to the loop it is first used on; each gather()
+        # call runs its own loop.
+        self._slots = asyncio.Semaphore(self.max_parallel)
+        tasks = [asyncio.ensure_future(job) for job in jobs]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
 def _write_file(path: str, content: str) -> None:
     """Write content to a file, creating parent directories."""
     Path(path).parent.mkdir(parents=True, exist_ok=True)
@@ -109,29 +395,41 @@ def _write_file(path: str, content: str) -> None:
 # ---------------------------------------------------------------------------
 
 
-def partition_disk(runner: CommandRunner, device: str) -> dict[str, str]:
-    """Create GPT partition table with EFI, Root, and Data partitions."""
+def partition_disk(
+    runner: CommandRunner, device: str, fs_profile: str = "ssd"
+) -> dict[str, str]:
+    """Create GPT partition table with EFI, Root, and Data partitions.
+
+    Partition boundaries follow the device's optimal I/O alignment and the
+    root/data filesystems are created per the storage profile.
+    """
+    profile = FS_PROFILES[fs_profile]
+    bounds = partition_bounds(device)
+
     runner.run(["wipefs", "--all", "--force", device])
     runner.run(["parted", "-s", device, "mklabel", "gpt"])
 
     # EFI: 512 MiB
     runner.run(
-        ["parted", "-s", device, "mkpart", "EFI", "fat32", "1MiB", "513MiB"]
+        ["parted", "-s", "-a", "optimal", device, "mkpart", "EFI", "fat32",
+         *bounds["efi"]]
     )
     runner.run(["parted", "-s", device, "set", "1", "esp", "on"])
 
-    # Root: from 513MiB to 60% of disk
+    # Root: up to 60% of disk
     runner.run(
-        ["parted", "-s", device, "mkpart", "AMICACHY", "ext4", "513MiB", "60%"]
+        ["parted", "-s", "-a", "optimal", device, "mkpart", "AMICACHY",
+         profile["root_fs"], *bounds["root"]]
     )
 
     # Data: remainder
     runner.run(
-        ["parted", "-s", device, "mkpart", "AMIGADATA", "ext4", "60%", "100%"]
+        ["parted", "-s", "-a", "optimal", device, "mkpart", "AMIGADATA",
+         profile["data_fs"], *bounds["data"]]
     )
 
-    # Determine partition device paths (nvme vs sata naming)
-    sep = "p" if ("nvme" in device or "mmcblk" in device) else ""
+    # Determine partition device paths (nvme/mmc/loop vs sata naming)
+    sep = "p" if any(k in device for k in ("nvme", "mmcblk", "loop")) else ""
     partitions = {
         "efi": f"{device}{sep}1",
         "root": f"{device}{sep}2",
@@ -142,32 +440,144 @@ def partition_disk(runner: CommandRunner, device: str) -> dict[str, str]:
     runner.run(["partprobe", device])
     time.sleep(1)
 
-    # Format
-    runner.run(["mkfs.fat", "-F", "32", "-n", "AMIEFI", partitions["efi"]])
-    runner.run(["mkfs.ext4", "-F", "-L", "AMICACHY", partitions["root"]])
-    runner.run(["mkfs.ext4", "-F", "-L", "AMIGADATA", partitions["data"]])
+    # Format — independent devices, so the mkfs jobs run concurrently
+    parallel = AsyncCommandRunner(runner)
+    parallel.gather(
+        parallel.run(
+            ["mkfs.fat", "-F", "32", "-n", "AMIEFI", partitions["efi"]], tag="efi"
+        ),
+        parallel.run(
+            mkfs_command(profile["root_fs"], "AMICACHY", partitions["root"],
+                         profile["root_mkfs"]),
+            tag="root",
+        ),
+        parallel.run(
+            mkfs_command(profile["data_fs"], "AMIGADATA", partitions["data"],
+                         profile["data_mkfs"]),
+            tag="data",
+        ),
+    )
 
     return partitions
 
 
-def mount_filesystems(runner: CommandRunner, partitions: dict[str, str]) -> None:
-    """Mount root, EFI, and data partitions under MOUNTPOINT."""
-    runner.run(["mount", partitions["root"], MOUNTPOINT])
+def mount_filesystems(
+    runner: CommandRunner, partitions: dict[str, str], fs_profile: str = "ssd"
+) -> None:
+    """Mount root, EFI, and data partitions under MOUNTPOINT.
+
+    Mount options come from the storage profile; genfstab later copies
+    them into the installed system's fstab.
+    """
+    profile = FS_PROFILES[fs_profile]
+    runner.run(
+        ["mount", "-o", profile["root_options"], partitions["root"], MOUNTPOINT]
+    )
     runner.run(["mkdir", "-p", f"{MOUNTPOINT}/boot"])
-    runner.run(["mount", partitions["efi"], f"{MOUNTPOINT}/boot"])
+    runner.run(["mount", "-o", "noatime", partitions["efi"], f"{MOUNTPOINT}/boot"])
     runner.run(["mkdir", "-p", f"{MOUNTPOINT}/home/amiga/Amiga"])
-    runner.run(["mount", partitions["data"], f"{MOUNTPOINT}/home/amiga/Amiga"])
+    runner.run(
+        ["mount", "-o", profile["data_options"], partitions["data"],
+         f"{MOUNTPOINT}/home/amiga/Amiga"]
+    )
 
 
-def setup_pacman(runner: CommandRunner) -> None:
-    """Import CachyOS GPG key for package verification."""
-    runner.run(
-        ["pacman-key", "--recv-keys", CACHYOS_GPG_KEY], check=False
+def stage_boot_config(compression: str = "zstd", fallback: bool = False) -> None:
+    """Write the final initramfs and splash configuration before pacstrap.
+
+    The mkinitcpio conf, the linux-cachyos preset and plymouthd.conf are
+    in place before the packages that own them are installed: pacman
+    keeps existing backup files (saving its defaults as .pacnew) and the
+    kernel's install hook only writes a preset if none exists.  The
+    initramfs is therefore built once, during pacstrap, with the final
+    hooks and compression.
+    """
+    mnt = MOUNTPOINT
+    if compression not in INITRAMFS_COMPRESSIONS:
+        raise InstallError(
+            f"Unsupported initramfs compression: {compression}",
+            step="initramfs",
+        )
+
+    _write_file(
+        f"{mnt}/etc/mkinitcpio.conf",
+        MKINITCPIO_CONF_TEMPLATE.format(compression=compression),
     )
-    runner.run(
-        ["pacman-key", "--lsign-key", CACHYOS_GPG_KEY], check=False
+    presets = "'default' 'fallback'" if fallback else "'default'"
+    _write_file(
+        f"{mnt}/etc/mkinitcpio.d/linux-cachyos.preset",
+        MKINITCPIO_PRESET_TEMPLATE.format(presets=presets),
     )
 
+    # Plymouth boot splash (the plymouth hook embeds the configured theme)
+    plymouth_src = "/usr/share/plymouth/themes/amicachy"
+    if Path(plymouth_src).is_dir():
+        shutil.copytree(
+            plymouth_src,
+            f"{mnt}/usr/share/plymouth/themes/amicachy",
+            dirs_exist_ok=True,
+        )
+    _write_file(f"{mnt}/etc/plymouth/plymouthd.conf", PLYMOUTHD_CONF)
+
+
+def setup_pacman(runner: CommandRunner) -> None:
+    """Trust the CachyOS signing key, using local key material only.
+
+    Populates from the live system's cachyos-keyring package, or imports
+    the key bundled with the installer data; no keyserver is contacted.
+    pacstrap copies the resulting keyring into the target.  Raises
+    InstallError if the key is unavailable or not trusted afterwards.
+    """
+    # archiso's pacman-init.service creates the keyring at boot; starting it
+    # waits for a run still in progress (no-op outside the live ISO)
+    runner.run(["systemctl", "start", "pacman-init.service"], check=False)
+    if not Path(PACMAN_GNUPG_DIR, "pubring.gpg").exists():
+        runner.run(["pacman-key", "--init"])
+
+    if Path(CACHYOS_KEYRING).exists():
+        runner.run(["pacman-key", "--populate", "cachyos"])
+    elif Path(CACHYOS_KEY_FILE).exists():
+        runner.run(["pacman-key", "--add", CACHYOS_KEY_FILE])
+        runner.run(["pacman-key", "--lsign-key", CACHYOS_GPG_KEY])
+    else:
+        raise InstallError(
+            "No CachyOS signing key available (cachyos-keyring is not "
+            f"installed and {CACHYOS_KEY_FILE} is missing)",
+            step="pacman",
+        )
+    verify_signing_key(runner)
+
+
+def verify_signing_key(runner: CommandRunner, fingerprint: str = CACHYOS_GPG_KEY) -> None:
+    """Check that ``fingerprint`` is in pacman's keyring with full trust."""
+    result = runner.run(
+        [
+            "gpg", "--homedir", PACMAN_GNUPG_DIR, "--batch", "--with-colons",
+            "--fingerprint", fingerprint,
+        ],
+        check=False,
+        capture=True,
+    )
+    validity = ""
+    for line in result.stdout.splitlines():
+        fields = line.split(":")
+        if fields[0] == "pub":
+            validity = fields[1]
+        elif fields[0] == "fpr" and fields[9] == fingerprint:
+            break
+    else:
+        raise InstallError(
+            f"CachyOS signing key {fingerprint} is not in the pacman keyring",
+            step="pacman",
+        )
+    # f = full, u = ultimate; anything else means it was not locally signed
+    if validity not in ("f", "u"):
+        raise InstallError(
+            f"CachyOS signing key {fingerprint} is not trusted "
+            f"(validity '{validity or '?'}')",
+            step="pacman",
+        )
+
 
 def read_package_list(packages_file: str) -> list[str]:
     """Read package names from packages.x86_64, skipping comments."""
@@ -180,30 +590,77 @@ def read_package_list(packages_file: str) -> list[str]:
     return packages
 
 
-def run_pacstrap(runner: CommandRunner, packages: list[str]) -> None:
-    """Install packages to target using pacstrap with CachyOS repos."""
+def installer_pacman_conf(arch_level: str = "") -> str:
+    """Path of the pacman.conf used to install the target system.
+
+    With ``arch_level`` (from the hardware audit) the bundled config is
+    rewritten for that level's optimized repository first.
+    """
     pacman_conf = f"{INSTALLER_DATA_DIR}/pacman.conf"
     # Fallback to system pacman.conf if installer data not present
     if not Path(pacman_conf).exists():
         pacman_conf = "/etc/pacman.conf"
+    if not arch_level:
+        return pacman_conf
+    return write_pacman_conf(pacman_conf, GENERATED_PACMAN_CONF, arch_level, MIRRORLIST_DIR)
+
+
+def run_pacstrap(
+    runner: CommandRunner,
+    packages: list[str],
+    pacman_conf: str | None = None,
+    on_line: Callable[[str], None] | None = None,
+    cache_dirs: list[str] | None = None,
+) -> None:
+    """Install packages to target using pacstrap with CachyOS repos.
+
+    ``cache_dirs`` are passed to pacman as package caches; pacman looks
+    for packages in all of them and downloads into the first writable one.
+    """
+    if pacman_conf is None:
+        pacman_conf = installer_pacman_conf()
+    cache_args = [f"--cachedir={d}" for d in cache_dirs or []]
     try:
-        runner.run(["pacstrap", "-C", pacman_conf, MOUNTPOINT] + packages)
+        runner.run(
+            ["pacstrap", "-C", pacman_conf, MOUNTPOINT] + packages + cache_args,
+            on_line=on_line,
+        )
     except InstallError as e:
-        error_msg = str(e).lower()
-        if "could not resolve" in error_msg or "connection" in error_msg:
-            raise NetworkError(f"Network error during package installation: {e}")
+        if _looks_like_network_error([str(e)] + e.output_tail):
+            raise NetworkError(
+                f"Network error during package installation: {e}",
+                output_tail=e.output_tail,
+            )
         raise
 
 
 def generate_fstab(runner: CommandRunner) -> None:
-    """Generate /etc/fstab using filesystem labels."""
+    """Generate /etc/fstab using filesystem labels.
+
+    genfstab records the options each filesystem is mounted with, so the
+    storage profile's mount options carry over to the installed system.
+    """
     runner.run(
         ["bash", "-c", f"genfstab -L {MOUNTPOINT} >> {MOUNTPOINT}/etc/fstab"]
     )
 
 
-def configure_system(runner: CommandRunner) -> None:
-    """Post-install system configuration inside chroot."""
+def configure_system(
+    runner: CommandRunner,
+    fs_profile: str = "ssd",
+    mem_total_kib: int = 0,
+    pacman_conf: str | None = None,
+    profiles: list[str] = (),
+    audit: dict | None = None,
+) -> None:
+    """Post-install system configuration inside chroot.
+
+    ``pacman_conf`` is the config pacstrap used (installer_pacman_conf()),
+    installed as the target's /etc/pacman.conf.  ``profiles`` are the
+    selected boot profiles, whose guest RAM sizes the huge page policy.
+    ``audit`` is the hardware audit result; its scheduling latency and CPU
+    data size the audio server's buffers.
+    """
     mnt = MOUNTPOINT
 
     # Timezone
@@ -223,16 +680,18 @@ def configure_system(runner: CommandRunner) -> None:
     # Console
     _write_file(f"{mnt}/etc/vconsole.conf", "KEYMAP=us\nFONT=ter-v16n\n")
 
-    # Pacman config with CachyOS repos
-    src_pacman = f"{INSTALLER_DATA_DIR}/pacman.conf"
+    # Pacman config with CachyOS repos for this CPU level
+    src_pacman = pacman_conf or f"{INSTALLER_DATA_DIR}/pacman.conf"
     if Path(src_pacman).exists():
         shutil.copy2(src_pacman, f"{mnt}/etc/pacman.conf")
 
-    # CachyOS mirrorlists
-    for ml in ("cachyos-mirrorlist", "cachyos-v3-mirrorlist"):
-        src = f"{INSTALLER_DATA_DIR}/{ml}"
-        if Path(src).exists():
-            shutil.copy2(src, f"{mnt}/etc/pacman.d/{ml}")
+    # CachyOS mirrorlists, as ranked on the live system before pacstrap
+    # (pacstrap already copied the Arch mirrorlist)
+    for ml in ("cachyos-mirrorlist", "cachyos-v3-mirrorlist", "cachyos-v4-mirrorlist"):
+        for src in (f"{MIRRORLIST_DIR}/{ml}", f"{INSTALLER_DATA_DIR}/{ml}"):
+            if Path(src).exists():
+                shutil.copy2(src, f"{mnt}/etc/pacman.d/{ml}")
+                break
 
     # Create amiga user
     runner.run_chroot([
@@ -263,6 +722,17 @@ def configure_system(runner: CommandRunner) -> None:
         "amiga  -  nice      -20\n",
     )
 
+    # Per-profile CPU tuning (governor, C-states, IRQ affinity) that
+    # amilaunch.sh applies as root through a single sudoers rule
+    if Path(TUNING_HELPER).exists():
+        shutil.copy2(TUNING_HELPER, f"{mnt}{TUNING_HELPER}")
+        runner.run_chroot(["chmod", "755", TUNING_HELPER])
+        _write_file(
+            f"{mnt}{TUNING_SUDOERS}",
+            f"amiga ALL=(root) NOPASSWD: {TUNING_HELPER}\n",
+        )
+        os.chmod(f"{mnt}{TUNING_SUDOERS}", 0o440)
+
     # PAM config for cage
     Path(f"{mnt}/etc/pam.d").mkdir(parents=True, exist_ok=True)
     pam_src = f"{INSTALLER_DATA_DIR}/pam.d/cage"
@@ -297,6 +767,17 @@ def configure_system(runner: CommandRunner) -> None:
         if Path(src).exists():
             shutil.copy2(src, f"{uae_dest}/{uae}")
 
+    # PipeWire/WirePlumber drop-ins per emulation profile, linked into
+    # ~/.config by amilaunch.sh for the booted profile
+    for profile in profiles:
+        if profile not in AUDIO_PROFILES:
+            continue
+        dropins = audio_dropins(profile, audit or {}, f"{INSTALLER_DATA_DIR}/uae")
+        for rel, content in dropins.items():
+            dest = f"{mnt}{AUDIO_DIR}/{profile}/{rel}"
+            Path(dest).parent.mkdir(parents=True, exist_ok=True)
+            _write_file(dest, content)
+
     # .bash_profile
     _write_file(
         f"{mnt}/home/amiga/.bash_profile",
@@ -324,21 +805,46 @@ def configure_system(runner: CommandRunner) -> None:
     # Enable NetworkManager
     runner.run_chroot(["systemctl", "enable", "NetworkManager"])
 
-    # Plymouth boot splash
-    plymouth_theme = f"{mnt}/usr/share/plymouth/themes/amicachy"
-    plymouth_src = "/usr/share/plymouth/themes/amicachy"
-    if Path(plymouth_src).is_dir():
-        shutil.copytree(plymouth_src, plymouth_theme, dirs_exist_ok=True)
+    # Storage policy: I/O schedulers, periodic TRIM, writeback limits
+    Path(f"{mnt}/etc/udev/rules.d").mkdir(parents=True, exist_ok=True)
     _write_file(
-        f"{mnt}/etc/plymouth/plymouthd.conf",
-        "[Daemon]\nTheme=amicachy\nShowDelay=0\nDeviceTimeout=5\n",
+        f"{mnt}/etc/udev/rules.d/70-amicachy-iosched.rules",
+        udev_scheduler_rules(),
     )
-    # mkinitcpio with plymouth hook
+    Path(f"{mnt}/etc/sysctl.d").mkdir(parents=True, exist_ok=True)
     _write_file(
-        f"{mnt}/etc/mkinitcpio.conf",
-        "MODULES=()\nBINARIES=()\nFILES=()\n"
-        "HOOKS=(base udev plymouth autodetect modconf kms block filesystems keyboard)\n",
+        f"{mnt}/etc/sysctl.d/60-amicachy-writeback.conf",
+        writeback_sysctl(fs_profile, mem_total_kib),
+    )
+    if FS_PROFILES[fs_profile]["fstrim"]:
+        runner.run_chroot(["systemctl", "enable", "fstrim.timer"])
+
+    # Transparent huge pages for the emulated RAM, sized to the largest
+    # guest RAM of the selected profiles (amilaunch.sh checks the result).
+    # Small guests (or none) keep the distribution's THP policy.
+    guest_mib = max(
+        (profile_ram_mib(p, f"{INSTALLER_DATA_DIR}/uae") for p in profiles), default=0
+    )
+    if guest_mib >= SMALL_GUEST_MIB:
+        Path(f"{mnt}/etc/tmpfiles.d").mkdir(parents=True, exist_ok=True)
+        _write_file(f"{mnt}{HUGEPAGES_TMPFILES}", thp_tmpfiles(mem_total_kib, guest_mib))
+    else:
+        runner.note(f"Huge pages: {guest_mib} MiB guest RAM, THP policy left at the default")
+
+    # Swap on zram (zram-generator), with the compressor that benchmarks
+    # best on this machine
+    results = benchmark_zram()
+    algorithm = select_algorithm(results)
+    runner.note(
+        f"zram compression: {algorithm}"
+        + (f" (ratio {results[algorithm]['ratio']})" if algorithm in results else " (default)")
     )
+    _write_file(
+        f"{mnt}/etc/systemd/zram-generator.conf",
+        zram_generator_conf(mem_total_kib, list(profiles), algorithm, results),
+    )
+    _write_file(f"{mnt}/etc/sysctl.d/60-amicachy-zram.conf", zram_sysctl())
+
     # Plymouth systemd services
     for wants_dir, service in [
         ("sysinit.target.wants", "plymouth-start.service"),
@@ -351,14 +857,34 @@ def configure_system(runner: CommandRunner) -> None:
         if not link_path.exists():
             link_path.symlink_to(f"/usr/lib/systemd/system/{service}")
 
-    # Regenerate initramfs (with plymouth hook now active)
-    runner.run_chroot(["mkinitcpio", "-P"])
+    # Early-boot services, started with Plymouth: boot hotkey capture (hold
+    # F5 for Early Startup; amilaunch.sh only reads its result) and the
+    # emulator readahead.  Tools and units come from the live system.
+    for tools, service, extra in [
+        ("earlystartup", HOTKEY_SERVICE, []),
+        ("launcher", READAHEAD_SERVICE, [READAHEAD_TMPFILES]),
+    ]:
+        tools_dir = f"{AMICACHY_TOOLS_DIR}/{tools}"
+        unit = f"/etc/systemd/system/{service}"
+        if not (Path(tools_dir).is_dir() and Path(unit).exists()):
+            continue
+        shutil.copytree(
+            tools_dir,
+            f"{mnt}{tools_dir}",
+            dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+        for path in [unit] + extra:
+            Path(f"{mnt}{path}").parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, f"{mnt}{path}")
+        runner.run_chroot(["systemctl", "enable", service])
 
 
 def install_bootloader(
     runner: CommandRunner,
     selected_profiles: list[str],
     default_profile: str,
+    fallback: bool = False,
 ) -> None:
     """Install systemd-boot and create boot entries for selected profiles."""
     mnt = MOUNTPOINT
@@ -386,6 +912,52 @@ def install_bootloader(
         )
         _write_file(f"{entries_dir}/{entry['filename']}", content)
 
+    if fallback:
+        _write_file(
+            f"{entries_dir}/{FALLBACK_ENTRY['filename']}",
+            f"title   {FALLBACK_ENTRY['title']}\n"
+            f"linux   /vmlinuz-linux-cachyos\n"
+            f"initrd  /initramfs-linux-cachyos-fallback.img\n"
+            f"options {BOOT_ENTRIES[default_profile]['options']}\n",
+        )
+
+
+def finish_package_cache(
+    runner: CommandRunner,
+    keep: bool,
+    filenames: set[str] | None = None,
+    extra_caches: list[str] = (),
+) -> None:
+    """Empty the target's package cache, or complete it for the installed system.
+
+    Partial downloads are always removed.  When ``keep`` is set, packages
+    in ``filenames`` that pacstrap installed from an ``extra_caches``
+    directory (the live prefetch cache) are copied in, so the installed
+    system's cache holds the whole installed set.
+    """
+    cache = Path(TARGET_CACHE_DIR)
+    if not cache.is_dir():
+        return
+    for part in cache.glob("*.part"):
+        part.unlink()
+    if not keep:
+        freed = 0
+        for pkg in cache.iterdir():
+            if pkg.is_file():
+                freed += pkg.stat().st_size
+                pkg.unlink()
+        runner.note(f"Package cache emptied ({freed / 1024 ** 2:.0f} MiB freed)")
+        return
+    for name in sorted(filenames or ()):
+        if (cache / name).exists():
+            continue
+        for extra in extra_caches:
+            if (Path(extra) / name).is_file():
+                shutil.copy2(Path(extra) / name, cache / name)
+                break
+    size = sum(pkg.stat().st_size for pkg in cache.iterdir() if pkg.is_file())
+    runner.note(f"Package cache kept ({size / 1024 ** 2:.0f} MiB)")
+
 
 def final_cleanup(runner: CommandRunner) -> None:
     """Sync and unmount all filesystems."""
@@ -0,0 +1,180 @@
+"""Package download stage, separate from the pacstrap install transaction.
+
+The dependency closure of the selection (from pkgdb) is fetched with curl
+into the package cache on the target disk, several packages at a time.
+Each package downloads to ``<file>.part`` and resumes from there, so a
+failed attempt never throws away what already arrived.  Failed packages
+are retried on their own, with exponential backoff, rotating through the
+repository's ranked mirrors.  A file only gets its final name once its
+size and SHA-256 match the sync database, and pacstrap runs only when
+every package is present and verified; pacman then installs straight
+from the cache.
+"""
+
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable
+
+from .backend import AsyncCommandRunner, CommandRunner, NetworkError
+from .mirrors import repo_servers
+from .pkgdb import Closure, PackageDB, PackageInfo, sync_db_paths
+
+MAX_PARALLEL_DOWNLOADS = 5
+ATTEMPTS_PER_PACKAGE = 6
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 30.0
+
+CURL_ARGS = [
+    "curl", "--fail", "--location", "--silent", "--show-error",
+    "--connect-timeout", "10",
+    # Abort (and fail over) when a mirror stalls below 1 KiB/s for 30 s
+    "--speed-limit", "1024", "--speed-time", "30",
+    "--continue-at", "-",
+]
+CURL_RANGE_ERROR = 33
+
+
+def verify_package(path: Path, pkg: PackageInfo) -> bool:
+    """Check a downloaded file against the sync database's size and SHA-256."""
+    try:
+        if path.stat().st_size != pkg.csize:
+            return False
+    except OSError:
+        return False
+    if not pkg.sha256:
+        return True
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest() == pkg.sha256
+
+
+class PackageDownloader:
+    """Fetches and verifies a package set into a cache directory."""
+
+    def __init__(
+        self,
+        runner: CommandRunner,
+        cache_dir: str,
+        servers: dict[str, list[str]],
+        progress: Callable[[int, int], None] | None = None,
+    ):
+        self.runner = runner
+        self.cache_dir = Path(cache_dir)
+        self.servers = servers
+        self.progress = progress
+        self.arunner = AsyncCommandRunner(runner, max_parallel=MAX_PARALLEL_DOWNLOADS)
+        self._done_bytes = 0
+        self._total_bytes = 0
+
+    def _report(self, pkg: PackageInfo) -> None:
+        self._done_bytes += pkg.csize
+        if self.progress is not None:
+            self.progress(self._done_bytes, self._total_bytes)
+
+    async def _fetch(self, pkg: PackageInfo) -> str:
+        """Download one package; return "" on success or an error message."""
+        final = self.cache_dir / pkg.filename
+        part = self.cache_dir / f"{pkg.filename}.part"
+        mirrors = self.servers.get(pkg.repo, [])
+        if not mirrors:
+            return f"{pkg.name}: no mirror for repository {pkg.repo}"
+
+        error = ""
+        for attempt in range(ATTEMPTS_PER_PACKAGE):
+            if attempt:
+                await asyncio.sleep(min(BACKOFF_BASE_S * 2 ** (attempt - 1), BACKOFF_MAX_S))
+            mirror = mirrors[attempt % len(mirrors)]
+            result = await self.arunner.run(
+                CURL_ARGS + ["--output", str(part), f"{mirror}/{pkg.filename}"],
+                tag=pkg.name,
+                check=False,
+            )
+            if result.returncode == CURL_RANGE_ERROR:
+                # Mirror ignores Range: the partial file cannot be resumed
+                part.unlink(missing_ok=True)
+            if result.returncode != 0:
+                # Otherwise keep the partial file; the next attempt resumes
+                # it.  A file already at full size gets verified below.
+                tail = result.stdout.splitlines()[-1:] or [""]
+                error = f"curl exit {result.returncode} from {mirror}: {tail[0]}"
+            if await asyncio.to_thread(verify_package, part, pkg):
+                os.replace(part, final)
+                self._report(pkg)
+                return ""
+            if part.exists() and part.stat().st_size >= pkg.csize:
+                # Complete but corrupt: start over, on the next mirror
+                part.unlink()
+                error = f"{pkg.filename}: checksum mismatch"
+        return f"{pkg.name}: {error}"
+
+    def download(self, packages: list[PackageInfo], extra_caches: list[str] = ()) -> None:
+        """Make every package available, verified, in a cache directory.
+
+        Packages already verified in ``cache_dir`` or one of
+        ``extra_caches`` (e.g. the prefetch cache) are not downloaded.
+        Raises NetworkError naming the packages that could not be fetched.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        caches = [self.cache_dir] + [Path(d) for d in extra_caches]
+        missing = [
+            pkg for pkg in packages
+            if not any(verify_package(cache / pkg.filename, pkg) for cache in caches)
+        ]
+        self._total_bytes = sum(pkg.csize for pkg in missing)
+        self._done_bytes = 0
+        self.runner.note(
+            f"Downloading {len(missing)} of {len(packages)} packages "
+            f"({self._total_bytes / 1024 / 1024:.0f} MiB)"
+        )
+        if not missing:
+            return
+
+        # Largest first, so a big package doesn't start last and stall the end
+        ordered = sorted(missing, key=lambda p: p.csize, reverse=True)
+        # _fetch reports failures instead of raising, so one package giving
+        # up does not cancel the others
+        results = self.arunner.gather(*(self._fetch(pkg) for pkg in ordered))
+        errors = [error for error in results if error]
+        if errors:
+            raise NetworkError(
+                f"{len(errors)} package(s) could not be downloaded after "
+                f"{ATTEMPTS_PER_PACKAGE} attempts: "
+                + ", ".join(error.split(":", 1)[0] for error in errors[:5]),
+                output_tail=errors,
+            )
+
+
+def download_packages(
+    runner: CommandRunner,
+    packages: list[str],
+    pacman_conf: str,
+    dbpath: str,
+    cache_dir: str,
+    extra_caches: list[str] = (),
+    progress: Callable[[int, int], None] | None = None,
+) -> Closure | None:
+    """Download the dependency closure of ``packages`` ahead of pacstrap.
+
+    Refreshes the sync databases under ``dbpath`` first.  Packages the
+    closure misses (pacman may resolve a provider differently) are left
+    to pacstrap, which downloads them itself.  Returns the closure, or
+    None when no sync database is available and pacstrap has to download
+    everything.
+    """
+    Path(dbpath).mkdir(parents=True, exist_ok=True)
+    runner.run(["pacman", "-Sy", "--config", pacman_conf, "--dbpath", dbpath], check=False)
+    db = PackageDB.load(sync_db_paths(pacman_conf, dbpath))
+    if not len(db):
+        runner.note("No sync databases available; pacstrap will download packages")
+        return None
+    closure = db.closure(packages)
+    if closure.missing:
+        runner.note(f"Not in sync databases: {', '.join(closure.missing)}")
+    PackageDownloader(runner, cache_dir, repo_servers(pacman_conf), progress).download(
+        closure.packages, extra_caches
+    )
+    return closure
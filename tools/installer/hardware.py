@@ -10,16 +10,22 @@ if _tools_dir not in sys.path:
 
 from hardware_audit import (  # noqa: E402
     read_cpuinfo,
+    read_meminfo,
     detect_arch_level,
+    detect_gpu_vendors,
     detect_virtualization,
+    measure_sched_latency,
     run_benchmark,
     recommend_profiles,
 )
 
 __all__ = [
     "read_cpuinfo",
+    "read_meminfo",
     "detect_arch_level",
+    "detect_gpu_vendors",
     "detect_virtualization",
+    "measure_sched_latency",
     "run_benchmark",
     "recommend_profiles",
 ]
@@ -0,0 +1,277 @@
+"""Concurrent mirror ranking for the pacman mirrorlists.
+
+Every ``Server =`` entry of a mirrorlist is probed on one asyncio loop,
+with bounded parallelism: the connect latency (TCP plus TLS) and the
+throughput of a small ranged read of the repository database are
+measured, unreachable mirrors are dropped, and the list is rewritten
+fastest first.  pacstrap reads the ranked lists from the live system and
+configure_system copies them into the target.
+
+Probes speak plain HTTP/1.1 over asyncio streams, so any ``http://``
+server (e.g. a local stand-in with an injected delay) can be ranked too;
+bench/mirror_ranking.py checks the ranking against such stand-ins.
+"""
+
+import asyncio
+import os
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urljoin, urlsplit
+
+MIRRORLIST_DIR = "/etc/pacman.d"
+
+# Mirrorlist file -> repository whose database is probed
+MIRRORLISTS = {
+    "cachyos-mirrorlist": "cachyos",
+    "cachyos-v3-mirrorlist": "cachyos-v3",
+    "cachyos-v4-mirrorlist": "cachyos-v4",
+    "mirrorlist": "core",
+}
+
+# pacman variables in Server lines; CachyOS's pacman adds the $arch_v* ones
+ARCH_VARS = {"$arch_v4": "x86_64_v4", "$arch_v3": "x86_64_v3", "$arch": "x86_64"}
+
+PROBE_BYTES = 256 * 1024
+PROBE_TIMEOUT_S = 5.0
+MAX_PARALLEL = 8
+MAX_REDIRECTS = 3
+
+# Mirrors are ordered by the estimated time to fetch a typical package
+SCORE_BYTES = 2 * 1024 * 1024
+
+
+class MirrorProbeError(Exception):
+    """A mirror answered, but not with usable data."""
+
+
+@dataclass
+class MirrorResult:
+    """Probe outcome for one Server entry."""
+
+    server: str
+    url: str
+    latency: float = 0.0
+    throughput: float = 0.0
+    error: str = ""
+
+    @property
+    def alive(self) -> bool:
+        return not self.error
+
+    @property
+    def score(self) -> float:
+        if not self.alive or self.throughput <= 0:
+            return float("inf")
+        return self.latency + SCORE_BYTES / self.throughput
+
+
+def expand_server(server: str, repo: str) -> str:
+    """Substitute pacman's $repo/$arch variables in a Server value."""
+    url = server.replace("$repo", repo)
+    for var, value in ARCH_VARS.items():
+        url = url.replace(var, value)
+    return url
+
+
+def read_servers(path: Path) -> list[str]:
+    """Return the active ``Server =`` values of a mirrorlist, in order."""
+    servers: list[str] = []
+    for line in path.read_text().splitlines():
+        key, sep, value = line.split("#", 1)[0].partition("=")
+        if sep and key.strip() == "Server" and value.strip():
+            servers.append(value.strip())
+    return servers
+
+
+def repo_servers(pacman_conf: str) -> dict[str, list[str]]:
+    """Return {repo: [base URL, ...]} from pacman.conf, in failover order.
+
+    Follows ``Include =`` mirrorlists and expands $repo/$arch, so each URL
+    is the directory holding that repository's package files.
+    """
+    repos: dict[str, list[str]] = {}
+    current: list[str] | None = None
+    for line in Path(pacman_conf).read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line.startswith("[") and line.endswith("]"):
+            repo = line[1:-1]
+            current = None if repo == "options" else repos.setdefault(repo, [])
+            continue
+        key, sep, value = line.partition("=")
+        if current is None or not sep:
+            continue
+        key, value = key.strip(), value.strip()
+        if key == "Server":
+            servers = [value]
+        elif key == "Include" and Path(value).exists():
+            servers = read_servers(Path(value))
+        else:
+            continue
+        current.extend(expand_server(server, repo).rstrip("/") for server in servers)
+    return repos
+
+
+async def _fetch(url: str, probe_bytes: int, redirects: int, spent: float) -> tuple[float, float]:
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    context = ssl.create_default_context() if https else None
+    start = time.monotonic()
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, parts.port or (443 if https else 80), ssl=context
+    )
+    latency = spent + time.monotonic() - start
+    try:
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        request_start = time.monotonic()
+        writer.write(
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"User-Agent: amicachy-installer\r\n"
+            f"Range: bytes=0-{probe_bytes - 1}\r\n"
+            f"Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1").split()
+        if len(status_line) < 2 or not status_line[1].isdigit():
+            raise MirrorProbeError("malformed HTTP response")
+        status = int(status_line[1])
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if status in (301, 302, 303, 307, 308) and "location" in headers:
+            if redirects <= 0:
+                raise MirrorProbeError("too many redirects")
+            hop = time.monotonic() - start
+            return await _fetch(urljoin(url, headers["location"]), probe_bytes, redirects - 1, spent + hop)
+        if status not in (200, 206):
+            raise MirrorProbeError(f"HTTP {status}")
+
+        received = 0
+        while received < probe_bytes:
+            chunk = await reader.read(64 * 1024)
+            if not chunk:
+                break
+            received += len(chunk)
+        if received == 0:
+            raise MirrorProbeError("empty response")
+        # Includes time to first byte: small package downloads pay it too
+        elapsed = max(time.monotonic() - request_start, 1e-6)
+        return latency, received / elapsed
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+
+async def probe_mirror(
+    server: str,
+    repo: str,
+    semaphore: asyncio.Semaphore,
+    timeout: float = PROBE_TIMEOUT_S,
+    probe_bytes: int = PROBE_BYTES,
+) -> MirrorResult:
+    """Measure one mirror by fetching the head of its ``<repo>.db``."""
+    url = f"{expand_server(server, repo).rstrip('/')}/{repo}.db"
+    result = MirrorResult(server=server, url=url)
+    async with semaphore:
+        try:
+            result.latency, result.throughput = await asyncio.wait_for(
+                _fetch(url, probe_bytes, MAX_REDIRECTS, 0.0), timeout
+            )
+        except asyncio.TimeoutError:
+            result.error = f"timed out after {timeout:g}s"
+        except (OSError, ssl.SSLError, MirrorProbeError, ValueError) as e:
+            result.error = str(e) or type(e).__name__
+    return result
+
+
+def write_ranked(path: Path, ranked: list[MirrorResult]) -> None:
+    """Rewrite a mirrorlist in ranked order, commenting out dead mirrors."""
+    lines = [
+        "# Ranked by the AmiCachy installer "
+        f"({time.strftime('%Y-%m-%d %H:%M')}): connect latency + "
+        f"{SCORE_BYTES // (1024 * 1024)} MiB at measured throughput",
+    ]
+    for r in ranked:
+        if r.alive:
+            lines.append(
+                f"Server = {r.server}  "
+                f"# {r.latency * 1000:.0f} ms, {r.throughput / 1024 / 1024:.1f} MiB/s"
+            )
+        else:
+            lines.append(f"#Server = {r.server}  # unreachable: {r.error}")
+    # Unique per writer: two rankings must never share a temporary file
+    tmp = path.with_name(f"{path.name}.ranking.{os.getpid()}.{threading.get_ident()}")
+    tmp.write_text("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+async def _rank_all(
+    lists: dict[Path, str],
+    max_parallel: int,
+    timeout: float,
+    probe_bytes: int,
+) -> dict[Path, list[MirrorResult]]:
+    semaphore = asyncio.Semaphore(max_parallel)
+    jobs = {
+        path: asyncio.gather(*(
+            probe_mirror(server, repo, semaphore, timeout, probe_bytes)
+            for server in read_servers(path)
+        ))
+        for path, repo in lists.items()
+    }
+    results = dict(zip(jobs, await asyncio.gather(*jobs.values())))
+    return {path: sorted(res, key=lambda r: r.score) for path, res in results.items()}
+
+
+def rank_mirrorlists(
+    lists: dict[Path, str] | None = None,
+    log: Callable[[str], None] = print,
+    max_parallel: int = MAX_PARALLEL,
+    timeout: float = PROBE_TIMEOUT_S,
+    probe_bytes: int = PROBE_BYTES,
+) -> dict[Path, list[MirrorResult]]:
+    """Probe and rewrite mirrorlists, given as {path: probed repo}.
+
+    Defaults to the MIRRORLISTS present in MIRRORLIST_DIR.  A list whose
+    mirrors are all unreachable is left untouched (offline installs then
+    behave exactly as before).
+    """
+    if lists is None:
+        lists = {
+            Path(MIRRORLIST_DIR) / name: repo
+            for name, repo in MIRRORLISTS.items()
+            if (Path(MIRRORLIST_DIR) / name).exists()
+        }
+    lists = {path: repo for path, repo in lists.items() if read_servers(path)}
+    if not lists:
+        return {}
+
+    ranked = asyncio.run(_rank_all(lists, max_parallel, timeout, probe_bytes))
+    for path, results in ranked.items():
+        alive = [r for r in results if r.alive]
+        if not alive:
+            log(f"Mirrors: no reachable mirror in {path.name}, keeping it as is")
+            continue
+        write_ranked(path, results)
+        best = alive[0]
+        log(
+            f"Mirrors: {path.name}: {len(alive)}/{len(results)} reachable, "
+            f"fastest {urlsplit(best.url).hostname} "
+            f"({best.latency * 1000:.0f} ms, {best.throughput / 1024 / 1024:.1f} MiB/s)"
+        )
+    return ranked
@@ -0,0 +1,90 @@
+"""Package manifest parsing and profile/hardware-aware package selection."""
+
+from pathlib import Path
+
+from .backend import InstallError, read_package_list
+
+SELECTOR_KINDS = ("base", "profile", "gpu", "cpu", "arch")
+
+
+def parse_manifest(path: str) -> list[tuple[str, set[str], list[str]]]:
+    """Parse a package manifest into (kind, values, packages) sections.
+
+    Section headers are ``[base]`` or ``[<kind>:<value> <value> ...]``;
+    blank lines and ``#`` comments are ignored.  A section may appear more
+    than once.
+    """
+    sections: list[tuple[str, set[str], list[str]]] = []
+    current: list[str] | None = None
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                kind, _, values = line[1:-1].partition(":")
+                kind = kind.strip()
+                needs_values = kind != "base"
+                if kind not in SELECTOR_KINDS or needs_values != bool(values.split()):
+                    raise InstallError(
+                        f"{path}:{lineno}: invalid section header {line}",
+                        step="packages",
+                    )
+                current = []
+                sections.append((kind, set(values.split()), current))
+            elif current is None:
+                raise InstallError(
+                    f"{path}:{lineno}: package outside of a section",
+                    step="packages",
+                )
+            else:
+                current.extend(line.split())
+    return sections
+
+
+def resolve_packages(
+    manifest_path: str,
+    profiles: list[str],
+    gpu_vendors: list[str],
+    cpu_vendor: str,
+    arch_level: str,
+) -> list[str]:
+    """Return the deduplicated package list for profiles and hardware.
+
+    ``gpu_vendors`` may list several vendors (hybrid graphics); with no
+    recognised vendor the ``gpu:unknown`` sections apply.
+    """
+    gpus = set(gpu_vendors) or {"unknown"}
+    active = {
+        "profile": set(profiles),
+        "gpu": gpus,
+        "cpu": {cpu_vendor},
+        "arch": {arch_level},
+    }
+    packages: dict[str, None] = {}
+    for kind, values, names in parse_manifest(manifest_path):
+        if kind == "base" or values & active[kind]:
+            packages.update(dict.fromkeys(names))
+    return list(packages)
+
+
+def select_packages(
+    data_dir: str,
+    profiles: list[str],
+    audit_result: dict,
+) -> list[str]:
+    """Resolve the install package set from the bundled installer data.
+
+    Uses packages.manifest when present, otherwise the full live ISO list.
+    """
+    manifest = Path(data_dir) / "packages.manifest"
+    if not manifest.exists():
+        return read_package_list(str(Path(data_dir) / "packages.x86_64"))
+    cpu = audit_result.get("cpu", {})
+    return resolve_packages(
+        str(manifest),
+        profiles,
+        audit_result.get("gpu", {}).get("vendors", []),
+        cpu.get("vendor", ""),
+        cpu.get("arch_level", ""),
+    )
@@ -23,12 +23,15 @@ from PySide6.QtWidgets import (
 
 from .resources import BOOT_ENTRIES, PROFILE_DISPLAY, WELCOME_TEXT
 from .slideshow import SlideshowWidget
+from .storage import FS_PROFILES, select_fs_profile
 from .theme import STATUS_COLORS
 from .workers import (
     DiskScanWorker,
+    EstimateWorker,
     HardwareAuditWorker,
     InstallWorker,
     InstallerState,
+    PrefetchWorker,
 )
 
 
@@ -314,6 +317,8 @@ class DiskCard(QFrame):
         self.device = disk["device"]
         self.model = disk.get("model", "Unknown drive")
         self.size = disk.get("size", 0)
+        self.transport = disk.get("transport", "")
+        self.rotational = disk.get("rotational", False)
         self._selected = False
         self.setCursor(Qt.PointingHandCursor)
         self.setObjectName("diskCard")
@@ -327,7 +332,8 @@ class DiskCard(QFrame):
         name_lbl.setStyleSheet("font-size: 15px;")
         left.addWidget(name_lbl)
 
-        detail = f"/dev/{disk['name']}  \u2022  {disk['transport']}"
+        kind = "HDD" if self.rotational else "SSD"
+        detail = f"/dev/{disk['name']}  \u2022  {disk['transport']}  \u2022  {kind}"
         left.addWidget(_info_label(detail))
         layout.addLayout(left, stretch=1)
 
@@ -429,6 +435,11 @@ class DiskSelectPage(QWidget):
             if selected:
                 self.state.target_device_model = card.model
                 self.state.target_device_size = card.size
+                self.state.target_device_transport = card.transport
+                self.state.target_device_rotational = card.rotational
+                self.state.fs_profile = select_fs_profile(
+                    card.transport, card.rotational
+                )
         self.disk_selected.emit(device)
 
 
@@ -507,6 +518,27 @@ class ProfileSelectPage(QWidget):
         default_layout.addStretch()
         layout.addLayout(default_layout)
 
+        self._fallback_cb = QCheckBox(
+            "Also build a fallback initramfs (recovery boot entry)"
+        )
+        self._fallback_cb.setToolTip(
+            "Includes all kernel modules, for booting on changed hardware. "
+            "Adds install time and space on the EFI partition."
+        )
+        self._fallback_cb.toggled.connect(self._on_fallback_toggled)
+        layout.addWidget(self._fallback_cb)
+
+        self._keep_cache_cb = QCheckBox(
+            "Keep downloaded packages on the installed system"
+        )
+        self._keep_cache_cb.setToolTip(
+            "Leaves the packages in the pacman cache on the target disk, so "
+            "reinstalling or downgrading them later needs no download. "
+            "Uses about as much disk space as the download."
+        )
+        self._keep_cache_cb.toggled.connect(self._on_keep_cache_toggled)
+        layout.addWidget(self._keep_cache_cb)
+
         layout.addStretch()
 
     def update_from_audit(self) -> None:
@@ -539,6 +571,12 @@ class ProfileSelectPage(QWidget):
     def _on_default_changed(self, index: int) -> None:
         self.state.default_profile = self._default_combo.itemData(index)
 
+    def _on_fallback_toggled(self, checked: bool) -> None:
+        self.state.initramfs_fallback = checked
+
+    def _on_keep_cache_toggled(self, checked: bool) -> None:
+        self.state.keep_package_cache = checked
+
     @property
     def has_selection(self) -> bool:
         return any(cb.isChecked() for cb in self._checkboxes.values())
@@ -566,6 +604,11 @@ class ConfirmPage(QWidget):
         self._summary.setStyleSheet("font-size: 14px; line-height: 1.6;")
         layout.addWidget(self._summary)
 
+        self._estimate = _info_label("")
+        layout.addWidget(self._estimate)
+        self._estimate_worker: EstimateWorker | None = None
+        self._estimate_stale = False
+
         layout.addStretch()
 
         warning = QLabel(
@@ -587,19 +630,64 @@ class ConfirmPage(QWidget):
             default = " (default)" if pid == s.default_profile else ""
             profiles_text += f"  \u2022 {name}{default}\n"
 
+        if s.initramfs_fallback:
+            profiles_text += "  \u2022 Fallback initramfs (recovery)\n"
+        if s.keep_package_cache:
+            profiles_text += "  \u2022 Downloaded packages kept in the pacman cache\n"
+
         size_gb = s.target_device_size / (1024 ** 3) if s.target_device_size else 0
+        fs = FS_PROFILES[s.fs_profile or "ssd"]
+        data_note = (
+            ", zstd compression" if "compress=" in fs["data_options"] else ""
+        )
 
         text = (
             f"<b>Target drive:</b> {s.target_device}"
             f" ({s.target_device_model}, {size_gb:.1f} GB)\n\n"
             f"<b>Partitions:</b>\n"
             f"  \u2022 EFI: 512 MB (FAT32)\n"
-            f"  \u2022 System: ~60% of disk (ext4, label: AMICACHY)\n"
-            f"  \u2022 Amiga Data: ~40% of disk (ext4)\n\n"
+            f"  \u2022 System: ~60% of disk ({fs['root_fs']}, label: AMICACHY)\n"
+            f"  \u2022 Amiga Data: ~40% of disk ({fs['data_fs']}{data_note})\n"
+            f"  \u2022 Tuned for: {fs['description']}\n\n"
             f"<b>Boot modes:</b>\n{profiles_text}\n"
             f"<b>Hardware:</b> {cpu_model} ({arch})"
         )
         self._summary.setText(text)
+        self._start_estimate()
+
+    def _start_estimate(self) -> None:
+        self.state.package_estimate = {}
+        self._estimate.setText("Estimating download size...")
+        if self._estimate_worker is not None and self._estimate_worker.isRunning():
+            # Selection changed while estimating: redo it when that finishes
+            self._estimate_stale = True
+            return
+        self._estimate_worker = EstimateWorker(self.state)
+        self._estimate_worker.finished.connect(self._on_estimate_done)
+        self._estimate_worker.start()
+
+    def _on_estimate_done(self, estimate: dict) -> None:
+        if self._estimate_stale:
+            self._estimate_stale = False
+            self._start_estimate()
+            return
+        self.state.package_estimate = estimate
+        if not estimate:
+            self._estimate.setText("Download size unavailable (package databases unreachable).")
+            return
+        gib = 1024 ** 3
+        root_bytes = self.state.target_device_size * 0.6
+        text = (
+            f"Packages: {estimate['count']} "
+            f"({estimate['download_size'] / gib:.1f} GB download, "
+            f"{estimate['installed_size'] / gib:.1f} GB installed)"
+        )
+        # Leave room for the package cache and later updates
+        if root_bytes and estimate["installed_size"] * 2 > root_bytes:
+            text += "\n\u26a0  The system partition will be nearly full."
+        if estimate["missing"]:
+            text += f"\nNot found in repositories: {', '.join(estimate['missing'][:5])}"
+        self._estimate.setText(text)
 
 
 # ---------------------------------------------------------------------------
@@ -844,6 +932,11 @@ class InstallerWizard(QWidget):
         self._install.install_finished.connect(self._on_install_finished)
         self._error.retry_clicked.connect(self._on_retry)
 
+        # Download packages while the user works through the wizard
+        self._prefetch = PrefetchWorker(self.state)
+        self._prefetch.refresh()
+        self._prefetch.start()
+
         self._current = 0
         self._update_ui()
 
@@ -877,6 +970,12 @@ class InstallerWizard(QWidget):
             page.refresh_summary()
         elif isinstance(page, InstallPage):
             self._footer.set_navigation_visible(False)
+            # pacstrap takes over; what was fetched stays usable as a cache.
+            # Not waited for here, which would freeze the wizard: stop()
+            # starts no further pacman and interrupts a running one, and a
+            # mirror ranking in flight is waited for by the install itself
+            # (rank_mirrors_once)
+            self._prefetch.stop()
             page.start_install()
 
     def _update_ui(self) -> None:
@@ -909,6 +1008,7 @@ class InstallerWizard(QWidget):
 
     def _on_audit_complete(self) -> None:
         self._footer.set_next_enabled(True)
+        self._prefetch.refresh()
 
     def _on_disk_selected(self, device: str) -> None:
         # Store device info from lsblk data
@@ -919,6 +1019,7 @@ class InstallerWizard(QWidget):
 
     def _on_profile_changed(self) -> None:
         self._footer.set_next_enabled(self._profiles.has_selection)
+        self._prefetch.refresh()
 
     def _on_install_finished(self, success: bool, error: str) -> None:
         if success:
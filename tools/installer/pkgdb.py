@@ -0,0 +1,213 @@
+"""Offline pacman sync database reader and dependency closure sizing.
+
+Sync databases (``<repo>.db``) are tar archives holding one
+``<name>-<version>/desc`` entry per package.  They are read directly,
+without libalpm, into an in-memory index so the installer can size the
+dependency closure of its package selection before pacstrap starts:
+package count, download size and installed size.
+
+Version constraints in dependencies are ignored (the closure is an
+estimate; pacman does the real resolution), and among several providers
+of a virtual dependency the first repository in pacman.conf order wins,
+as with ``pacman --noconfirm``.
+"""
+
+import io
+import re
+import subprocess
+import tarfile
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Strips "=1.2", ">=3", "<4" and ": description" (optdepends) suffixes
+_DEP_NAME_RE = re.compile(r"[<>=:].*$")
+
+
+@dataclass
+class PackageInfo:
+    """One package entry from a sync database."""
+
+    name: str
+    version: str
+    repo: str
+    filename: str = ""
+    csize: int = 0
+    isize: int = 0
+    sha256: str = ""
+    depends: list[str] = field(default_factory=list)
+    provides: list[str] = field(default_factory=list)
+    groups: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Closure:
+    """Packages pulled in by a selection, and names that did not resolve."""
+
+    packages: list[PackageInfo]
+    missing: list[str]
+
+    @property
+    def count(self) -> int:
+        return len(self.packages)
+
+    @property
+    def download_size(self) -> int:
+        return sum(p.csize for p in self.packages)
+
+    @property
+    def installed_size(self) -> int:
+        return sum(p.isize for p in self.packages)
+
+
+def dep_name(dep: str) -> str:
+    """Return the bare package name of a dependency or provides entry."""
+    return _DEP_NAME_RE.sub("", dep).strip()
+
+
+def parse_desc(text: str) -> dict[str, list[str]]:
+    """Parse a ``desc`` file into {FIELD: [values]}."""
+    fields: dict[str, list[str]] = {}
+    current: list[str] | None = None
+    for line in text.splitlines():
+        if line.startswith("%") and line.endswith("%") and len(line) > 2:
+            current = fields.setdefault(line[1:-1], [])
+        elif not line:
+            current = None
+        elif current is not None:
+            current.append(line)
+    return fields
+
+
+def _open_db(path: Path) -> tarfile.TarFile:
+    data = path.read_bytes()
+    if data.startswith(ZSTD_MAGIC):
+        # tarfile has no zstd support before Python 3.14
+        data = subprocess.run(
+            ["zstd", "-q", "-d", "-c"], input=data, capture_output=True, check=True
+        ).stdout
+    return tarfile.open(fileobj=io.BytesIO(data), mode="r:*")
+
+
+def sync_db_paths(pacman_conf: str, dbpath: str = "/var/lib/pacman") -> list[tuple[str, Path]]:
+    """Return (repo, sync db path) for each repository in pacman.conf order."""
+    repos: list[tuple[str, Path]] = []
+    for line in Path(pacman_conf).read_text().splitlines():
+        line = line.strip()
+        if line.startswith("[") and line.endswith("]") and line != "[options]":
+            repo = line[1:-1]
+            repos.append((repo, Path(dbpath) / "sync" / f"{repo}.db"))
+    return repos
+
+
+class PackageDB:
+    """Indexed view of one or more sync databases."""
+
+    def __init__(self):
+        self.packages: dict[str, PackageInfo] = {}
+        self.providers: dict[str, list[PackageInfo]] = {}
+        self.groups: dict[str, list[PackageInfo]] = {}
+
+    @classmethod
+    def load(cls, repos: list[tuple[str, Path]]) -> "PackageDB":
+        """Load repositories in priority order, skipping missing files."""
+        db = cls()
+        for repo, path in repos:
+            if path.exists():
+                db.add_repo(repo, path)
+        return db
+
+    def add_repo(self, repo: str, path: Path) -> None:
+        """Index a sync database; earlier repositories take precedence."""
+        with _open_db(path) as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith("/desc"):
+                    continue
+                fields = parse_desc(tar.extractfile(member).read().decode())
+                self._add(repo, fields)
+
+    def _add(self, repo: str, fields: dict[str, list[str]]) -> None:
+        name = fields.get("NAME", [""])[0]
+        if not name or name in self.packages:
+            return
+        pkg = PackageInfo(
+            name=name,
+            version=fields.get("VERSION", [""])[0],
+            repo=repo,
+            filename=fields.get("FILENAME", [""])[0],
+            csize=int(fields.get("CSIZE", ["0"])[0]),
+            isize=int(fields.get("ISIZE", ["0"])[0]),
+            sha256=fields.get("SHA256SUM", [""])[0],
+            depends=fields.get("DEPENDS", []),
+            provides=fields.get("PROVIDES", []),
+            groups=fields.get("GROUPS", []),
+        )
+        self.packages[name] = pkg
+        for provided in pkg.provides:
+            self.providers.setdefault(dep_name(provided), []).append(pkg)
+        for group in pkg.groups:
+            self.groups.setdefault(group, []).append(pkg)
+
+    def __len__(self) -> int:
+        return len(self.packages)
+
+    def resolve(self, dep: str, selected: dict[str, PackageInfo] | None = None) -> PackageInfo | None:
+        """Find the package satisfying ``dep``.
+
+        An exact name match wins, then a provider that is already selected,
+        then the first provider in repository order.
+        """
+        name = dep_name(dep)
+        if name in self.packages:
+            return self.packages[name]
+        candidates = self.providers.get(name, [])
+        if selected:
+            for pkg in candidates:
+                if pkg.name in selected:
+                    return pkg
+        return candidates[0] if candidates else None
+
+    def closure(self, targets: list[str]) -> Closure:
+        """Compute the dependency closure of ``targets`` (names or groups)."""
+        selected: dict[str, PackageInfo] = {}
+        missing: list[str] = []
+        queue: deque[PackageInfo] = deque()
+
+        def select(pkg: PackageInfo) -> None:
+            if pkg.name not in selected:
+                selected[pkg.name] = pkg
+                queue.append(pkg)
+
+        for target in targets:
+            pkg = self.resolve(target, selected)
+            if pkg is not None:
+                select(pkg)
+            elif target in self.groups:
+                for member in self.groups[target]:
+                    select(member)
+            else:
+                missing.append(target)
+
+        while queue:
+            for dep in queue.popleft().depends:
+                pkg = self.resolve(dep, selected)
+                if pkg is None:
+                    if dep_name(dep) not in missing:
+                        missing.append(dep_name(dep))
+                else:
+                    select(pkg)
+
+        return Closure(list(selected.values()), missing)
+
+
+def estimate_install(pacman_conf: str, dbpath: str, packages: list[str]) -> Closure | None:
+    """Size the install of ``packages`` from the sync dbs under ``dbpath``.
+
+    Returns None when no sync database is available.
+    """
+    db = PackageDB.load(sync_db_paths(pacman_conf, dbpath))
+    if not len(db):
+        return None
+    return db.closure(packages)
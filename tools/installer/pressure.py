@@ -0,0 +1,132 @@
+"""Live system memory and tmpfs pressure monitoring during install.
+
+The live ISO runs from RAM: the writable live root (the archiso
+cowspace) and /tmp are tmpfs, so anything written there competes with
+the installer's own memory.  The monitor samples MemAvailable and the
+fill level of those tmpfs mounts in a background thread, warns once a
+warning threshold is crossed and, when a critical threshold holds for
+two consecutive samples, aborts the running commands through
+CommandRunner.abort() before the kernel's OOM killer picks a victim
+(often the installer UI itself).
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from .backend import CommandRunner
+from .hardware import read_meminfo
+from .resources import (
+    LIVE_TMPFS_PATHS,
+    MEMORY_ABORT_AVAILABLE_KIB,
+    MEMORY_WARN_AVAILABLE_KIB,
+    PRESSURE_INTERVAL_S,
+    TMPFS_ABORT_PERCENT,
+    TMPFS_WARN_PERCENT,
+)
+
+# Consecutive critical samples before aborting (rides out short spikes)
+ABORT_SAMPLES = 2
+
+
+def tmpfs_mounts(paths: tuple[str, ...] = LIVE_TMPFS_PATHS) -> list[str]:
+    """Return those of ``paths`` that are tmpfs mount points."""
+    try:
+        lines = Path("/proc/self/mounts").read_text().splitlines()
+    except OSError:
+        return []
+    tmpfs = {
+        fields[1] for fields in (line.split() for line in lines)
+        if len(fields) >= 3 and fields[2] == "tmpfs"
+    }
+    return [path for path in paths if path in tmpfs]
+
+
+def tmpfs_usage(path: str) -> tuple[int, int]:
+    """Return (used, total) bytes of the filesystem at ``path``."""
+    st = os.statvfs(path)
+    total = st.f_blocks * st.f_frsize
+    return total - st.f_bavail * st.f_frsize, total
+
+
+class PressureMonitor(threading.Thread):
+    """Watches live system memory while an install runs.
+
+    ``warn`` receives one message per resource each time it enters the
+    warning range.  On sustained critical pressure the runner is aborted
+    and ``reason`` holds the explanation.
+    """
+
+    def __init__(
+        self,
+        runner: CommandRunner,
+        warn: Callable[[str], None],
+        interval: float = PRESSURE_INTERVAL_S,
+    ):
+        super().__init__(name="pressure-monitor", daemon=True)
+        self.runner = runner
+        self.warn = warn
+        self.interval = interval
+        self.mounts = tmpfs_mounts()
+        self.reason = ""
+        self._stop_event = threading.Event()
+        self._warned: set[str] = set()
+        self._critical: dict[str, int] = {}
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.check()
+            if self.reason:
+                return
+
+    def check(self) -> None:
+        """Take one sample; warn or abort as needed."""
+        available = read_meminfo()["available_kib"]
+        if available:
+            self._level(
+                "memory",
+                critical=available < MEMORY_ABORT_AVAILABLE_KIB,
+                warning=available < MEMORY_WARN_AVAILABLE_KIB,
+                message=f"only {available // 1024} MiB of memory available",
+            )
+        for mount in self.mounts:
+            try:
+                used, total = tmpfs_usage(mount)
+            except OSError:
+                continue
+            if not total:
+                continue
+            percent = 100 * used // total
+            self._level(
+                mount,
+                critical=percent >= TMPFS_ABORT_PERCENT,
+                warning=percent >= TMPFS_WARN_PERCENT,
+                message=f"RAM-backed {mount} is {percent}% full "
+                        f"({used // 1024 ** 2} of {total // 1024 ** 2} MiB)",
+            )
+
+    def _level(self, key: str, critical: bool, warning: bool, message: str) -> None:
+        if not warning:
+            self._warned.discard(key)
+            self._critical.pop(key, None)
+            return
+        if key not in self._warned:
+            self._warned.add(key)
+            self.warn(f"WARNING: Low live system memory: {message}")
+        if not critical:
+            self._critical.pop(key, None)
+            return
+        self._critical[key] = self._critical.get(key, 0) + 1
+        if self._critical[key] >= ABORT_SAMPLES and not self.reason:
+            self.reason = (
+                f"Installation stopped: {message}. Continuing would risk the "
+                "live system running out of memory. Close other applications "
+                "or add RAM, then retry."
+            )
+            self.runner.abort(self.reason)
@@ -0,0 +1,85 @@
+"""CachyOS repository selection by x86-64 microarchitecture level.
+
+The bundled pacman.conf lists the x86-64-v3 repository ([cachyos-v3])
+ahead of the generic [cachyos] one.  The installer rewrites it for the
+audited CPU: [cachyos-v4] on AVX-512 machines, [cachyos-v3] on AVX2
+machines, and only the generic repositories otherwise, so the kernel and
+emulators come from the fastest build the CPU can run.
+"""
+
+import os
+import re
+from pathlib import Path
+
+# x86-64 level -> (optimized repository, its mirrorlist)
+OPTIMIZED_REPOS = {
+    "x86-64-v4": ("cachyos-v4", "cachyos-v4-mirrorlist"),
+    "x86-64-v3": ("cachyos-v3", "cachyos-v3-mirrorlist"),
+}
+
+_OPTIMIZED_SECTION_RE = re.compile(r"^\[cachyos-v\d\]$")
+
+
+def optimized_repo(arch_level: str) -> tuple[str, str] | None:
+    """Return (repository, mirrorlist) for ``arch_level``, or None for generic."""
+    return OPTIMIZED_REPOS.get(arch_level)
+
+
+def pacman_conf_for_level(text: str, arch_level: str, mirrorlist_dir: str) -> str:
+    """Rewrite pacman.conf text so its optimized repository matches ``arch_level``.
+
+    Existing ``[cachyos-v*]`` sections are dropped and the matching one,
+    if any, is inserted right before ``[cachyos]`` (repository order is
+    priority order).  Other sections and options are kept as they are.
+    """
+    lines: list[str] = []
+    # Options of the first dropped section (e.g. SigLevel) carry over
+    options: list[str] | None = None
+    collecting = skipping = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            skipping = bool(_OPTIMIZED_SECTION_RE.match(stripped))
+            collecting = skipping and options is None
+            if collecting:
+                options = []
+            if skipping:
+                continue
+        elif skipping and not stripped:
+            # A blank line ends the section and goes with it
+            skipping = collecting = False
+            continue
+        elif skipping and stripped.startswith("#"):
+            # So does a comment, which may head the next section
+            skipping = collecting = False
+        if not skipping:
+            lines.append(line)
+        elif collecting and not stripped.startswith(("Include", "Server")):
+            options.append(stripped)
+
+    repo = optimized_repo(arch_level)
+    if repo is not None:
+        name, mirrorlist = repo
+        section = [f"[{name}]", f"Include = {mirrorlist_dir}/{mirrorlist}"]
+        section += (options or []) + [""]
+        try:
+            index = next(i for i, line in enumerate(lines) if line.strip() == "[cachyos]")
+        except StopIteration:
+            # No [cachyos] section: the optimized repository goes first
+            index = next(
+                (i for i, line in enumerate(lines)
+                 if line.strip().startswith("[") and line.strip() != "[options]"),
+                len(lines),
+            )
+        lines[index:index] = section
+    return "\n".join(lines) + "\n"
+
+
+def write_pacman_conf(src: str, dest: str, arch_level: str, mirrorlist_dir: str) -> str:
+    """Write the pacman.conf for ``arch_level`` to ``dest`` and return its path."""
+    text = pacman_conf_for_level(Path(src).read_text(), arch_level, mirrorlist_dir)
+    # Atomic: the estimate and prefetch threads may generate it concurrently
+    tmp = f"{dest}.{os.getpid()}.{id(text)}"
+    Path(tmp).write_text(text)
+    os.replace(tmp, dest)
+    return dest
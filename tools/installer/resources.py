@@ -3,7 +3,47 @@
 MOUNTPOINT = "/mnt/amicachy"
 CACHYOS_GPG_KEY = "882DCFE48E2051D48E2562ABF3B607488DB35A47"
 INSTALLER_DATA_DIR = "/usr/share/amicachy/installer"
+# Python tools on the live system (installer, earlystartup)
+AMICACHY_TOOLS_DIR = "/usr/share/amicachy/tools"
+# Early-boot F5 capture for Early Startup Control (airootfs unit)
+HOTKEY_SERVICE = "amicachy-hotkeys.service"
+# Early-boot readahead of the emulator's files (airootfs unit, with the
+# tmpfiles.d entry for its state directory)
+READAHEAD_SERVICE = "amicachy-readahead.service"
+READAHEAD_TMPFILES = "/etc/tmpfiles.d/amicachy-readahead.conf"
+# Per-profile CPU tuning helper, run by amilaunch.sh through sudo
+TUNING_HELPER = "/usr/bin/amicachy-tune"
+TUNING_SUDOERS = "/etc/sudoers.d/amicachy-tune"
+# Transparent huge page policy for the emulated RAM (launcher/hugepages.py)
+HUGEPAGES_TMPFILES = "/etc/tmpfiles.d/amicachy-hugepages.conf"
+# Local CachyOS key material: the live system's cachyos-keyring package,
+# else the key exported into the installer data at ISO build time
+CACHYOS_KEYRING = "/usr/share/pacman/keyrings/cachyos.gpg"
+CACHYOS_KEY_FILE = f"{INSTALLER_DATA_DIR}/cachyos-key.gpg"
+PACMAN_GNUPG_DIR = "/etc/pacman.d/gnupg"
 INSTALL_LOG_PATH = "/tmp/amicachy-install.log"
+# pacman.conf generated for the audited CPU level (see repos.py)
+GENERATED_PACMAN_CONF = "/tmp/amicachy-pacman.conf"
+# Private pacman dbpath for sync databases refreshed by the installer, so
+# the live system's own pacman state is left alone
+SYNC_DBPATH = "/tmp/amicachy-syncdb"
+
+# Speculative downloads made while the wizard is open (live system)
+PREFETCH_CACHE_DIR = "/var/cache/amicachy/prefetch"
+PREFETCH_LOG_PATH = "/tmp/amicachy-prefetch.log"
+# Skip prefetching into the RAM-backed live root below this much free memory
+PREFETCH_MIN_AVAILABLE_KIB = 3 * 1024 * 1024
+
+# Package cache on the target disk, filled by the download stage
+TARGET_CACHE_DIR = f"{MOUNTPOINT}/var/cache/pacman/pkg"
+
+# Live system pressure during install: the live root and /tmp are RAM-backed
+LIVE_TMPFS_PATHS = ("/run/archiso/cowspace", "/tmp")
+PRESSURE_INTERVAL_S = 2.0
+MEMORY_WARN_AVAILABLE_KIB = 512 * 1024
+MEMORY_ABORT_AVAILABLE_KIB = 128 * 1024
+TMPFS_WARN_PERCENT = 85
+TMPFS_ABORT_PERCENT = 97
 
 # Minimum disk size in bytes (20 GiB)
 MIN_DISK_SIZE = 20 * 1024 * 1024 * 1024
@@ -26,6 +66,13 @@ BOOT_ENTRIES = {
     },
 }
 
+# Boot entry for the fallback initramfs (only if one is built); it boots
+# the default profile.
+FALLBACK_ENTRY = {
+    "filename": "99-fallback.conf",
+    "title": "AmiCachy - Fallback initramfs",
+}
+
 LOADER_CONF_TEMPLATE = """\
 default {default_entry}
 timeout 5
@@ -33,6 +80,34 @@ editor  no
 console-mode max
 """
 
+# Staged into the target before pacstrap, so the kernel's install hook
+# builds the final initramfs exactly once.
+MKINITCPIO_CONF_TEMPLATE = """\
+MODULES=()
+BINARIES=()
+FILES=()
+HOOKS=(base udev plymouth autodetect microcode modconf kms block filesystems keyboard)
+COMPRESSION="{compression}"
+"""
+
+MKINITCPIO_PRESET_TEMPLATE = """\
+# mkinitcpio preset file for the 'linux-cachyos' package (AmiCachy installer)
+
+ALL_kver="/boot/vmlinuz-linux-cachyos"
+
+PRESETS=({presets})
+
+default_image="/boot/initramfs-linux-cachyos.img"
+
+fallback_image="/boot/initramfs-linux-cachyos-fallback.img"
+fallback_options="-S autodetect"
+"""
+
+# COMPRESSION values accepted by mkinitcpio ("cat" means uncompressed)
+INITRAMFS_COMPRESSIONS = ("zstd", "lz4", "cat")
+
+PLYMOUTHD_CONF = "[Daemon]\nTheme=amicachy\nShowDelay=0\nDeviceTimeout=5\n"
+
 PROFILE_DISPLAY = {
     "classic_68k": {
         "name": "Classic 68k",
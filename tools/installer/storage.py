@@ -0,0 +1,205 @@
+"""Storage classification, filesystem profiles, and partition alignment.
+
+The target disk is classified from the transport and rotational flag that
+lsblk reports, and each class gets a filesystem profile: mkfs options for
+the root and data partitions plus the mount options that end up in fstab
+(genfstab copies them from the live mounts).  The same class drives the
+installed system's storage policy: I/O scheduler udev rules, periodic
+TRIM, writeback limits and the initramfs compression.
+"""
+
+import math
+from pathlib import Path
+
+MIB = 1024 * 1024
+
+# Beyond this, optimal_io_size is almost certainly bogus (some USB bridges
+# report 32 MiB - 512 B); fall back to plain 1 MiB alignment.
+MAX_ALIGNMENT_MIB = 64
+
+FS_PROFILES = {
+    "nvme": {
+        "description": "NVMe SSD",
+        "root_fs": "ext4",
+        # fast_commit shortens fsync; lazy_itable_init leaves inode table
+        # zeroing to the kernel's ext4lazyinit thread after first mount.
+        "root_mkfs": ["-O", "fast_commit", "-E", "lazy_itable_init=1"],
+        "root_options": "noatime,commit=60",
+        "data_fs": "btrfs",
+        "data_mkfs": [],
+        "data_options": "noatime,compress=zstd:1",
+        # Deep hardware queues: any software scheduler only adds latency
+        "io_scheduler": "none",
+        "fstrim": True,
+        # (dirty_background, dirty) in MiB: roughly what the device can
+        # flush in a second, so writeback never stalls a frame for long.
+        "writeback_mib": (256, 1024),
+        # Reads are effectively free; lz4 decompresses several times faster
+        "initramfs_compression": "lz4",
+    },
+    "ssd": {
+        "description": "SATA SSD",
+        "root_fs": "ext4",
+        "root_mkfs": ["-O", "fast_commit", "-E", "lazy_itable_init=1"],
+        "root_options": "noatime,commit=60",
+        "data_fs": "btrfs",
+        "data_mkfs": [],
+        "data_options": "noatime,compress=zstd:1",
+        "io_scheduler": "mq-deadline",
+        "fstrim": True,
+        "writeback_mib": (128, 512),
+        "initramfs_compression": "lz4",
+    },
+    "hdd": {
+        "description": "Hard disk",
+        "root_fs": "ext4",
+        "root_mkfs": ["-O", "fast_commit", "-E", "lazy_itable_init=1"],
+        "root_options": "noatime,commit=30",
+        "data_fs": "btrfs",
+        "data_mkfs": [],
+        # Stronger compression trades cheap CPU for scarce seek bandwidth;
+        # autodefrag keeps HDF images from fragmenting under CoW rewrites.
+        "data_options": "noatime,compress=zstd:3,autodefrag",
+        # bfq keeps the emulator's HDF reads responsive under writeback
+        "io_scheduler": "bfq",
+        "fstrim": False,
+        "writeback_mib": (32, 128),
+        # Slow reads: the smaller zstd image wins despite slower decompression
+        "initramfs_compression": "zstd",
+    },
+    "flash": {
+        "description": "USB / SD flash",
+        "root_fs": "ext4",
+        # Whole-device discard is very slow on most USB/SD controllers
+        "root_mkfs": ["-O", "fast_commit", "-E", "lazy_itable_init=1,nodiscard"],
+        "root_options": "noatime,commit=120",
+        "data_fs": "btrfs",
+        "data_mkfs": ["--nodiscard"],
+        "data_options": "noatime,compress=zstd:3",
+        "io_scheduler": "bfq",
+        # Harmless where the bridge doesn't pass TRIM through: fstrim skips it
+        "fstrim": True,
+        "writeback_mib": (16, 64),
+        "initramfs_compression": "zstd",
+    },
+}
+
+
+def select_fs_profile(transport: str, rotational: bool) -> str:
+    """Pick a FS_PROFILES key from lsblk's TRAN and ROTA values."""
+    transport = transport.lower()
+    if transport == "nvme":
+        return "nvme"
+    if transport in ("usb", "mmc"):
+        return "flash"
+    if rotational:
+        return "hdd"
+    return "ssd"
+
+
+# Scheduler per device class (numbered after 60-persistent-storage.rules,
+# which sets ID_BUS).  Rules match at runtime, so disks attached
+# after installation are handled too; the installed disk's class is what
+# selected its mount options and writeback limits.
+UDEV_SCHEDULER_RULES = """\
+# Generated by the AmiCachy installer: I/O scheduler per device class
+ACTION=="add|change", ENV{{DEVTYPE}}=="disk", KERNEL=="nvme[0-9]*n[0-9]*", ATTR{{queue/scheduler}}="{nvme}"
+ACTION=="add|change", ENV{{DEVTYPE}}=="disk", KERNEL=="sd[a-z]*|mmcblk[0-9]*", ENV{{ID_BUS}}=="usb", ATTR{{queue/scheduler}}="{flash}"
+ACTION=="add|change", ENV{{DEVTYPE}}=="disk", KERNEL=="mmcblk[0-9]*", ATTR{{queue/scheduler}}="{flash}"
+ACTION=="add|change", ENV{{DEVTYPE}}=="disk", KERNEL=="sd[a-z]*", ENV{{ID_BUS}}!="usb", ATTR{{queue/rotational}}=="0", ATTR{{queue/scheduler}}="{ssd}"
+ACTION=="add|change", ENV{{DEVTYPE}}=="disk", KERNEL=="sd[a-z]*", ENV{{ID_BUS}}!="usb", ATTR{{queue/rotational}}=="1", ATTR{{queue/scheduler}}="{hdd}"
+"""
+
+
+def udev_scheduler_rules() -> str:
+    """Return the udev rules file assigning each device class its scheduler."""
+    return UDEV_SCHEDULER_RULES.format(
+        **{name: profile["io_scheduler"] for name, profile in FS_PROFILES.items()}
+    )
+
+
+def writeback_sysctl(fs_profile: str, mem_total_kib: int) -> str:
+    """Return a sysctl.d drop-in bounding dirty page writeback.
+
+    The kernel's default ratios (10%/20% of RAM) allow gigabytes of dirty
+    data on a modern machine, which then flush in one long burst.  Limits
+    are sized to the disk's throughput and capped at a tenth of RAM.
+    """
+    background_mib, limit_mib = FS_PROFILES[fs_profile]["writeback_mib"]
+    if mem_total_kib > 0:
+        cap_mib = max(mem_total_kib // 1024 // 10, 64)
+        limit_mib = min(limit_mib, cap_mib)
+        background_mib = min(background_mib, limit_mib // 4)
+    return (
+        f"# Generated by the AmiCachy installer for {FS_PROFILES[fs_profile]['description']}\n"
+        f"vm.dirty_background_bytes = {background_mib * MIB}\n"
+        f"vm.dirty_bytes = {limit_mib * MIB}\n"
+        "vm.dirty_expire_centisecs = 1500\n"
+        "vm.dirty_writeback_centisecs = 500\n"
+    )
+
+
+def _queue_value(device: str, attr: str) -> int:
+    name = Path(device).name
+    try:
+        return int(Path(f"/sys/class/block/{name}/queue/{attr}").read_text())
+    except (OSError, ValueError):
+        return 0
+
+
+def disk_size_mib(device: str) -> int:
+    """Size of a block device in MiB (0 if unknown)."""
+    name = Path(device).name
+    try:
+        sectors = int(Path(f"/sys/class/block/{name}/size").read_text())
+    except (OSError, ValueError):
+        return 0
+    return sectors * 512 // MIB
+
+
+def alignment_mib(device: str) -> int:
+    """Partition alignment in MiB honouring the device's optimal_io_size."""
+    io_size = max(
+        _queue_value(device, "optimal_io_size"),
+        _queue_value(device, "minimum_io_size"),
+    )
+    if io_size <= 0:
+        return 1
+    align = math.lcm(MIB, io_size) // MIB
+    return align if align <= MAX_ALIGNMENT_MIB else 1
+
+
+def _align_up(value: int, align: int) -> int:
+    return -(-value // align) * align
+
+
+def _align_down(value: int, align: int) -> int:
+    return value // align * align
+
+
+def partition_bounds(device: str, efi_mib: int = 512, root_share: float = 0.6) -> dict:
+    """Return parted start/end strings for the EFI, root and data partitions.
+
+    Boundaries are multiples of the device alignment.  Without a known
+    disk size, falls back to parted's percentage bounds.
+    """
+    align = alignment_mib(device)
+    total = disk_size_mib(device)
+    efi_start = align
+    efi_end = _align_up(efi_start + efi_mib, align)
+    if total <= 0:
+        root_end = f"{int(root_share * 100)}%"
+    else:
+        root_end = f"{_align_down(int(total * root_share), align)}MiB"
+    return {
+        "efi": (f"{efi_start}MiB", f"{efi_end}MiB"),
+        "root": (f"{efi_end}MiB", root_end),
+        "data": (root_end, "100%"),
+    }
+
+
+def mkfs_command(fs: str, label: str, device: str, extra: list[str]) -> list[str]:
+    """Build the mkfs invocation for an ext4 or btrfs partition."""
+    if fs == "btrfs":
+        return ["mkfs.btrfs", "-f", "-L", label] + extra + [device]
+    return [f"mkfs.{fs}", "-F", "-L", label] + extra + [device]
@@ -0,0 +1,212 @@
+"""Compressed swap in RAM (zram) for the installed system.
+
+The installed system has no swap partition.  Instead, zram-generator
+creates a compressed swap device in RAM at boot, sized from the installed
+memory and the selected profiles: the Dev Station (VS Code, Amiberry and
+labwc together) gets a larger device on 4-8 GiB machines, where it would
+otherwise hit the OOM killer or long reclaim stalls.
+
+The compression algorithm is picked by a short benchmark on the live
+system, which runs on the same hardware: a sample of real process memory
+(the installer's own heap, a large Qt application) is written to a
+temporary zram device once per candidate algorithm, using the kernel's
+own compressors, and the compression ratio and throughput are measured.
+The best ratio wins unless it is too slow to swap with.
+"""
+
+import mmap
+import os
+import subprocess
+import time
+from pathlib import Path
+
+MIB = 1024 * 1024
+PAGE = mmap.PAGESIZE
+
+# Kernel zram compressors, preferred first when equally good
+ZRAM_ALGORITHMS = ("zstd", "lz4", "lzo-rle")
+DEFAULT_ALGORITHM = "zstd"
+# Below these rates (MiB/s, one CPU) an algorithm stalls reclaim and page
+# faults more than its better ratio saves; the fastest is used instead
+MIN_COMPRESS_MIB_S = 150
+MIN_DECOMPRESS_MIB_S = 500
+
+# Memory sampled for the benchmark
+SAMPLE_MIB = 32
+ZRAM_CONTROL = "/sys/class/zram-control"
+
+# zram device size in percent of RAM, and its upper bound.  The device
+# holds uncompressed pages, so 100% at a 3:1 ratio uses a third of RAM.
+ZRAM_PERCENT = 50
+ZRAM_DEV_STATION_PERCENT = 100
+DEV_STATION_SMALL_RAM_MIB = 8 * 1024
+ZRAM_MAX_MIB = 16 * 1024
+
+
+def zram_size_mib(mem_total_kib: int, profiles: list[str]) -> int:
+    """zram device size for the installed RAM and selected profiles."""
+    ram_mib = mem_total_kib // 1024
+    percent = ZRAM_PERCENT
+    if "dev_station" in profiles and ram_mib <= DEV_STATION_SMALL_RAM_MIB:
+        percent = ZRAM_DEV_STATION_PERCENT
+    return min(ram_mib * percent // 100, ZRAM_MAX_MIB)
+
+
+def _memory_sample(limit: int = SAMPLE_MIB * MIB) -> mmap.mmap | None:
+    """Page-aligned copy of this process's private writable memory."""
+    buffer = mmap.mmap(-1, limit)
+    used = 0
+    with open("/proc/self/maps") as maps, open("/proc/self/mem", "rb", buffering=0) as mem:
+        for line in maps:
+            fields = line.split()
+            # Anonymous and heap memory, as would be swapped
+            if fields[1] != "rw-p" or (len(fields) > 5 and fields[5] != "[heap]"):
+                continue
+            start, end = (int(x, 16) for x in fields[0].split("-"))
+            size = min(end - start, limit)
+            try:
+                chunk = os.pread(mem.fileno(), size, start)
+            except OSError:
+                continue
+            # Zero pages are never swapped out (zram stores them without
+            # compression either), so they would only inflate the ratio
+            for offset in range(0, len(chunk), PAGE):
+                page = chunk[offset:offset + PAGE]
+                if page.count(0) == len(page) or used + len(page) > limit:
+                    continue
+                buffer[used:used + len(page)] = page
+                used += len(page)
+            if used + PAGE > limit:
+                break
+    # Whole MiB, the benchmark's write size
+    used -= used % MIB
+    if used < 4 * MIB:
+        buffer.close()
+        return None
+    sample = mmap.mmap(-1, used)
+    sample[:] = buffer[:used]
+    buffer.close()
+    return sample
+
+
+def _zram_attr(device: int, name: str, value: str | None = None) -> str:
+    path = Path(f"/sys/block/zram{device}/{name}")
+    if value is None:
+        return path.read_text().strip()
+    path.write_text(value)
+    return value
+
+
+def _bench_algorithm(device: int, algorithm: str, sample: mmap.mmap) -> dict:
+    """Write ``sample`` to the zram device and read it back."""
+    _zram_attr(device, "reset", "1")
+    _zram_attr(device, "comp_algorithm", algorithm)
+    _zram_attr(device, "disksize", str(len(sample)))
+    readback = mmap.mmap(-1, len(sample))
+    fd = os.open(f"/dev/zram{device}", os.O_RDWR | os.O_DIRECT)
+    try:
+        start = time.perf_counter()
+        for offset in range(0, len(sample), MIB):
+            os.pwrite(fd, memoryview(sample)[offset:offset + MIB], offset)
+        compress_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for offset in range(0, len(sample), MIB):
+            os.preadv(fd, [memoryview(readback)[offset:offset + MIB]], offset)
+        decompress_s = time.perf_counter() - start
+    finally:
+        os.close(fd)
+        readback.close()
+    orig, compressed = (int(v) for v in _zram_attr(device, "mm_stat").split()[:2])
+    mib = len(sample) / MIB
+    return {
+        "ratio": round(orig / compressed, 2) if compressed else 0.0,
+        "compress_mib_s": round(mib / compress_s),
+        "decompress_mib_s": round(mib / decompress_s),
+    }
+
+
+def benchmark_zram() -> dict[str, dict]:
+    """Ratio and throughput of each available zram algorithm.
+
+    Returns an empty dict when zram can't be used here (no module, not
+    root, too little memory to sample).
+    """
+    try:
+        subprocess.run(["modprobe", "zram", "num_devices=0"], capture_output=True)
+    except OSError:
+        pass  # zram may be built in or loaded already
+    sample = None
+    device = None
+    results: dict[str, dict] = {}
+    try:
+        sample = _memory_sample()
+        if sample is None:
+            return {}
+        device = int(Path(f"{ZRAM_CONTROL}/hot_add").read_text())
+        available = _zram_attr(device, "comp_algorithm").replace("[", "").replace("]", "").split()
+        for algorithm in ZRAM_ALGORITHMS:
+            if algorithm in available:
+                results[algorithm] = _bench_algorithm(device, algorithm, sample)
+    except (OSError, ValueError):
+        return results
+    finally:
+        if device is not None:
+            try:
+                _zram_attr(device, "reset", "1")
+                Path(f"{ZRAM_CONTROL}/hot_remove").write_text(str(device))
+            except OSError:
+                pass
+        if sample is not None:
+            sample.close()
+    return results
+
+
+def select_algorithm(results: dict[str, dict]) -> str:
+    """Best-ratio algorithm that is fast enough, else the fastest one."""
+    if not results:
+        return DEFAULT_ALGORITHM
+    fast_enough = [
+        name for name, r in results.items()
+        if r["compress_mib_s"] >= MIN_COMPRESS_MIB_S
+        and r["decompress_mib_s"] >= MIN_DECOMPRESS_MIB_S
+    ]
+    if fast_enough:
+        return max(fast_enough, key=lambda name: results[name]["ratio"])
+    return max(results, key=lambda name: results[name]["decompress_mib_s"])
+
+
+def zram_generator_conf(
+    mem_total_kib: int, profiles: list[str], algorithm: str, results: dict[str, dict]
+) -> str:
+    """Return /etc/systemd/zram-generator.conf for the installed system."""
+    lines = [
+        f"# Generated by the AmiCachy installer: {mem_total_kib // 1024} MiB RAM, "
+        f"profiles {', '.join(profiles) or '-'}",
+    ]
+    for name, r in results.items():
+        lines.append(
+            f"# {name}: ratio {r['ratio']}, compress {r['compress_mib_s']} MiB/s, "
+            f"decompress {r['decompress_mib_s']} MiB/s"
+        )
+    lines += [
+        "[zram0]",
+        f"zram-size = {zram_size_mib(mem_total_kib, profiles)}",
+        f"compression-algorithm = {algorithm}",
+        "swap-priority = 100",
+        "fs-type = swap",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def zram_sysctl() -> str:
+    """Return a sysctl.d drop-in tuning reclaim for swap on zram."""
+    return (
+        "# Generated by the AmiCachy installer for swap on zram\n"
+        # Swapping to RAM is cheaper than dropping page cache that must be
+        # read back from disk
+        "vm.swappiness = 180\n"
+        # No swap readahead: zram has no seek cost to amortise
+        "vm.page-cluster = 0\n"
+        "vm.watermark_boost_factor = 0\n"
+        "vm.watermark_scale_factor = 125\n"
+    )
@@ -2,8 +2,14 @@
 
 import json
 import re
+import signal
 import subprocess
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
 
 from PySide6.QtCore import QThread, Signal
 
@@ -13,23 +19,42 @@ from .backend import (
     NetworkError,
     configure_system,
     emergency_cleanup,
+    installer_pacman_conf,
     final_cleanup,
+    finish_package_cache,
     generate_fstab,
     install_bootloader,
     mount_filesystems,
     partition_disk,
-    read_package_list,
     run_pacstrap,
     setup_pacman,
+    stage_boot_config,
 )
+from .download import download_packages
 from .hardware import (
     detect_arch_level,
+    detect_gpu_vendors,
     detect_virtualization,
+    measure_sched_latency,
     read_cpuinfo,
+    read_meminfo,
     recommend_profiles,
     run_benchmark,
 )
-from .resources import INSTALLER_DATA_DIR, MOUNTPOINT
+from .packages import select_packages
+from .mirrors import rank_mirrorlists
+from .pkgdb import estimate_install
+from .pressure import PressureMonitor
+from .repos import optimized_repo
+from .resources import (
+    INSTALLER_DATA_DIR,
+    PREFETCH_CACHE_DIR,
+    PREFETCH_LOG_PATH,
+    PREFETCH_MIN_AVAILABLE_KIB,
+    SYNC_DBPATH,
+    TARGET_CACHE_DIR,
+)
+from .storage import FS_PROFILES, select_fs_profile
 
 
 @dataclass
@@ -43,15 +68,46 @@ class InstallerState:
     target_device: str = ""
     target_device_model: str = ""
     target_device_size: int = 0
+    target_device_transport: str = ""
+    target_device_rotational: bool = False
+    fs_profile: str = ""
+
+    # Initramfs: compression ("" = storage profile default), fallback image
+    initramfs_compression: str = ""
+    initramfs_fallback: bool = False
 
     # Profile selection
     selected_profiles: list[str] = field(default_factory=list)
     default_profile: str = "classic_68k"
 
+    # Package closure estimate: count, download/installed bytes, missing
+    package_estimate: dict = field(default_factory=dict)
+
+    # Set once the live mirrorlists have been ranked; the lock is held
+    # while a ranking runs (see rank_mirrors_once)
+    mirrors_ranked: threading.Event = field(default_factory=threading.Event)
+    mirrors_lock: threading.Lock = field(default_factory=threading.Lock)
+
+    # Leave the downloaded packages in the installed system's pacman cache
+    keep_package_cache: bool = False
+
     # Computed during installation
     partitions: dict[str, str] = field(default_factory=dict)
 
 
+def rank_mirrors_once(state: InstallerState, log: Callable[[str], None]) -> None:
+    """Rank the live mirrorlists once per installer run.
+
+    Called by both the prefetch and the install worker: a caller that
+    finds a ranking in flight waits for it instead of probing again.  A
+    ranking that raises leaves the flag unset, so the next caller retries.
+    """
+    with state.mirrors_lock:
+        if not state.mirrors_ranked.is_set():
+            rank_mirrorlists(log=log)
+            state.mirrors_ranked.set()
+
+
 class HardwareAuditWorker(QThread):
     """Runs CPU detection, virtualization check, and benchmark."""
 
@@ -63,12 +119,19 @@ class HardwareAuditWorker(QThread):
         cpuinfo = read_cpuinfo()
         arch_level = detect_arch_level(cpuinfo["flags"])
 
+        memory = read_meminfo()
+
+        gpu_vendors = detect_gpu_vendors()
         self.progress.emit("Checking virtualization support...")
         virt = detect_virtualization(cpuinfo["flags"])
 
         self.progress.emit("Running performance benchmark...")
         bench = run_benchmark(duration_s=3.0)
 
+        # Sizes the audio server's buffers (installer/audio.py)
+        self.progress.emit("Measuring scheduling latency...")
+        sched_latency = measure_sched_latency()
+
         profiles = recommend_profiles(arch_level, virt, bench)
 
         result = {
@@ -77,9 +140,13 @@ class HardwareAuditWorker(QThread):
                 "cores": cpuinfo["cores"],
                 "threads": cpuinfo["threads"],
                 "arch_level": arch_level,
+                "vendor": cpuinfo["vendor"],
             },
+            "gpu": {"vendors": gpu_vendors},
+            "memory": memory,
             "virtualization": virt,
             "benchmark": bench,
+            "sched_latency": sched_latency,
             "profiles": profiles,
         }
         self.finished.emit(result)
@@ -96,7 +163,7 @@ class DiskScanWorker(QThread):
             result = subprocess.run(
                 [
                     "lsblk", "--json", "--bytes",
-                    "--output", "NAME,SIZE,MODEL,TYPE,TRAN,RO,RM",
+                    "--output", "NAME,SIZE,MODEL,TYPE,TRAN,RO,RM,ROTA",
                 ],
                 capture_output=True,
                 text=True,
@@ -139,6 +206,8 @@ class DiskScanWorker(QThread):
 
                 model = dev.get("model", "").strip() or "Unknown drive"
                 transport = dev.get("tran", "") or ""
+                # Older lsblk prints ROTA as "0"/"1", newer as a boolean
+                rotational = dev.get("rota") in (True, 1, "1")
                 size_gb = size / (1024 ** 3)
 
                 disks.append({
@@ -146,6 +215,7 @@ class DiskScanWorker(QThread):
                     "device": f"/dev/{name}",
                     "model": model,
                     "transport": transport.upper(),
+                    "rotational": rotational,
                     "size": size,
                     "size_display": f"{size_gb:.1f} GB",
                 })
@@ -157,6 +227,186 @@ class DiskScanWorker(QThread):
         self.finished.emit(disks)
 
 
+class EstimateWorker(QThread):
+    """Sizes the package selection from freshly synced pacman databases."""
+
+    finished = Signal(dict)
+
+    def __init__(self, state: InstallerState):
+        super().__init__()
+        self.state = state
+
+    def run(self):
+        estimate: dict = {}
+        try:
+            packages = select_packages(
+                INSTALLER_DATA_DIR,
+                self.state.selected_profiles,
+                self.state.audit_result,
+            )
+            pacman_conf = installer_pacman_conf(
+                self.state.audit_result.get("cpu", {}).get("arch_level", "")
+            )
+            Path(SYNC_DBPATH).mkdir(parents=True, exist_ok=True)
+            # Best effort: without network, whatever databases exist are used
+            subprocess.run(
+                ["pacman", "-Sy", "--config", pacman_conf, "--dbpath", SYNC_DBPATH],
+                capture_output=True,
+                timeout=120,
+            )
+            closure = estimate_install(pacman_conf, SYNC_DBPATH, packages)
+            if closure is not None:
+                estimate = {
+                    "count": closure.count,
+                    "download_size": closure.download_size,
+                    "installed_size": closure.installed_size,
+                    "missing": closure.missing,
+                }
+        except (InstallError, OSError, subprocess.SubprocessError,
+                tarfile.TarError, ValueError):
+            pass
+        self.finished.emit(estimate)
+
+
+class PrefetchWorker(QThread):
+    """Downloads the likely package set while the user is in the wizard.
+
+    Started when the wizard opens with base plus the default profile, and
+    re-targeted (``refresh()``) when the audit or profile selection
+    changes.  Packages land in PREFETCH_CACHE_DIR, which pacstrap later
+    reads as an extra cache; ``stop()`` ends any running download.
+    """
+
+    RETRY_S = 15.0
+
+    def __init__(self, state: InstallerState):
+        super().__init__()
+        self.state = state
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        # (x86-64 level, packages): the level picks the repositories
+        self._targets: tuple[str, list[str]] = ("", [])
+        self._proc: subprocess.Popen | None = None
+
+    def refresh(self) -> None:
+        """Recompute the package set from the current state (GUI thread)."""
+        try:
+            packages = select_packages(
+                INSTALLER_DATA_DIR,
+                self.state.selected_profiles or [self.state.default_profile],
+                self.state.audit_result,
+            )
+        except (InstallError, OSError):
+            return
+        arch_level = self.state.audit_result.get("cpu", {}).get("arch_level", "")
+        with self._lock:
+            self._targets = (arch_level, packages)
+        self._wake.set()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            proc = self._proc
+        self._wake.set()
+        if proc is not None and proc.poll() is None:
+            # pacman removes its db.lck on SIGINT, not on SIGTERM: a stale
+            # lock in SYNC_DBPATH would fail the install's own -Sy
+            proc.send_signal(signal.SIGINT)
+
+    def run(self):
+        if read_meminfo()["available_kib"] < PREFETCH_MIN_AVAILABLE_KIB:
+            return
+        with open(PREFETCH_LOG_PATH, "a") as log:
+            rank_mirrors_once(self.state, lambda line: print(line, file=log, flush=True))
+            done: tuple[str, list[str]] = ("", [])
+            while True:
+                with self._lock:
+                    if self._stopped:
+                        return
+                    targets = self._targets
+                if targets[1] and targets != done:
+                    if self._download(*targets, log):
+                        done = targets
+                    else:
+                        # Offline or database locked by the estimator: retry
+                        self._wake.wait(self.RETRY_S)
+                        self._wake.clear()
+                        continue
+                self._wake.wait()
+                self._wake.clear()
+
+    def _download(self, arch_level: str, targets: list[str], log) -> bool:
+        pacman_conf = installer_pacman_conf(arch_level)
+        Path(SYNC_DBPATH).mkdir(parents=True, exist_ok=True)
+        Path(PREFETCH_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        base = ["pacman", "--config", pacman_conf, "--dbpath", SYNC_DBPATH]
+        for cmd in (
+            base + ["-Sy"],
+            base + ["-Sw", "--noconfirm", "--cachedir", PREFETCH_CACHE_DIR] + targets,
+        ):
+            with self._lock:
+                if self._stopped:
+                    return False
+                print(f">>> {' '.join(cmd)}", file=log, flush=True)
+                self._proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+            returncode = self._proc.wait()
+            with self._lock:
+                self._proc = None
+            if returncode != 0:
+                return False
+        return True
+
+
+class PacstrapProgress:
+    """Maps pacstrap output onto a progress range.
+
+    Downloads fill the first part of the range and ``(n/N) installing``
+    lines the rest.  The download denominator is the estimated package
+    count; pacman supplies its own for the install phase.
+    """
+
+    DOWNLOAD_RE = re.compile(r"^\s*\S+ downloading\.\.\.$")
+    INSTALL_RE = re.compile(r"^\(\s*(\d+)/(\d+)\) installing ")
+
+    def __init__(
+        self,
+        emit: Callable[[str, int], None],
+        total: int,
+        start: int,
+        split: int,
+        end: int,
+    ):
+        self.emit = emit
+        self.total = total
+        self.start, self.split, self.end = start, split, end
+        self.downloaded = 0
+        self._last = start
+
+    def _report(self, text: str, percent: int) -> None:
+        if percent > self._last:
+            self._last = percent
+            self.emit(text, percent)
+
+    def __call__(self, line: str) -> None:
+        match = self.INSTALL_RE.match(line)
+        if match:
+            done, total = int(match.group(1)), int(match.group(2))
+            span = self.end - self.split
+            self._report(
+                f"Installing packages ({done}/{total})...",
+                self.split + span * done // max(total, 1),
+            )
+        elif self.total and self.DOWNLOAD_RE.match(line):
+            self.downloaded += 1
+            span = self.split - self.start
+            done = min(self.downloaded, self.total)
+            self._report(
+                f"Downloading packages ({done}/{self.total})...",
+                self.start + span * done // self.total,
+            )
+
+
 class InstallWorker(QThread):
     """Runs the entire installation sequence."""
 
@@ -170,69 +420,170 @@ class InstallWorker(QThread):
 
     def run(self):
         runner = CommandRunner(log_callback=self.log_line.emit)
+        monitor = PressureMonitor(runner, self.log_line.emit)
+        monitor.start()
         try:
             self._do_install(runner)
+            monitor.stop()
             self.finished.emit(True, "")
         except NetworkError as e:
             self.log_line.emit(f"NETWORK ERROR: {e}")
-            emergency_cleanup(runner)
+            self._cleanup_after_failure(runner, monitor)
             self.finished.emit(False, str(e))
         except InstallError as e:
             self.log_line.emit(f"ERROR: {e}")
-            emergency_cleanup(runner)
+            self._cleanup_after_failure(runner, monitor)
             self.finished.emit(False, str(e))
         except Exception as e:
             self.log_line.emit(f"UNEXPECTED ERROR: {e}")
-            emergency_cleanup(runner)
+            self._cleanup_after_failure(runner, monitor)
             self.finished.emit(False, f"Unexpected error: {e}")
         finally:
+            monitor.stop()
             runner.close()
 
+    @staticmethod
+    def _cleanup_after_failure(runner: CommandRunner, monitor: PressureMonitor) -> None:
+        # An abort by the pressure monitor blocks commands; unmounting must run
+        monitor.stop()
+        runner.clear_abort()
+        emergency_cleanup(runner)
+
     def _do_install(self, runner: CommandRunner) -> None:
         device = self.state.target_device
+        if not self.state.fs_profile:
+            self.state.fs_profile = select_fs_profile(
+                self.state.target_device_transport,
+                self.state.target_device_rotational,
+            )
+        fs_profile = self.state.fs_profile
+        self.log_line.emit(
+            f"Storage profile: {FS_PROFILES[fs_profile]['description']}"
+        )
+
+        # Key setup is local and independent of the disk: overlap it with
+        # formatting and collect its result at Step 4.  It gets its own
+        # runner, as a CommandRunner is not shared between threads.
+        keys_runner = CommandRunner(log_callback=self.log_line.emit, tag="keyring")
+        keys_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="keyring")
+        keys = keys_executor.submit(setup_pacman, keys_runner)
+        try:
+            # Step 1: Partition disk
+            self.step_changed.emit("Preparing disk...", 2)
+            self.state.partitions = partition_disk(runner, device, fs_profile)
+            self.step_changed.emit("Disk partitioned.", 10)
+
+            # Step 2: Mount filesystems
+            self.step_changed.emit("Mounting filesystems...", 12)
+            mount_filesystems(runner, self.state.partitions, fs_profile)
+            self.step_changed.emit("Filesystems mounted.", 15)
+
+            # Step 3: Stage boot configuration (initramfs is built by pacstrap)
+            compression = (
+                self.state.initramfs_compression
+                or FS_PROFILES[fs_profile]["initramfs_compression"]
+            )
+            stage_boot_config(compression, self.state.initramfs_fallback)
+
+            # Step 4: Pacman keys (started above) and mirrors
+            self.step_changed.emit("Configuring package manager...", 17)
+            keys.result()
+        except BaseException:
+            # Stop key setup before the failure cleanup runs
+            keys_runner.abort("Key setup stopped: the installation failed")
+            raise
+        finally:
+            keys_executor.shutdown(wait=True, cancel_futures=True)
+            keys_runner.close()
+
+        if not self.state.mirrors_ranked.is_set():
+            self.step_changed.emit("Ranking mirrors...", 19)
+            if self.state.mirrors_lock.locked():
+                self.log_line.emit("Mirrors: waiting for the ranking started by the prefetch")
+            rank_mirrors_once(self.state, self.log_line.emit)
+        self.step_changed.emit("Package manager ready.", 20)
 
-        # Step 1: Partition disk
-        self.step_changed.emit("Preparing disk...", 2)
-        self.state.partitions = partition_disk(runner, device)
-        self.step_changed.emit("Disk partitioned.", 10)
+        # Step 5: Download packages into the target's cache, verified
+        self.step_changed.emit("Downloading packages (this may take a while)...", 22)
+        packages = select_packages(
+            INSTALLER_DATA_DIR,
+            self.state.selected_profiles,
+            self.state.audit_result,
+        )
+        arch_level = self.state.audit_result.get("cpu", {}).get("arch_level", "")
+        pacman_conf = installer_pacman_conf(arch_level)
+        repo = optimized_repo(arch_level)
+        self.log_line.emit(
+            f"CPU level {arch_level or 'unknown'}: "
+            + (f"[{repo[0]}] optimized packages" if repo else "generic packages")
+        )
+        # The prefetch cache is read-only from here on
+        extra_caches = [PREFETCH_CACHE_DIR] if Path(PREFETCH_CACHE_DIR).is_dir() else []
 
-        # Step 2: Mount filesystems
-        self.step_changed.emit("Mounting filesystems...", 12)
-        mount_filesystems(runner, self.state.partitions)
-        self.step_changed.emit("Filesystems mounted.", 15)
+        def on_download(done: int, total: int) -> None:
+            self.step_changed.emit(
+                f"Downloading packages ({done / 1024 ** 2:.0f} of {total / 1024 ** 2:.0f} MiB)...",
+                22 + 28 * done // max(total, 1),
+            )
 
-        # Step 3: Setup pacman keys
-        self.step_changed.emit("Configuring package manager...", 17)
-        setup_pacman(runner)
-        self.step_changed.emit("Package manager ready.", 20)
+        closure = download_packages(
+            runner, packages, pacman_conf, SYNC_DBPATH, TARGET_CACHE_DIR,
+            extra_caches, on_download,
+        )
+        self.step_changed.emit("Packages downloaded.", 50)
 
-        # Step 4: Pacstrap (longest step)
-        self.step_changed.emit("Installing packages (this may take a while)...", 22)
-        packages_file = f"{INSTALLER_DATA_DIR}/packages.x86_64"
-        packages = read_package_list(packages_file)
-        run_pacstrap(runner, packages)
+        # Step 6: Pacstrap, installing from the local caches
+        self.log_line.emit(
+            f"Installing {len(packages)} packages"
+            + (f" ({closure.count} with dependencies)" if closure else "")
+        )
+        if closure is None:
+            # No download stage: pacstrap downloads, counted against the estimate
+            estimated = self.state.package_estimate.get("count", 0)
+            progress = PacstrapProgress(self.step_changed.emit, estimated, 22, 50, 70)
+        else:
+            progress = PacstrapProgress(self.step_changed.emit, 0, 50, 50, 70)
+        run_pacstrap(
+            runner, packages, pacman_conf, on_line=progress,
+            cache_dirs=[TARGET_CACHE_DIR] + extra_caches,
+        )
         self.step_changed.emit("Packages installed.", 70)
 
-        # Step 5: Generate fstab
+        # Step 7: Generate fstab
         self.step_changed.emit("Generating filesystem table...", 71)
         generate_fstab(runner)
         self.step_changed.emit("Filesystem table generated.", 72)
 
-        # Step 6: Configure system
+        # Step 8: Configure system
         self.step_changed.emit("Configuring system...", 74)
-        configure_system(runner)
+        mem_total_kib = self.state.audit_result.get("memory", {}).get("total_kib", 0)
+        configure_system(
+            runner,
+            fs_profile,
+            mem_total_kib or read_meminfo()["total_kib"],
+            pacman_conf,
+            self.state.selected_profiles,
+            self.state.audit_result,
+        )
         self.step_changed.emit("System configured.", 85)
 
-        # Step 7: Install bootloader
+        # Step 9: Install bootloader
         self.step_changed.emit("Installing boot manager...", 87)
         install_bootloader(
             runner,
             self.state.selected_profiles,
             self.state.default_profile,
+            self.state.initramfs_fallback,
         )
         self.step_changed.emit("Boot manager installed.", 92)
 
-        # Step 8: Cleanup
+        # Step 10: Cleanup
         self.step_changed.emit("Finalizing...", 95)
+        finish_package_cache(
+            runner,
+            self.state.keep_package_cache,
+            {pkg.filename for pkg in closure.packages} if closure else None,
+            extra_caches,
+        )
         final_cleanup(runner)
         self.step_changed.emit("Installation complete!", 100)
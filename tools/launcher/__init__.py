@@ -0,0 +1,5 @@
+"""AmiCachy emulator launch helpers — run from amilaunch.sh as python3 -m launcher.<tool>
+
+Standard library only, and nothing is imported here, so each tool
+starts quickly on the boot path.
+"""
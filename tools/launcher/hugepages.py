@@ -0,0 +1,263 @@
+"""Transparent huge pages for the emulated RAM, and a check that it worked.
+
+Amiberry allocates chip, fast and Zorro III RAM (and the PPC bridge its
+guest memory) as plain anonymous memory: no MAP_HUGETLB, no hugetlbfs
+mount and no madvise(MADV_HUGEPAGE).  A reserved hugetlbfs pool would
+therefore never be used, so guest RAM is backed by transparent huge
+pages (THP) instead:
+
+- At install time, configure_system writes a tmpfiles.d entry from
+  ``thp_tmpfiles()``: THP for all anonymous memory when RAM allows it,
+  defrag without direct compaction, and khugepaged scanning sized so the
+  largest guest RAM of the selected profiles is collapsed in seconds.
+  Without a guest of at least SMALL_GUEST_MIB the default policy stays.
+- At launch, launcher.tuning applies ``session_settings()`` for the
+  running profile (and compacts memory first when THP is on for all
+  memory) and restores it afterwards.  Guests below SMALL_GUEST_MIB
+  (classic_68k's 10 MiB) keep the installed policy: a few huge pages
+  don't pay for a global switch and a compaction.
+- amilaunch.sh runs ``verify`` next to the emulator, which reports how
+  much of each large anonymous mapping is actually huge-page backed.
+
+    python3 -m launcher.hugepages verify [--pid PID] [--output FILE] [--profile P]
+        Wait for the emulator below PID (default: the parent) and append a
+        report to FILE at each of CHECK_AFTER_S seconds, until it exits.
+
+Guest RAM sizes come from the profile's UAE config.  The memory lock
+granted in limits.d (memlock unlimited) is reported too: locked pages
+can't be swapped out or migrated during compaction.
+"""
+
+import os
+import re
+import sys
+import time
+
+from .proc import EMULATOR_COMMS, comm, process_tree
+from .uae import UAE_DIR, profile_config
+
+OUTPUT_PATH = "/tmp/amicachy-hugepages.log"
+
+THP_DIR = "/sys/kernel/mm/transparent_hugepage"
+
+# UAE memory keys -> KiB per unit
+UAE_MEMORY_KEYS = {
+    "chipmem_size": 512,
+    "bogomem_size": 256,
+    "fastmem_size": 1024,
+    "z3mem_size": 1024,
+    "z3mem2_size": 1024,
+    "megachipmem_size": 1024,
+    "mbresmem_low_size": 1024,
+    "mbresmem_high_size": 1024,
+    "gfxcard_size": 1024,
+}
+# Guest memory of the PPC bridge when the config doesn't set it
+PPC_DEFAULT_MIB = 256
+
+# Below this much RAM, THP stays opt-in (madvise), during emulator
+# sessions too: "always" can bloat small machines' memory use
+THP_ALWAYS_MIN_MIB = 2048
+# Guest RAM below this gets no system-wide THP policy, at install time
+# nor at launch
+SMALL_GUEST_MIB = 64
+# khugepaged should collapse the whole guest RAM within this time
+COLLAPSE_SECONDS = 10
+SCAN_SLEEP_MS = 1000
+
+# Seconds after the emulator starts at which a report is written
+CHECK_AFTER_S = (2, 10, 30, 60)
+POLL_INTERVAL_S = 0.25
+# Anonymous mappings smaller than this are left out of the report
+REPORT_MIN_KIB = 4 * 1024
+
+_MAPPING = re.compile(r"^[0-9a-f]+-[0-9a-f]+ ")
+
+
+def guest_ram_mib(settings: dict[str, str]) -> int:
+    """Guest RAM configured by UAE config settings, in MiB."""
+    kib = sum(
+        int(settings[key]) * unit for key, unit in UAE_MEMORY_KEYS.items()
+        if settings.get(key, "").isdigit()
+    )
+    mib = -(-kib // 1024)
+    ppc = "ppc_model" in settings or "ppc_implementation" in settings
+    if ppc and not any(key in settings for key in ("z3mem_size", "mbresmem_high_size")):
+        mib += PPC_DEFAULT_MIB
+    return mib
+
+
+def profile_ram_mib(profile: str, uae_dir: str = UAE_DIR) -> int:
+    return guest_ram_mib(profile_config(profile, uae_dir))
+
+
+def read_mem_total_kib(meminfo: str = "/proc/meminfo") -> int:
+    """MemTotal in KiB, or 0 if it can't be read."""
+    try:
+        with open(meminfo) as f:
+            return next((int(line.split()[1]) for line in f
+                         if line.startswith("MemTotal:")), 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def thp_mode(mem_total_kib: int) -> str:
+    """THP "enabled" mode for a machine with ``mem_total_kib`` of RAM."""
+    return "always" if mem_total_kib // 1024 >= THP_ALWAYS_MIN_MIB else "madvise"
+
+
+def khugepaged_settings(guest_mib: int) -> dict[str, str]:
+    """khugepaged scan rate that covers ``guest_mib`` in COLLAPSE_SECONDS."""
+    scans = COLLAPSE_SECONDS * 1000 // SCAN_SLEEP_MS
+    # pages_to_scan counts base pages; the kernel default is 4096 (16 MiB)
+    pages = max(4096, guest_mib * 256 // scans)
+    return {
+        "khugepaged/scan_sleep_millisecs": str(SCAN_SLEEP_MS),
+        "khugepaged/alloc_sleep_millisecs": str(SCAN_SLEEP_MS * 10),
+        "khugepaged/pages_to_scan": str(pages),
+    }
+
+
+def session_settings(guest_mib: int, mem_total_kib: int) -> dict[str, str]:
+    """THP settings (relative to THP_DIR) while an emulator runs.
+
+    Empty for guests below SMALL_GUEST_MIB, which keep the installed policy.
+    """
+    if guest_mib < SMALL_GUEST_MIB:
+        return {}
+    return {
+        "enabled": thp_mode(mem_total_kib),
+        # Faults never stall on compaction; khugepaged collapses later
+        "defrag": "defer+madvise",
+        **khugepaged_settings(guest_mib),
+    }
+
+
+def thp_tmpfiles(mem_total_kib: int, guest_mib: int) -> str:
+    """Return a tmpfiles.d drop-in with the installed system's THP policy."""
+    settings = {
+        "enabled": thp_mode(mem_total_kib),
+        "defrag": "defer+madvise",
+        **khugepaged_settings(guest_mib),
+    }
+    lines = [
+        f"# Generated by the AmiCachy installer: {mem_total_kib // 1024} MiB RAM, "
+        f"{guest_mib} MiB guest RAM",
+        "# Transparent huge pages for the emulated RAM (launcher/hugepages.py)",
+    ]
+    lines += [f"w {THP_DIR}/{name} - - - - {value}" for name, value in settings.items()]
+    return "\n".join(lines) + "\n"
+
+
+def _active(path: str) -> str:
+    """The bracketed choice of a THP sysfs setting ("[madvise]" -> "madvise")."""
+    try:
+        with open(path) as f:
+            text = f.read()
+    except OSError:
+        return "unavailable"
+    match = re.search(r"\[(\S+)\]", text)
+    return match.group(1) if match else text.strip()
+
+
+def smaps(pid: int) -> list[dict]:
+    """Anonymous mappings of ``pid`` with their sizes in KiB and flags."""
+    mappings: list[dict] = []
+    current: dict | None = None
+    with open(f"/proc/{pid}/smaps") as f:
+        for line in f:
+            if _MAPPING.match(line):
+                fields = line.split()
+                current = {"range": fields[0], "name": fields[5] if len(fields) > 5 else ""}
+                mappings.append(current)
+            elif current is not None:
+                key, _, value = line.partition(":")
+                if key == "VmFlags":
+                    current["flags"] = value.split()
+                elif value.strip().endswith("kB"):
+                    current[key] = int(value.split()[0])
+    # MAP_HUGETLB memory shows up as "/anon_hugepage (deleted)"
+    return [m for m in mappings if m["name"] in ("", "[heap]")
+            or m["name"].startswith(("[anon", "/anon_hugepage"))]
+
+
+def report(pid: int, elapsed: float, guest_mib: int) -> list[str]:
+    """Report lines for the large anonymous mappings of ``pid``."""
+    large = [m for m in smaps(pid) if m.get("Size", 0) >= REPORT_MIN_KIB]
+    large.sort(key=lambda m: m.get("Rss", 0), reverse=True)
+    with open(f"/proc/{pid}/status") as f:
+        locked = next((line.split()[1] for line in f if line.startswith("VmLck:")), "0")
+    lines = [
+        f"# {comm(pid)} (pid {pid}), {elapsed:.0f} s after start",
+        f"# THP enabled={_active(f'{THP_DIR}/enabled')} "
+        f"defrag={_active(f'{THP_DIR}/defrag')}, guest RAM {guest_mib} MiB, "
+        f"VmLck {int(locked) // 1024} MiB",
+        f"{'size MiB':>9} {'rss MiB':>8} {'thp MiB':>8} {'hugetlb':>8} {'locked':>7} "
+        f"{'huge %':>6}  flags  mapping",
+    ]
+    rss = huge = 0
+    for m in large:
+        m_huge = m.get("AnonHugePages", 0) + m.get("Private_Hugetlb", 0) + m.get("Shared_Hugetlb", 0)
+        m_rss = m.get("Rss", 0) + m.get("Private_Hugetlb", 0) + m.get("Shared_Hugetlb", 0)
+        rss += m_rss
+        huge += m_huge
+        flags = ",".join(f for f in m.get("flags", []) if f in ("hg", "nh", "lo"))
+        lines.append(
+            f"{m['Size'] / 1024:>9.1f} {m_rss / 1024:>8.1f} {m.get('AnonHugePages', 0) / 1024:>8.1f} "
+            f"{(m_huge - m.get('AnonHugePages', 0)) / 1024:>8.1f} {m.get('Locked', 0) / 1024:>7.1f} "
+            f"{m_huge * 100 // m_rss if m_rss else 0:>5}%  {flags or '-':<5}  "
+            f"{m['range']} {m['name']}".rstrip()
+        )
+    lines.append(
+        f"# {huge / 1024:.1f} of {rss / 1024:.1f} MiB resident in huge pages "
+        f"({huge * 100 // rss if rss else 0}%)"
+    )
+    return lines
+
+
+def verify(root_pid: int, output: str, guest_mib: int) -> None:
+    """Append reports on the emulator below ``root_pid`` to ``output``."""
+    with open(output, "w") as f:
+        f.write(f"# AmiCachy huge page check, reports at {CHECK_AFTER_S} s\n")
+    started: dict[int, float] = {}
+    pending: dict[int, list[int]] = {}
+    while os.path.exists(f"/proc/{root_pid}"):
+        for pid in process_tree(root_pid):
+            if pid not in started and comm(pid) in EMULATOR_COMMS:
+                started[pid] = time.monotonic()
+                pending[pid] = list(CHECK_AFTER_S)
+        for pid, checks in pending.items():
+            elapsed = time.monotonic() - started[pid]
+            if not checks or elapsed < checks[0]:
+                continue
+            checks.pop(0)
+            try:
+                lines = report(pid, elapsed, guest_mib)
+            except (OSError, ValueError):
+                checks.clear()
+                continue
+            with open(output, "a") as f:
+                f.write("\n".join(["", *lines]) + "\n")
+        if started and not any(pending.values()):
+            return
+        if started and not any(os.path.exists(f"/proc/{pid}") for pid in started):
+            return
+        time.sleep(POLL_INTERVAL_S)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    options = {"--pid": str(os.getppid()), "--output": OUTPUT_PATH, "--profile": ""}
+    for name in options:
+        if name in argv and argv.index(name) + 1 < len(argv):
+            options[name] = argv[argv.index(name) + 1]
+    if argv[:1] != ["verify"] or not options["--pid"].isdigit():
+        print("usage: python3 -m launcher.hugepages verify [--pid PID] [--output FILE] "
+              "[--profile PROFILE]", file=sys.stderr)
+        return 2
+    verify(int(options["--pid"]), options["--output"], profile_ram_mib(options["--profile"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
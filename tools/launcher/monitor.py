@@ -0,0 +1,254 @@
+"""Emulator performance monitor and stall detector.
+
+run_amiberry starts this next to the emulator.  At a fixed interval it
+samples, for every thread of the emulator processes, CPU time and
+run-queue delay (/proc/<pid>/task/<tid>/schedstat), involuntary context
+switches (status), CPU changes and major faults (stat), plus the clock
+of the CPU the main thread last ran on.  Samples go to a ring buffer
+covering the last couple of minutes.  Intervals where something held the
+emulator back are flagged as stalls:
+
+    runq       a thread waited more than STALL_RUNQ_MS for a CPU
+    majfault   a thread blocked on a page read from disk
+    throttle   the main thread's CPU ran below THROTTLE_RATIO of its maximum
+    late       the monitor itself woke STALL_LATE_MS late (the whole
+               system stalled)
+
+The timeline is written to the output file when the emulator exits
+(normally or by crashing), on SIGTERM (amilaunch.sh, when cage exits) and
+on SIGUSR1 (a snapshot, the monitor keeps running).
+
+    python3 -m launcher.monitor [--pid PID] [--output FILE] [--interval-ms MS]
+
+The per-thread /proc files are kept open and re-read with pread, so a
+sample costs a few system calls per thread.  CPU changes between two
+samples are a lower bound of migrations: schedstat does not count them
+and /proc/<pid>/sched depends on CONFIG_SCHED_DEBUG.
+"""
+
+import os
+import signal
+import sys
+import time
+from collections import deque
+
+from .proc import EMULATOR_COMMS, comm, process_tree, threads
+
+OUTPUT_PATH = "/tmp/amiberry-monitor.log"
+INTERVAL_S = 0.2
+RING_SECONDS = 120
+
+STALL_RUNQ_MS = 20
+STALL_LATE_MS = 100
+THROTTLE_RATIO = 0.6
+
+_CPUFREQ = "/sys/devices/system/cpu/cpu{}/cpufreq/{}"
+
+
+def _pread(fd: int) -> str:
+    return os.pread(fd, 4096, 0).decode(errors="replace")
+
+
+class _Thread:
+    """Open /proc files and the last counters of one thread."""
+
+    __slots__ = ("pid", "tid", "name", "fds", "last", "totals")
+
+    def __init__(self, pid: int, tid: int):
+        self.pid = pid
+        self.tid = tid
+        self.name = comm(pid, tid)
+        base = f"/proc/{pid}/task/{tid}"
+        self.fds = [os.open(f"{base}/{name}", os.O_RDONLY)
+                    for name in ("schedstat", "stat", "status")]
+        self.last: tuple[int, ...] | None = None
+        # cpu_ns, runq_ns, involuntary, cpu changes, major faults
+        self.totals = [0, 0, 0, 0, 0]
+
+    def read(self) -> tuple[int, int, int, int, int]:
+        """(cpu_ns, runq_ns, involuntary switches, last CPU, major faults)."""
+        schedstat, stat, status = (_pread(fd) for fd in self.fds)
+        if not stat:
+            raise ProcessLookupError(self.tid)
+        cpu_ns, runq_ns = (int(v) for v in schedstat.split()[:2])
+        # Threads often name themselves after they start
+        self.name = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        involuntary = 0
+        for line in status.splitlines():
+            if line.startswith("nonvoluntary_ctxt_switches:"):
+                involuntary = int(line.split()[1])
+        return cpu_ns, runq_ns, involuntary, int(fields[36]), int(fields[9])
+
+    def close(self) -> None:
+        for fd in self.fds:
+            os.close(fd)
+
+
+class Monitor:
+    """Samples the emulator threads below ``root_pid`` into a ring buffer."""
+
+    def __init__(self, root_pid: int, output: str = OUTPUT_PATH, interval: float = INTERVAL_S):
+        self.root_pid = root_pid
+        self.output = output
+        self.interval = interval
+        self.threads: dict[int, _Thread] = {}
+        # Threads that have exited, for the totals
+        self.finished: dict[int, _Thread] = {}
+        # (t, late_ms, freq_khz, flags, [(tid, cpu_ns, runq_ns, invol, moves, majflt)])
+        self.samples: deque = deque(maxlen=max(1, int(RING_SECONDS / interval)))
+        self.stalls = 0
+        self.started = time.monotonic()
+        self.seen_emulator = False
+        self._max_khz: dict[int, int] = {}
+        self._freq_fds: dict[int, int] = {}
+
+    def _discover(self) -> None:
+        for pid in process_tree(self.root_pid):
+            if comm(pid) not in EMULATOR_COMMS:
+                continue
+            self.seen_emulator = True
+            for tid in threads(pid):
+                if tid not in self.threads:
+                    try:
+                        self.threads[tid] = _Thread(pid, tid)
+                    except OSError:
+                        pass
+
+    def _freq(self, cpu: int) -> tuple[int, int]:
+        """(current, maximum) kHz of ``cpu``, or (0, 0) without cpufreq."""
+        if cpu not in self._freq_fds:
+            try:
+                self._freq_fds[cpu] = os.open(_CPUFREQ.format(cpu, "scaling_cur_freq"), os.O_RDONLY)
+                with open(_CPUFREQ.format(cpu, "cpuinfo_max_freq")) as f:
+                    self._max_khz[cpu] = int(f.read())
+            except (OSError, ValueError):
+                self._freq_fds[cpu] = -1
+        fd = self._freq_fds[cpu]
+        if fd < 0:
+            return 0, 0
+        try:
+            return int(_pread(fd)), self._max_khz[cpu]
+        except (OSError, ValueError):
+            return 0, 0
+
+    def sample(self, late_ms: float) -> None:
+        self._discover()
+        deltas = []
+        flags: set[str] = set()
+        main_cpu = None
+        for tid, thread in list(self.threads.items()):
+            try:
+                current = thread.read()
+            except (OSError, ValueError, IndexError):
+                thread.close()
+                self.finished[tid] = self.threads.pop(tid)
+                continue
+            if tid == thread.pid:
+                main_cpu = current[3]
+            if thread.last is None:
+                thread.last = current
+                continue
+            last = thread.last
+            delta = (current[0] - last[0], current[1] - last[1], current[2] - last[2],
+                     int(current[3] != last[3]), current[4] - last[4])
+            thread.last = current
+            for i, value in enumerate(delta):
+                thread.totals[i] += value
+            if delta[1] > STALL_RUNQ_MS * 1_000_000:
+                flags.add("runq")
+            if delta[4]:
+                flags.add("majfault")
+            deltas.append((tid, *delta))
+        khz = 0
+        if main_cpu is not None:
+            khz, max_khz = self._freq(main_cpu)
+            if max_khz and khz < THROTTLE_RATIO * max_khz:
+                flags.add("throttle")
+        if late_ms > STALL_LATE_MS:
+            flags.add("late")
+        if flags:
+            self.stalls += 1
+        self.samples.append((time.monotonic() - self.started, late_ms, khz, flags, deltas))
+
+    def dump(self, reason: str) -> None:
+        """Write the timeline and per-thread totals to the output file."""
+        everyone = {**self.finished, **self.threads}
+        names = {tid: t.name for tid, t in everyone.items()}
+        lines = [
+            f"# AmiCachy emulator monitor: {reason}",
+            f"# interval {self.interval * 1000:.0f} ms, {len(self.samples)} samples kept, "
+            f"{self.stalls} stall intervals in {time.monotonic() - self.started:.1f} s",
+            "",
+            "# Threads (totals; * = exited)",
+            f"{'tid':>7}  {'name':<16}{'cpu s':>8}  {'runq ms':>8}  {'invol':>6}  {'moves':>6}  {'majflt':>6}",
+        ]
+        for tid, thread in sorted(everyone.items()):
+            cpu, runq, invol, moves, majflt = thread.totals
+            name = f"{thread.name}{'*' if tid not in self.threads else ''}"
+            lines.append(f"{tid:>7}  {name:<16}{cpu / 1e9:>8.2f}  {runq / 1e6:>8.1f}  "
+                         f"{invol:>6}  {moves:>6}  {majflt:>6}")
+        lines += ["", "# Timeline: time, emulator CPU %, worst run-queue wait, "
+                      "major faults, main CPU clock, flags"]
+        for t, late_ms, khz, flags, deltas in self.samples:
+            interval_ns = (self.interval * 1000 + late_ms) * 1_000_000
+            cpu = sum(d[1] for d in deltas) / interval_ns * 100
+            worst = max(deltas, key=lambda d: d[2], default=None)
+            runq = f"{worst[2] / 1e6:6.1f} ms {names.get(worst[0], worst[0])}" if worst else "-"
+            majflt = sum(d[5] for d in deltas)
+            line = (f"{t:8.2f}s  {cpu:5.0f}%  runq {runq:<26} majflt {majflt:<4} "
+                    f"{khz // 1000:>5} MHz  {','.join(sorted(flags))}")
+            lines.append(line.rstrip())
+        tmp = f"{self.output}.tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.output)
+
+    def run(self) -> None:
+        stop: list[str] = []
+        snapshot: list[bool] = []
+        signal.signal(signal.SIGTERM, lambda *_: stop.append("stopped by launcher"))
+        # Dumped from the loop, not the handler, which may interrupt a sample
+        signal.signal(signal.SIGUSR1, lambda *_: snapshot.append(True))
+        deadline = time.monotonic()
+        while not stop:
+            deadline += self.interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            # Measured after the sleep: oversleeping is the lateness to catch
+            now = time.monotonic()
+            late_ms = max(0.0, (now - deadline) * 1000)
+            # Small lateness is made up on the next ticks; only a gap of
+            # more than one interval restarts the schedule
+            if now - deadline > self.interval:
+                deadline = now
+            self.sample(late_ms)
+            if snapshot:
+                snapshot.clear()
+                self.dump("snapshot (SIGUSR1)")
+            if self.seen_emulator and not self.threads:
+                stop.append("emulator exited")
+            elif not os.path.exists(f"/proc/{self.root_pid}"):
+                stop.append("launcher exited")
+        self.dump(stop[0])
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    options = {"--pid": str(os.getppid()), "--output": OUTPUT_PATH,
+               "--interval-ms": str(int(INTERVAL_S * 1000))}
+    for name in options:
+        if name in argv and argv.index(name) + 1 < len(argv):
+            options[name] = argv[argv.index(name) + 1]
+    if not (options["--pid"].isdigit() and options["--interval-ms"].isdigit()):
+        print("usage: python3 -m launcher.monitor [--pid PID] [--output FILE] "
+              "[--interval-ms MS]", file=sys.stderr)
+        return 2
+    Monitor(int(options["--pid"]), options["--output"],
+            int(options["--interval-ms"]) / 1000).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Small /proc helpers shared by the launch tools."""
+
+import os
+
+# Emulator processes started by amilaunch.sh (Amiberry and, for PPC, the
+# QEMU bridge)
+EMULATOR_COMMS = ("amiberry", "qemu-system-ppc")
+
+
+def _children(pid: int) -> list[int]:
+    pids = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                pids += [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        pass
+    return pids
+
+
+def process_tree(pid: int) -> list[int]:
+    """Return ``pid`` and all of its live descendants, except this process."""
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        if current not in tree and current != os.getpid():
+            tree.append(current)
+            pending += _children(current)
+    return tree
+
+
+def threads(pid: int) -> list[int]:
+    """Return the thread ids of ``pid`` (empty once it has exited)."""
+    try:
+        return [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except (OSError, ValueError):
+        return []
+
+
+def comm(pid: int, tid: int | None = None) -> str:
+    """Return the name of a process, or of one of its threads."""
+    path = f"/proc/{pid}/comm" if tid is None else f"/proc/{pid}/task/{tid}/comm"
+    try:
+        with open(path) as f:
+            return f.read().rstrip("\n")
+    except OSError:
+        return ""
@@ -0,0 +1,313 @@
+"""Boot-time readahead of the files Amiberry reads when it starts.
+
+After autologin Amiberry reads the Kickstart ROMs, its UAE config, the
+boot blocks of its hardfiles and its own data and libraries from disk,
+one at a time and only when it needs them.  This module records which
+files and byte ranges a profile's emulator touched in its first seconds
+and replays that list early in the next boot, so the data is already in
+the page cache when amilaunch.sh starts Amiberry.
+
+    python3 -m launcher.readahead record PROFILE --pid PID [--seconds S]
+        Run by amilaunch.sh in the background next to the emulator:
+        samples the memory maps, open files and file positions of PID and
+        its descendants through /proc and saves the ranges for PROFILE.
+
+    python3 -m launcher.readahead replay [PROFILE]
+        Run by amicachy-readahead.service as amiga, started with Plymouth:
+        issues posix_fadvise(WILLNEED) for the recorded ranges of PROFILE
+        (by default the boot's amiprofile=) from several threads at once,
+        up to MAX_BYTES.
+
+/proc sampling needs no privileges, unlike fanotify, but only sees what
+is open or mapped at a sample; files opened and closed between two
+samples are missed.  Each recording is therefore merged with the
+previous one, and entries whose file has changed since are dropped.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .proc import process_tree
+
+STATE_DIR = "/var/lib/amicachy/readahead"
+LIST_HEADER = "# amicachy readahead v1"
+
+RECORD_SECONDS = 10.0
+RECORD_INTERVAL_S = 0.05
+REPLAY_WORKERS = 8
+
+# Files up to this size are read ahead whole; larger ones (hardfiles,
+# guest RAM images) only around the positions seen, plus their start,
+# which holds the RDB and boot blocks
+WHOLE_FILE_MAX = 4 * 1024 * 1024
+WINDOW = 256 * 1024
+# Upper bound of one profile's list, so a large mapping can't make the
+# replay evict more than it brings in.  Enforced on replay too: the list
+# is only as trustworthy as the amiga user who can write it
+MAX_BYTES = 512 * 1024 * 1024
+
+# Pseudo and RAM-backed filesystems: nothing to read ahead
+SKIP_PREFIXES = ("/dev/", "/proc/", "/sys/", "/run/", "/tmp/", "/memfd:")
+
+_PAGE = os.sysconf("SC_PAGE_SIZE")
+
+# path -> (size, mtime_ns, [(start, end), ...])
+Entries = dict[str, tuple[int, int, list[tuple[int, int]]]]
+
+
+def list_path(profile: str, state_dir: str = STATE_DIR) -> str:
+    return os.path.join(state_dir, f"{profile}.list")
+
+
+def merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Page-align, sort and coalesce (start, end) byte ranges."""
+    aligned = sorted(
+        (start // _PAGE * _PAGE, -(-end // _PAGE) * _PAGE)
+        for start, end in ranges if end > start
+    )
+    merged: list[tuple[int, int]] = []
+    for start, end in aligned:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def load_list(path: str) -> Entries:
+    """Read a recorded list; a missing or foreign file gives no entries."""
+    entries: Entries = {}
+    try:
+        with open(path) as f:
+            if f.readline().rstrip("\n") != LIST_HEADER:
+                return entries
+            for line in f:
+                fields = line.rstrip("\n").split("\t", 3)
+                if len(fields) != 4:
+                    continue
+                size, mtime_ns, spans, name = fields
+                ranges = []
+                for span in spans.split(","):
+                    start, _, end = span.partition("-")
+                    ranges.append((int(start), int(end)))
+                entries[name] = (int(size), int(mtime_ns), ranges)
+    except (OSError, ValueError):
+        pass
+    return entries
+
+
+def save_list(path: str, entries: Entries) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(f"{LIST_HEADER}\n")
+        # Insertion order is first-touch order; replay keeps it
+        for name, (size, mtime_ns, ranges) in entries.items():
+            spans = ",".join(f"{start}-{end}" for start, end in ranges)
+            f.write(f"{size}\t{mtime_ns}\t{spans}\t{name}\n")
+    os.replace(tmp, path)
+
+
+def _identity(path: str) -> tuple[int, int] | None:
+    """(size, mtime_ns) of a regular file, or None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if (st.st_mode & 0o170000) != 0o100000:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+# --- Recording ---
+
+def _sample_maps(pid: int, touched: dict[str, list[tuple[int, int]]]) -> None:
+    """File-backed mappings: the mapped part of each file."""
+    try:
+        with open(f"/proc/{pid}/maps") as f:
+            lines = f.readlines()
+    except OSError:
+        return
+    for line in lines:
+        fields = line.split(None, 5)
+        if len(fields) < 6 or not fields[5].startswith("/"):
+            continue
+        name = fields[5].rstrip("\n")
+        if name.endswith(" (deleted)"):
+            continue
+        low, _, high = fields[0].partition("-")
+        offset = int(fields[2], 16)
+        touched.setdefault(name, []).append((offset, offset + int(high, 16) - int(low, 16)))
+
+
+def _sample_fds(pid: int, touched: dict[str, list[tuple[int, int]]]) -> None:
+    """Open files: a window behind the current file position."""
+    try:
+        fds = os.listdir(f"/proc/{pid}/fd")
+    except OSError:
+        return
+    for fd in fds:
+        try:
+            name = os.readlink(f"/proc/{pid}/fd/{fd}")
+            with open(f"/proc/{pid}/fdinfo/{fd}") as f:
+                pos = int(f.readline().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if name.startswith("/") and not name.endswith(" (deleted)"):
+            touched.setdefault(name, []).append((max(pos - WINDOW, 0), pos + WINDOW))
+
+
+def record(
+    profile: str,
+    pid: int,
+    seconds: float = RECORD_SECONDS,
+    state_dir: str = STATE_DIR,
+) -> int:
+    """Sample ``pid``'s process tree for ``seconds``; save the list.
+
+    Returns the number of files in the saved list.
+    """
+    touched: dict[str, list[tuple[int, int]]] = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and os.path.exists(f"/proc/{pid}"):
+        for member in process_tree(pid):
+            _sample_maps(member, touched)
+            _sample_fds(member, touched)
+        time.sleep(RECORD_INTERVAL_S)
+
+    path = list_path(profile, state_dir)
+    previous = load_list(path)
+    entries: Entries = {}
+    total = 0
+    for name, ranges in touched.items():
+        if name.startswith(SKIP_PREFIXES):
+            continue
+        identity = _identity(name)
+        if identity is None:
+            continue
+        size, mtime_ns = identity
+        if size <= WHOLE_FILE_MAX:
+            ranges = [(0, size)]
+        else:
+            ranges = ranges + [(0, WINDOW)]
+            old = previous.get(name)
+            if old is not None and old[:2] == identity:
+                ranges += old[2]
+        ranges = merge_ranges([(start, min(end, size)) for start, end in ranges])
+        total += sum(end - start for start, end in ranges)
+        if total > MAX_BYTES:
+            break
+        entries[name] = (size, mtime_ns, ranges)
+    # Files only the previous recordings caught, if still unchanged
+    for name, (size, mtime_ns, ranges) in previous.items():
+        if name in entries or _identity(name) != (size, mtime_ns):
+            continue
+        total += sum(end - start for start, end in ranges)
+        if total > MAX_BYTES:
+            break
+        entries[name] = (size, mtime_ns, ranges)
+    if entries:
+        save_list(path, entries)
+    return len(entries)
+
+
+# --- Replay ---
+
+def _fadvise(name: str, size: int, mtime_ns: int, ranges: list[tuple[int, int]]) -> int:
+    """Read ahead one file's ranges; return the bytes requested."""
+    if _identity(name) != (size, mtime_ns):
+        return 0
+    try:
+        fd = os.open(name, os.O_RDONLY | os.O_NOATIME)
+    except PermissionError:
+        # O_NOATIME needs ownership of the file (or CAP_FOWNER)
+        try:
+            fd = os.open(name, os.O_RDONLY)
+        except OSError:
+            return 0
+    except OSError:
+        return 0
+    requested = 0
+    try:
+        for start, end in ranges:
+            os.posix_fadvise(fd, start, end - start, os.POSIX_FADV_WILLNEED)
+            requested += end - start
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+    return requested
+
+
+def replay(profile: str, state_dir: str = STATE_DIR, workers: int = REPLAY_WORKERS) -> tuple[int, int]:
+    """Read ahead ``profile``'s recorded ranges; return (files, bytes).
+
+    WILLNEED starts the reads and returns; spreading the files over
+    several threads keeps more requests in flight on SSDs and NVMe.
+    """
+    entries = load_list(list_path(profile, state_dir))
+    if not entries:
+        return 0, 0
+    jobs = []
+    total = 0
+    for name, (size, mtime_ns, ranges) in entries.items():
+        if not name.startswith("/") or name.startswith(SKIP_PREFIXES):
+            continue
+        ranges = merge_ranges([(max(start, 0), min(end, size)) for start, end in ranges])
+        total += sum(end - start for start, end in ranges)
+        if total > MAX_BYTES:
+            break
+        jobs.append((name, size, mtime_ns, ranges))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda job: _fadvise(*job), jobs))
+    return sum(1 for r in results if r), sum(results)
+
+
+def boot_profile() -> str:
+    try:
+        with open("/proc/cmdline") as f:
+            params = f.read().split()
+    except OSError:
+        return ""
+    for param in params:
+        if param.startswith("amiprofile="):
+            return param.partition("=")[2]
+    return ""
+
+
+def _option(argv: list[str], name: str, default: str) -> str:
+    if name in argv:
+        index = argv.index(name)
+        if index + 1 < len(argv):
+            return argv[index + 1]
+    return default
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else ""
+    positional = [arg for arg in argv[1:2] if not arg.startswith("--")]
+    profile = positional[0] if positional else boot_profile()
+    state_dir = _option(argv, "--state-dir", STATE_DIR)
+    if not profile or command not in ("record", "replay"):
+        print(
+            "usage: python3 -m launcher.readahead record PROFILE --pid PID [--seconds S]\n"
+            "       python3 -m launcher.readahead replay [PROFILE]",
+            file=sys.stderr,
+        )
+        return 2
+    if command == "record":
+        pid = int(_option(argv, "--pid", str(os.getppid())))
+        seconds = float(_option(argv, "--seconds", str(RECORD_SECONDS)))
+        files = record(profile, pid, seconds, state_dir)
+        print(f"readahead: recorded {files} files for {profile}")
+    else:
+        files, requested = replay(profile, state_dir)
+        print(f"readahead: {files} files, {requested // 1024} KiB for {profile}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Per-thread scheduling for the emulator, instead of chrt on everything.
+
+``chrt -f 52 amiberry`` makes every Amiberry thread SCHED_FIFO, including
+the GUI, loader and disk threads, which can then starve the compositor
+and the audio server.  This supervisor watches the emulator processes
+started by amilaunch.sh (Amiberry and, for PPC, the QEMU bridge), sorts
+their threads into classes by thread name, and gives each class the
+scheduling policy, priority and CPU placement of the profile's table.
+New threads are picked up as they appear, and threads that rename
+themselves after starting are classified again.
+
+    python3 -m launcher.rtsched PROFILE [--pid PID]
+        Supervise the emulator processes below PID (default: the parent)
+        until PID exits.
+
+Realtime classes get SCHED_RESET_ON_FORK, so threads they create start
+out as normal threads instead of inheriting realtime priority.  CPU
+placement uses the emulator CPUs reserved by launcher.tuning (from its
+state file); without one, affinity is left alone.  Runs as the amiga
+user: its RLIMIT_RTPRIO and RLIMIT_NICE (limits.d) allow the settings.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+from .proc import EMULATOR_COMMS, comm, process_tree, threads
+from .tuning import STATE_PATH, parse_cpu_list
+
+POLL_INTERVAL_S = 0.25
+
+# Thread classes by name (comm, at most 15 characters); the first match
+# wins.  "main" is Amiberry's initial thread, which runs the 68k core;
+# "iothread" is QEMU's, the main loop serving the vCPUs' device I/O.
+THREAD_CLASSES = [
+    ("vcpu", re.compile(r"^CPU \d+/(TCG|KVM)$|^ppc")),
+    ("audio", re.compile(r"^(SDLAudio|audio|sound)", re.IGNORECASE)),
+    ("render", re.compile(r"^(SDLRender|render|gallium|llvmpipe|vk|radeon|iris)", re.IGNORECASE)),
+    ("disk", re.compile(r"^(disk|hdf|filesys|blkdev|cdrom|floppy|uae_)", re.IGNORECASE)),
+]
+
+# class -> (policy, priority or nice value, placement).  Placement is
+# "emulator" (the reserved CPUs), "housekeeping" (all others) or None
+# (unchanged).  Classes not listed, and "other", become SCHED_OTHER.
+RT_PROFILES = {
+    "classic_68k": {
+        "main": ("other", -10, "emulator"),
+        "audio": ("fifo", 45, None),
+        "render": ("other", -5, None),
+        "disk": ("other", 0, "housekeeping"),
+        "other": ("other", 0, "housekeeping"),
+    },
+    "ppc_nitro": {
+        "main": ("fifo", 52, "emulator"),
+        "vcpu": ("fifo", 51, "emulator"),
+        # Never above the vCPUs it serves, nor on their CPUs
+        "iothread": ("other", -5, "housekeeping"),
+        "audio": ("fifo", 50, None),
+        "render": ("other", -5, None),
+        "disk": ("other", 0, "housekeeping"),
+        "other": ("other", 0, "housekeeping"),
+    },
+}
+
+_POLICIES = {"fifo": os.SCHED_FIFO, "rr": os.SCHED_RR, "other": os.SCHED_OTHER}
+
+
+def classify(process: str, pid: int, tid: int, name: str) -> str:
+    """Thread class of ``tid`` in ``pid``, whose process comm is ``process``."""
+    if tid == pid:
+        return "main" if process == "amiberry" else "iothread"
+    for cls, pattern in THREAD_CLASSES:
+        if pattern.search(name):
+            return cls
+    return "other"
+
+
+def reserved_cpus(state_path: str = STATE_PATH) -> tuple[set[int], set[int]]:
+    """(emulator, housekeeping) CPUs from launcher.tuning, or empty sets."""
+    try:
+        with open(state_path) as f:
+            emulator = set(parse_cpu_list(json.load(f).get("emulator_cpus", "")))
+    except (OSError, ValueError):
+        return set(), set()
+    online = set(os.sched_getaffinity(0))
+    emulator &= online
+    if not emulator or not online - emulator:
+        return set(), set()
+    return emulator, online - emulator
+
+
+class Supervisor:
+    """Applies a profile's thread table to the emulator below a root pid."""
+
+    def __init__(self, profile: str, root_pid: int, log=print):
+        if profile not in RT_PROFILES:
+            raise KeyError(f"no thread policy for profile {profile!r}")
+        self.table = RT_PROFILES[profile]
+        self.root_pid = root_pid
+        self.log = log
+        # tid -> name it was classified under
+        self.seen: dict[int, str] = {}
+        self.emulator_cpus: set[int] = set()
+        self.housekeeping_cpus: set[int] = set()
+        self._failed: set[str] = set()
+
+    def _apply(self, tid: int, cls: str, name: str) -> None:
+        policy, value, placement = self.table.get(cls, self.table["other"])
+        try:
+            if policy == "other":
+                os.sched_setscheduler(tid, os.SCHED_OTHER, os.sched_param(0))
+                os.setpriority(os.PRIO_PROCESS, tid, value)
+            else:
+                os.sched_setscheduler(
+                    tid, _POLICIES[policy] | os.SCHED_RESET_ON_FORK, os.sched_param(value)
+                )
+            cpus = {"emulator": self.emulator_cpus,
+                    "housekeeping": self.housekeeping_cpus}.get(placement)
+            if cpus:
+                os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            return
+        except OSError as e:
+            # Logged once per class: the limits are the same for every thread
+            if cls not in self._failed:
+                self._failed.add(cls)
+                self.log(f"rtsched: {cls} ({name}): {e.strerror}")
+            return
+        self.log(f"rtsched: {tid} {name!r} -> {cls}: {policy} {value}"
+                 + (f" on CPUs {sorted(cpus)}" if cpus else ""))
+
+    def scan(self) -> None:
+        """Classify new threads, and threads renamed since the last scan."""
+        alive: set[int] = set()
+        for pid in process_tree(self.root_pid):
+            process = comm(pid)
+            if process not in EMULATOR_COMMS:
+                continue
+            for tid in threads(pid):
+                alive.add(tid)
+                name = comm(pid, tid)
+                if not name or self.seen.get(tid) == name:
+                    continue
+                self.seen[tid] = name
+                self._apply(tid, classify(process, pid, tid, name), name)
+        # Thread ids get reused
+        self.seen = {tid: name for tid, name in self.seen.items() if tid in alive}
+
+    def run(self) -> None:
+        while os.path.exists(f"/proc/{self.root_pid}"):
+            # launcher.tuning starts alongside and may reserve CPUs later
+            cpus = reserved_cpus()
+            if cpus != (self.emulator_cpus, self.housekeeping_cpus):
+                self.emulator_cpus, self.housekeeping_cpus = cpus
+                self.seen.clear()
+            self.scan()
+            time.sleep(POLL_INTERVAL_S)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in RT_PROFILES:
+        print(
+            "usage: python3 -m launcher.rtsched PROFILE [--pid PID]\n"
+            f"profiles: {', '.join(RT_PROFILES)}",
+            file=sys.stderr,
+        )
+        return 2
+    root_pid = os.getppid()
+    if "--pid" in argv:
+        index = argv.index("--pid")
+        if index + 1 < len(argv) and argv[index + 1].isdigit():
+            root_pid = int(argv[index + 1])
+    Supervisor(argv[0], root_pid, log=lambda line: print(line, flush=True)).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
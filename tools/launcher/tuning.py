@@ -0,0 +1,323 @@
+"""Low-latency machine state while an emulation profile runs.
+
+amilaunch.sh starts this (as root, through the amicachy-tune wrapper and
+a narrow sudoers rule) before launching the emulator.  It applies the
+profile's policy, holds it while the launcher runs and restores every
+setting it changed afterwards:
+
+- CPU frequency governor and energy/performance preference (EPP) of
+  every CPU, through cpufreq sysfs.
+- A deep C-state limit, through a PM QoS request on /dev/cpu_dma_latency
+  that stays in force while the file is open.
+- IRQ affinity: interrupts are moved off the CPUs reserved for the
+  emulator (the last CPUs; CPU 0 keeps the housekeeping work).  The
+  reserved CPUs are recorded in the state file for the thread placement
+  that follows.
+- Transparent huge pages for the guest RAM (launcher.hugepages): THP for
+  all anonymous memory when RAM allows it, khugepaged sized to the
+  profile's guest RAM, and a memory compaction so 2 MiB pages are free
+  when the emulator starts.  Small guests keep the installed policy.
+
+    amicachy-tune apply PROFILE [--wait-pid PID]
+        Apply, then hold until PID exits or on SIGTERM/SIGINT; restore.
+    amicachy-tune restore
+        Restore from the state file left by an apply that was killed.
+
+The previous values are saved to STATE_PATH before anything is changed,
+so a crash can always be undone.  Every path goes through ``root``
+(default "/"), so the module can be exercised against a fake sysfs and
+procfs tree; the command line deliberately has no such option, as it
+runs as root on behalf of the amiga user.
+"""
+
+import json
+import os
+import select
+import signal
+import struct
+import sys
+from pathlib import Path
+
+from .hugepages import THP_DIR, profile_ram_mib, read_mem_total_kib, session_settings
+from .uae import UAE_DIR
+
+STATE_PATH = "/run/amicachy/tuning.json"
+
+# Per-profile policy.  None leaves a setting alone.
+#   governor         cpufreq scaling_governor
+#   epp              energy_performance_preference (intel_pstate, amd-pstate)
+#   dma_latency_us   PM QoS CPU latency limit; 0 keeps CPUs out of C-states
+#   emulator_cpus    CPUs kept free of IRQs for the emulator (0: none)
+#   thp              huge pages for the guest RAM (launcher.hugepages)
+TUNING_PROFILES = {
+    "classic_68k": {
+        "governor": "performance",
+        "epp": "performance",
+        "dma_latency_us": 50,
+        "emulator_cpus": 1,
+        "thp": True,
+    },
+    "ppc_nitro": {
+        # The PPC JIT and the 68k core both run flat out
+        "governor": "performance",
+        "epp": "performance",
+        "dma_latency_us": 0,
+        "emulator_cpus": 2,
+        "thp": True,
+    },
+}
+
+
+def parse_cpu_list(text: str) -> list[int]:
+    """Parse a kernel CPU list such as "0-3,8,10-11"."""
+    cpus: list[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        cpus += range(int(low), int(high or low) + 1)
+    return cpus
+
+
+def format_cpu_list(cpus: list[int]) -> str:
+    """Format CPUs as a compact kernel CPU list."""
+    ranges: list[list[int]] = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+class Tuner:
+    """Applies one profile's policy under ``root`` and undoes it."""
+
+    def __init__(self, profile: str, root: str = "/", state_path: str = STATE_PATH):
+        if profile not in TUNING_PROFILES:
+            raise KeyError(f"no tuning policy for profile {profile!r}")
+        self.profile = profile
+        self.policy = TUNING_PROFILES[profile]
+        self.root = Path(root)
+        self.state_path = self.root / state_path.lstrip("/")
+        # (path relative to root, previous value), in the order applied
+        self.changed: list[tuple[str, str]] = []
+        self.emulator_cpus: list[int] = []
+        self._qos_fd: int | None = None
+
+    def _path(self, path: str) -> Path:
+        return self.root / path.lstrip("/")
+
+    def _read(self, path: str) -> str | None:
+        try:
+            value = self._path(path).read_text().strip()
+        except OSError:
+            return None
+        # Choice files such as THP's "always [madvise] never"
+        if "[" in value:
+            value = value[value.index("[") + 1:value.index("]")]
+        return value
+
+    def _set(self, path: str, value: str) -> bool:
+        """Write ``value``, remembering the old one; False if not possible."""
+        old = self._read(path)
+        if old is None:
+            return False
+        if old == value:
+            return True
+        try:
+            self._path(path).write_text(f"{value}\n")
+        except OSError:
+            # Busy or unsupported (per-CPU IRQs, EPP under some drivers)
+            return False
+        self.changed.append((path, old))
+        self._save()
+        return True
+
+    def _save(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "profile": self.profile,
+            "emulator_cpus": format_cpu_list(self.emulator_cpus),
+            "changed": self.changed,
+        }, indent=2) + "\n")
+        os.replace(tmp, self.state_path)
+
+    def online_cpus(self) -> list[int]:
+        return parse_cpu_list(self._read("/sys/devices/system/cpu/online") or "0")
+
+    def apply(self) -> dict[str, str]:
+        """Apply the policy; return a summary of what was set."""
+        summary: dict[str, str] = {}
+        cpus = self.online_cpus()
+        reserved = self.policy["emulator_cpus"]
+        # Keep at least one CPU for interrupts and everything else
+        if reserved and len(cpus) > reserved:
+            self.emulator_cpus = cpus[-reserved:]
+        self._save()
+
+        # Governor before EPP: some drivers only accept an EPP that fits
+        # the governor in force
+        for key, name in (("governor", "scaling_governor"),
+                          ("epp", "energy_performance_preference")):
+            value = self.policy[key]
+            if value is None:
+                continue
+            done = [cpu for cpu in cpus
+                    if self._set(f"/sys/devices/system/cpu/cpu{cpu}/cpufreq/{name}", value)]
+            summary[key] = f"{value} on {len(done)}/{len(cpus)} CPUs"
+
+        if self.policy["dma_latency_us"] is not None:
+            summary["dma_latency"] = self._request_latency(self.policy["dma_latency_us"])
+
+        if self.emulator_cpus:
+            summary["irq_affinity"] = self._move_irqs(
+                [cpu for cpu in cpus if cpu not in self.emulator_cpus]
+            )
+            summary["emulator_cpus"] = format_cpu_list(self.emulator_cpus)
+
+        if self.policy["thp"]:
+            summary["thp"] = self._huge_pages()
+        return summary
+
+    def _huge_pages(self) -> str:
+        guest_mib = profile_ram_mib(self.profile, str(self._path(UAE_DIR)))
+        settings = session_settings(guest_mib, read_mem_total_kib(str(self._path("/proc/meminfo"))))
+        if not settings:
+            return f"installed policy kept for {guest_mib} MiB guest RAM"
+        done = [name for name, value in settings.items()
+                if self._set(f"{THP_DIR}/{name}", value)]
+        if not done:
+            return "unavailable"
+        compacted = ""
+        # One-shot, nothing to restore: gathers free 2 MiB blocks for the
+        # guest RAM before Amiberry faults it in.  Under madvise its plain
+        # anonymous memory gets no huge pages, so there is nothing to gather
+        if settings["enabled"] == "always":
+            try:
+                self._path("/proc/sys/vm/compact_memory").write_text("1\n")
+                compacted = ", memory compacted"
+            except OSError:
+                pass
+        return (f"{len(done)}/{len(settings)} settings for {guest_mib} MiB "
+                f"guest RAM{compacted}")
+
+    def _request_latency(self, microseconds: int) -> str:
+        try:
+            fd = os.open(self._path("/dev/cpu_dma_latency"), os.O_WRONLY)
+        except OSError as e:
+            return f"unavailable ({e.strerror})"
+        os.write(fd, struct.pack("i", microseconds))
+        # The request holds only while the file stays open
+        self._qos_fd = fd
+        return f"{microseconds} us"
+
+    def _move_irqs(self, housekeeping: list[int]) -> str:
+        cpu_list = format_cpu_list(housekeeping)
+        self._set("/proc/irq/default_smp_affinity", _cpu_mask(housekeeping))
+        try:
+            irqs = sorted(int(n) for n in os.listdir(self._path("/proc/irq")) if n.isdigit())
+        except OSError:
+            return "unavailable"
+        moved = [irq for irq in irqs
+                 if self._set(f"/proc/irq/{irq}/smp_affinity_list", cpu_list)]
+        return f"{len(moved)}/{len(irqs)} IRQs on CPUs {cpu_list}"
+
+    def restore(self) -> int:
+        """Undo every change, in the order applied; return how many failed."""
+        if self._qos_fd is not None:
+            os.close(self._qos_fd)
+            self._qos_fd = None
+        failed = 0
+        for path, old in self.changed:
+            try:
+                self._path(path).write_text(f"{old}\n")
+            except OSError:
+                failed += 1
+        self.changed = []
+        self.state_path.unlink(missing_ok=True)
+        return failed
+
+    @classmethod
+    def from_state(cls, root: str = "/", state_path: str = STATE_PATH) -> "Tuner | None":
+        """Rebuild the tuner of an interrupted apply from its state file."""
+        path = Path(root) / state_path.lstrip("/")
+        try:
+            state = json.loads(path.read_text())
+            tuner = cls(state["profile"], root, state_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        tuner.changed = [(p, old) for p, old in state.get("changed", [])]
+        return tuner
+
+
+def _cpu_mask(cpus: list[int]) -> str:
+    """Hex CPU mask in /proc/irq format (32-bit words, comma separated)."""
+    mask = sum(1 << cpu for cpu in cpus)
+    words = []
+    while True:
+        words.append(f"{mask & 0xFFFFFFFF:08x}")
+        mask >>= 32
+        if not mask:
+            break
+    return ",".join(reversed(words))
+
+
+def hold(wait_pid: int | None) -> None:
+    """Block until ``wait_pid`` exits, or until SIGTERM/SIGINT."""
+    stop_r, stop_w = os.pipe()
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, lambda *_: os.write(stop_w, b"x"))
+    watched = [stop_r]
+    if wait_pid is not None:
+        try:
+            watched.append(os.pidfd_open(wait_pid))
+        except OSError:
+            return
+    while True:
+        try:
+            select.select(watched, [], [])
+            return
+        except InterruptedError:
+            continue
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["restore"]:
+        tuner = Tuner.from_state()
+        if tuner is None:
+            return 0
+        return 1 if tuner.restore() else 0
+    if len(argv) < 2 or argv[0] != "apply" or argv[1] not in TUNING_PROFILES:
+        print(
+            "usage: amicachy-tune apply PROFILE [--wait-pid PID]\n"
+            "       amicachy-tune restore\n"
+            f"profiles: {', '.join(TUNING_PROFILES)}",
+            file=sys.stderr,
+        )
+        return 2
+    wait_pid = None
+    if "--wait-pid" in argv:
+        index = argv.index("--wait-pid")
+        if index + 1 < len(argv) and argv[index + 1].isdigit():
+            wait_pid = int(argv[index + 1])
+
+    # A previous apply that never got to restore
+    stale = Tuner.from_state()
+    if stale is not None:
+        stale.restore()
+    tuner = Tuner(argv[1])
+    try:
+        for key, value in tuner.apply().items():
+            print(f"tuning: {key}: {value}", flush=True)
+        hold(wait_pid)
+    finally:
+        failed = tuner.restore()
+        print(f"tuning: restored{f' ({failed} settings failed)' if failed else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""The emulation profiles' UAE configs, as read by the launch tools."""
+
+import os
+
+UAE_DIR = "/usr/share/amicachy/uae"
+PROFILE_CONFIGS = {
+    "classic_68k": "a1200.uae",
+    "ppc_nitro": "os41.uae",
+}
+
+
+def read_config(path: str) -> dict[str, str]:
+    """Return the key=value settings of a UAE config ({} if unreadable)."""
+    settings: dict[str, str] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith(";"):
+                    continue
+                key, sep, value = line.partition("=")
+                if sep:
+                    settings[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return settings
+
+
+def profile_config(profile: str, uae_dir: str = UAE_DIR) -> dict[str, str]:
+    """Settings of a profile's UAE config ({} for profiles without one)."""
+    if profile not in PROFILE_CONFIGS:
+        return {}
+    return read_config(os.path.join(uae_dir, PROFILE_CONFIGS[profile]))
@@ -7,7 +7,9 @@
 #
 # The user can override DOCKER_IMAGE via environment variable.
 # If the CPU lacks AVX2 (x86-64-v3), a warning is printed and the
-# generic CachyOS image/repos are used automatically.
+# generic CachyOS image/repos are used automatically.  On AVX-512
+# (x86-64-v4) CPUs the v3 image runs the build tools, and the packages
+# come from the [cachyos-v4] repo via get_pacman_conf.
 
 _detect_cpu_arch() {
     local flags
@@ -40,21 +42,39 @@ _detect_cpu_arch() {
     export CPU_ARCH_LEVEL DOCKER_IMAGE
 }
 
+# Rewrite a pacman.conf (stdin -> stdout) that lists [cachyos-v3] for
+# CPU_ARCH_LEVEL: [cachyos-v4] on v4, unchanged on v3, and without the
+# optimized repo on generic CPUs.  Same result as the installer's repos.py.
+pacman_conf_for_level() {
+    case "$CPU_ARCH_LEVEL" in
+        x86-64-v4)
+            sed -e 's/^\[cachyos-v3\]/[cachyos-v4]/' \
+                -e 's/cachyos-v3-mirrorlist/cachyos-v4-mirrorlist/'
+            ;;
+        x86-64-v3)
+            cat
+            ;;
+        *)
+            # Remove the entire [cachyos-v3] section (header + Include + SigLevel + blank line)
+            sed '/^\[cachyos-v3\]/,/^$/d'
+            ;;
+    esac
+}
+
 # Generate a pacman.conf appropriate for the detected CPU level.
-# On v3+ CPUs: returns the original path unchanged.
-# On generic CPUs: creates a filtered copy without [cachyos-v3] repo.
+# On v3 CPUs: returns the original path unchanged.
+# On v4 and generic CPUs: creates an adapted copy (pacman_conf_for_level).
 #
 # Usage: CONF=$(get_pacman_conf /path/to/pacman.conf)
 get_pacman_conf() {
     local original="${1:?Usage: get_pacman_conf /path/to/pacman.conf}"
 
-    if [[ "$CPU_ARCH_LEVEL" == "x86-64-v3" || "$CPU_ARCH_LEVEL" == "x86-64-v4" ]]; then
+    if [[ "$CPU_ARCH_LEVEL" == "x86-64-v3" ]]; then
         echo "$original"
     else
-        local filtered="/tmp/amicachy-pacman-generic.conf"
-        # Remove the entire [cachyos-v3] section (header + Include + SigLevel + blank line)
-        sed '/^\[cachyos-v3\]/,/^$/d' "$original" > "$filtered"
-        echo "$filtered"
+        local adapted="/tmp/amicachy-pacman-${CPU_ARCH_LEVEL}.conf"
+        pacman_conf_for_level < "$original" > "$adapted"
+        echo "$adapted"
     fi
 }
 